@@ -5,6 +5,7 @@ give wavelength range.
 
 """
 
+import itertools
 import logging
 
 import matplotlib.pyplot as plt
@@ -172,22 +173,13 @@ if __name__ == "__main__":
                             platform_name_in_legend=(not no_platform_name_in_legend))
 
         else:
-            wvlx = wvlmin
-            prev_bands = []
-            while wvlx < wvlmax:
-                bands = rsr.get_bandname_from_wavelength(wvlx, wavel_res, multiple_bands=True)
-                wvlx = wvlx + wavel_res / 5.
-                if not bands:
-                    continue
-
-                if not isinstance(bands, list):
-                    bands = [bands]
-
-                for b__ in bands:
-                    if b__ not in excluded_bandnames and b__ not in prev_bands:
-                        plt = plot_band(plt, b__, rsr,
-                                        platform_name_in_legend=(not no_platform_name_in_legend))
-                    prev_bands.append(b__)
+            # Scan the spectral range in one vectorized query
+            wvls = np.arange(wvlmin, wvlmax, wavel_res / 5.)
+            found_bands = rsr.spectral_index.bands_near(wvls, wavel_res)
+            for b__ in dict.fromkeys(itertools.chain.from_iterable(found_bands)):
+                if b__ not in excluded_bandnames:
+                    plt = plot_band(plt, b__, rsr,
+                                    platform_name_in_legend=(not no_platform_name_in_legend))
 
     if not something2plot:
         LOG.error("Nothing to plot!")
@@ -0,0 +1,30 @@
+"""Script to convert the RSR data in hdf5 to the consolidated RSR store."""
+
+import argparse
+import logging
+
+from pyspectral.rsr_store import create_rsr_store
+from pyspectral.utils import logging_off, logging_on
+
+LOG = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Convert the relative spectral response data in hdf5 to a single memory-mappable store file')
+    parser.add_argument("-i", "--rsr_dir", help=("Directory of the RSR hdf5 files, defaults to the configured one"),
+                        default=None, type=str)
+    parser.add_argument("-o", "--output", help=("Name of the store file, defaults to a file in the RSR directory"),
+                        default=None, type=str)
+    parser.add_argument(
+        "-v", '--verbose', help=("Turn logging on"), action='store_true')
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging_on(logging.DEBUG)
+    else:
+        logging_off()
+
+    store_filename = create_rsr_store(rsr_dir=args.rsr_dir, store_filename=args.output)
+    print(f"RSR store written to {store_filename}")
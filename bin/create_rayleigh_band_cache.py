@@ -0,0 +1,41 @@
+"""Script to write the rayleigh reflectance tables of the bands of a sensor to a band cache."""
+
+import argparse
+import logging
+
+from pyspectral.rayleigh import create_rayleigh_band_cache
+from pyspectral.utils import AEROSOL_TYPES, ATMOSPHERES, logging_off, logging_on
+
+LOG = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=('Write the rayleigh reflectance tables of the bands of a sensor to memory-mappable files, '
+                     'used instead of the RSR and LUT files by the atmospheric correction'))
+    parser.add_argument("platform_name", help="Name of the satellite platform, e.g. NOAA-20", type=str)
+    parser.add_argument("sensor", help="Name of the sensor, e.g. viirs", type=str)
+    parser.add_argument("-t", "--atmosphere", help="Standard atmosphere, defaults to us-standard",
+                        default='us-standard', choices=list(ATMOSPHERES.keys()), type=str)
+    parser.add_argument("-a", "--aerosol_type", help="Aerosol type, defaults to marine_clean_aerosol",
+                        default='marine_clean_aerosol', choices=AEROSOL_TYPES, type=str)
+    parser.add_argument("-b", "--bands", help="Names of the bands, defaults to all the bands of the sensor",
+                        default=None, nargs='+', type=str)
+    parser.add_argument("-o", "--cache_dir", help="Root directory of the band caches, defaults to the configured one",
+                        default=None, type=str)
+    parser.add_argument("-d", "--dtype", help="Data type of the tables, defaults to float32",
+                        default='float32', choices=['float32', 'float64'], type=str)
+    parser.add_argument(
+        "-v", '--verbose', help=("Turn logging on"), action='store_true')
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging_on(logging.DEBUG)
+    else:
+        logging_off()
+
+    band_cache_dir = create_rayleigh_band_cache(args.platform_name, args.sensor, atmosphere=args.atmosphere,
+                                                aerosol_type=args.aerosol_type, cache_dir=args.cache_dir,
+                                                band_names=args.bands, dtype=args.dtype)
+    print(f"Rayleigh band cache written to {band_cache_dir}")
@@ -9,7 +9,7 @@ import argparse
 import logging
 
 from pyspectral.rayleigh import check_and_download
-from pyspectral.utils import AEROSOL_TYPES, logging_off, logging_on
+from pyspectral.utils import AEROSOL_TYPES, ATMOSPHERES, logging_off, logging_on
 
 LOG = logging.getLogger(__name__)
 
@@ -19,6 +19,9 @@ if __name__ == "__main__":
     parser.add_argument("--aerosol_types", '-a', nargs='*',
                         help="Aerosol types",
                         type=str, default=AEROSOL_TYPES)
+    parser.add_argument("--atmospheres", '-t', nargs='*',
+                        help="Only download the LUTs of these atmospheres (needs a download manifest)",
+                        type=str, default=None, choices=list(ATMOSPHERES))
     parser.add_argument(
         "-d", '--dry_run', help=("Dry run - no action"), action='store_true',
         default=False)
@@ -35,4 +38,4 @@ if __name__ == "__main__":
     else:
         logging_off()
 
-    check_and_download(aerosol_types=aerosol_types, dry_run=dry_run)
+    check_and_download(aerosol_types=aerosol_types, dry_run=dry_run, atmospheres=args.atmospheres)
@@ -14,6 +14,10 @@ if __name__ == "__main__":
         description='Download relative spectral response data in hdf5')
     parser.add_argument("-o", "--destination", help=("Destination path where to store the files"),
                         default=None, type=str)
+    parser.add_argument("-p", "--platforms", nargs='*', default=None, type=str,
+                        help="Only download the files of these platforms (needs a download manifest)")
+    parser.add_argument("-i", "--instruments", nargs='*', default=None, type=str,
+                        help="Only download the files of these instruments (needs a download manifest)")
     parser.add_argument(
         "-d", '--dry_run', help=("Dry run - no action"), action='store_true',
         default=False)
@@ -31,6 +35,7 @@ if __name__ == "__main__":
         logging_off()
 
     if dest_dir:
-        check_and_download(dest_dir=dest_dir, dry_run=dry_run)
+        check_and_download(dest_dir=dest_dir, dry_run=dry_run,
+                           platform_names=args.platforms, instruments=args.instruments)
     else:
-        check_and_download(dry_run=dry_run)
+        check_and_download(dry_run=dry_run, platform_names=args.platforms, instruments=args.instruments)
@@ -1,7 +1,9 @@
 """PySpectral configuration directory and file handling."""
 
+import copy
 import logging
 import os
+import threading
 from collections.abc import Mapping
 from os.path import expanduser
 from pathlib import Path
@@ -20,6 +22,10 @@ LOG = logging.getLogger(__name__)
 
 BUILTIN_CONFIG_FILE = Path(__file__).resolve().parent / "etc" / "pyspectral.yaml"
 
+_CONFIG_CACHE: dict[tuple, dict] = {}
+_CREATED_DIRS: set[str] = set()
+_CONFIG_LOCK = threading.Lock()
+
 
 def recursive_dict_update(d, u):
     """Recursive dictionary update.
@@ -39,10 +45,50 @@ def recursive_dict_update(d, u):
 
 
 def get_config(config_file: str | Path | None = None) -> dict:
-    """Get configuration options from YAML file."""
+    """Get configuration options from YAML file.
+
+    The parsed configuration is cached per file path and is re-read if the
+    modification time or the size of the file changes. A copy of the cached
+    configuration is returned so callers are free to modify it. Use
+    :func:`clear_config_cache` to force the file to be read again.
+
+    """
     if config_file is None:
         config_file = _get_env_or_builtin_config_path()
 
+    cache_key = _get_config_cache_key(config_file)
+    with _CONFIG_LOCK:
+        config = _CONFIG_CACHE.get(cache_key)
+    if config is None:
+        config = _read_config(config_file)
+        with _CONFIG_LOCK:
+            # only keep the latest version of each file
+            for key in [key for key in _CONFIG_CACHE if key[0] == cache_key[0]]:
+                del _CONFIG_CACHE[key]
+            _CONFIG_CACHE[cache_key] = config
+    _makedirs_once(config['rsr_dir'], config['rayleigh_dir'])
+    return copy.deepcopy(config)
+
+
+def clear_config_cache() -> None:
+    """Forget all cached configurations and created directories.
+
+    The next call to :func:`get_config` will re-read the configuration file
+    from disk.
+
+    """
+    with _CONFIG_LOCK:
+        _CONFIG_CACHE.clear()
+        _CREATED_DIRS.clear()
+
+
+def _get_config_cache_key(config_file: str | Path) -> tuple:
+    config_path = os.path.abspath(config_file)
+    stat = os.stat(config_path)
+    return config_path, stat.st_mtime_ns, stat.st_size
+
+
+def _read_config(config_file: str | Path) -> dict:
     config: dict[str, Any] = {}
     with open(config_file, 'r') as fp_:
         loaded_config_content = yaml.load(fp_, Loader=UnsafeLoader)
@@ -52,12 +98,18 @@ def get_config(config_file: str | Path | None = None) -> dict:
     user_datadir = app_dirs.user_data_dir
     config['rsr_dir'] = expanduser(config.get('rsr_dir', user_datadir))
     config['rayleigh_dir'] = expanduser(config.get('rayleigh_dir', user_datadir))
-    os.makedirs(config['rsr_dir'], exist_ok=True)
-    os.makedirs(config['rayleigh_dir'], exist_ok=True)
-
     return config
 
 
+def _makedirs_once(*dirnames: str) -> None:
+    for dirname in dirnames:
+        if dirname in _CREATED_DIRS:
+            continue
+        os.makedirs(dirname, exist_ok=True)
+        with _CONFIG_LOCK:
+            _CREATED_DIRS.add(dirname)
+
+
 def _get_env_or_builtin_config_path() -> Path:
     config_file = os.environ.get('PSP_CONFIG_FILE')
     if config_file is not None and not os.path.isfile(config_file):
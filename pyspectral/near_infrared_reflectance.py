@@ -5,21 +5,38 @@ thermal range (usually the 3.7-3.9 micron band) using a thermal atmospheric
 window channel (usually around 11-12 microns).
 """
 
+from __future__ import annotations
+
+import hashlib
+import itertools
 import logging
 import os
 import tempfile
+import weakref
+from functools import partial
+from typing import NamedTuple
 
 import numpy as np
 
 try:
-    from dask.array import asanyarray, isnan, logical_or, where
+    import dask.array as da
+    from dask.array import asanyarray
 except ImportError:
-    from numpy import where, logical_or, asanyarray, isnan
+    da = None
+    from numpy import asanyarray
 
+from pyspectral.bandnames import BANDNAMES
 from pyspectral.config import get_config
-from pyspectral.radiance_tb_conversion import RadTbConverter
+from pyspectral.radiance_tb_conversion import TB2RAD_LUT_REGISTRY, RadTbConverter, _check_uniform_tb_lut
+from pyspectral.rsr_reader import SOLAR_FLUX_DLAMBDA, BandResponse
 from pyspectral.solar import SolarIrradianceSpectrum
-from pyspectral.utils import BANDNAMES, WAVE_LENGTH, get_bandname_from_wavelength
+from pyspectral.utils import (
+    RSR_DATA_VERSION,
+    WAVE_LENGTH,
+    as_graph_constant,
+    get_bandname_from_wavelength,
+    interprocess_lock,
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -40,13 +57,26 @@ class Calculator(RadTbConverter):
     optional. If not provided, it will be calculated here!
 
     The relfectance calculated is without units and should be between 0 and 1.
+
+    The Tb to radiance look-up table of the NIR band is spaced by
+    *tb_resolution* Kelvin. With *lut_interpolation*, the radiances are
+    interpolated linearly in the table, for which a coarser resolution (e.g.
+    1 K) is as accurate as the default 0.1 K table without interpolation.
+    The table can then also be made on the increasing, possibly non-uniform,
+    temperatures of *tb_grid*, see
+    :meth:`~pyspectral.radiance_tb_conversion.RadTbConverter.make_tb2rad_lut`.
     """
 
     def __init__(self, platform_name, instrument, band,
                  detector="det-1", wavespace=WAVE_LENGTH,
-                 solar_flux=None, sunz_threshold=TERMINATOR_LIMIT, masking_limit=TERMINATOR_LIMIT):
+                 solar_flux=None, sunz_threshold=TERMINATOR_LIMIT, masking_limit=TERMINATOR_LIMIT,
+                 tb_resolution=0.1, lut_interpolation=False, tb_grid=None):
         """Initialize the Class instance."""
-        super(Calculator, self).__init__(platform_name, instrument, band, detector=detector, wavespace=wavespace)
+        super(Calculator, self).__init__(platform_name, instrument, band, detector=detector, wavespace=wavespace,
+                                         tb_resolution=tb_resolution, lut_interpolation=lut_interpolation)
+        if tb_grid is not None and not lut_interpolation:
+            raise ValueError("A Tb grid for the LUT can only be used with the LUT interpolation")
+        self.tb_grid = None if tb_grid is None else np.asarray(tb_grid, dtype=np.float64)
 
         self.bandname = None
         self.bandwavelength = None
@@ -56,12 +86,7 @@ class Calculator(RadTbConverter):
         self.masking_limit = masking_limit
         self.solar_flux = solar_flux
         self.sunz_threshold = sunz_threshold
-        self._e3x = None
-        self._r3x = None
-        self._rad3x = None
-        self._rad3x_t11 = None
-        self._rad3x_correction = 1.0
-        self._solar_radiance = None
+        self._emissive_part_inputs = None
 
         self._set_bandname_and_wavelength(band)
 
@@ -96,6 +121,10 @@ class Calculator(RadTbConverter):
                       "Will generate filename automatically")
             lutname = "tb2rad_lut_{0}_{1}_{band}".format(
                 self.platform_name.lower(), self.instrument.lower(), band=self.bandname.lower())
+            if self.tb_grid is not None:
+                lutname += "_grid{0}".format(hashlib.sha1(self.tb_grid.tobytes()).hexdigest()[:12])
+            elif self.tb_resolution != 0.1:
+                lutname += "_{0:g}K".format(self.tb_resolution)
             self.lutfile = os.path.join(tb2rad_dir, lutname + ".npz")
 
     def _lutfile_from_config(self, options, tb2rad_dir):
@@ -125,14 +154,31 @@ class Calculator(RadTbConverter):
                 options[platform_sensor]["tb2rad_lut_filename"]))
 
     def _set_lut(self):
+        """Get the Tb to radiance LUT of the band from the registry, or from the LUT file the first time.
+
+        The LUT is registered with the modification time and size of the
+        file, so a LUT file changed on disk is read again.
+        """
         LOG.debug("lut filename: " + str(self.lutfile))
+        self._make_lut_if_missing()
+        stat = os.stat(self.lutfile)
+        key = (self.platform_name, self.instrument, self.bandname, self.tb_resolution, RSR_DATA_VERSION,
+               os.path.realpath(self.lutfile), stat.st_mtime_ns, stat.st_size)
+        self.lut = TB2RAD_LUT_REGISTRY.get(key, partial(self.read_tb2rad_lut, self.lutfile))
+
+    def _make_lut_if_missing(self):
+        """Create the LUT file if it doesn't exist.
+
+        The file is created by one process only, the others wait for it
+        under the lock file next to it.
+        """
         if not os.path.exists(self.lutfile):
-            self.make_tb2rad_lut(self.lutfile)
-            self.lut = self.read_tb2rad_lut(self.lutfile)
-            LOG.debug("LUT file created")
+            with interprocess_lock(self.lutfile + ".lock"):
+                if not os.path.exists(self.lutfile):
+                    self.make_tb2rad_lut(self.lutfile, tb_grid=self.tb_grid)
+                    LOG.debug("LUT file created")
         else:
-            self.lut = self.read_tb2rad_lut(self.lutfile)
-            LOG.debug("File was there and has been read!")
+            LOG.debug("File was there and is read!")
 
     def derive_rad39_corr(self, bt11, bt13, method="rosenfeld"):
         """Derive the CO2 correction to be applied to the 3.9 channel.
@@ -141,7 +187,7 @@ class Calculator(RadTbConverter):
         attenuation of the emitted 3.9 radiance by CO2
         absorption. Requires the 11 micron window band and the 13.4
         CO2 absorption band, as e.g. available on SEVIRI. Currently
-        only supports the Rosenfeld method
+        only supports the Rosenfeld method. Returns the correction factor.
 
         """
         if method != "rosenfeld":
@@ -149,41 +195,53 @@ class Calculator(RadTbConverter):
                                  "the Rosenfeld equation is supported!")
 
         LOG.debug("Derive the 3.9 micron radiance CO2 correction coefficent")
-        self._rad3x_correction = (bt11 - 0.25 * (bt11 - bt13)) ** 4 / bt11 ** 4
+        return _get_rad39_correction(bt11, bt13)
 
     def _get_solarflux(self):
         """Derive the in-band solar flux from rsr over the Near IR band (3.7 or 3.9 microns)."""
+        band_rsr = self.rsr[self.bandname]
+        if isinstance(band_rsr, BandResponse) and band_rsr.wavespace == WAVE_LENGTH:
+            # precomputed in the RSR file or shared with the other users of the band
+            self.solar_flux = band_rsr.solar_fluxes[band_rsr.detector_names.index('det-1')]
+            return
         solar_spectrum = \
-            SolarIrradianceSpectrum(dlambda=0.0005,
+            SolarIrradianceSpectrum(dlambda=SOLAR_FLUX_DLAMBDA,
                                     wavespace=self.wavespace)
-        self.solar_flux = solar_spectrum.inband_solarflux(self.rsr[self.bandname])
+        self.solar_flux = solar_spectrum.inband_solarflux(band_rsr)
 
     def emissive_part_3x(self, tb=True):
-        """Get the emissive part of the 3.x band."""
-        try:
-            # Emissive part:
-            self._e3x = self._rad3x_t11 * (1 - self._r3x)
-            # Use the original channel data on the night side
-            self._e3x = where(isnan(self._e3x), self._rad3x, self._e3x)
-            # Unsure how much sense it makes to apply the co2 correction term here!?
-            # FIXME!
-            # self._e3x *= self._rad3x_correction
+        """Get the emissive part of the 3.x band for the Tb's of the last :meth:`reflectance_from_tbs` call.
 
-        except TypeError:
+        The emissive part is derived on request, from the inputs of the last
+        call which the caller still holds, the calculator keeping weak
+        references to them only. :meth:`derive_reflectance` gives the emissive
+        part together with the reflectance without keeping anything on the
+        calculator.
+        """
+        inputs = None if self._emissive_part_inputs is None else self._emissive_part_inputs()
+        if inputs is None:
             LOG.warning(
                 "Couldn't derive the emissive part \n" +
                 "Please derive the relfectance prior to requesting the emissive part")
+            return None
 
+        # Unsure how much sense it makes to apply the co2 correction term here!?
+        # FIXME!
+        result = self.derive_reflectance(*inputs, emissive_part=True)
         if tb:
-            return self.radiance2tb(self._e3x)
+            return result.emissive_tb
         else:
-            return self._e3x
+            return result.emissive_radiance
 
     def reflectance_from_tbs(self, sun_zenith, tb_near_ir, tb_thermal, **kwargs):
         """Derive reflectances from Tb's in the 3.x band.
 
         The relfectance calculated is without units and should be between 0 and 1.
 
+        The calculator keeps weak references to the inputs for a following
+        :meth:`emissive_part_3x` call, see :meth:`derive_reflectance` for a
+        calculator shared between threads.
+
         Inputs:
 
           sun_zenith: Sun zenith angle for every pixel - in degrees
@@ -199,11 +257,45 @@ class Calculator(RadTbConverter):
                      absorption correction will be applied.
 
         """
+        tb_ir_co2 = kwargs.get("tb_ir_co2")
+        lut = kwargs.get("lut")
+        self._emissive_part_inputs = _WeakInputs(sun_zenith, tb_near_ir, tb_thermal, tb_ir_co2, lut)
+        return self.derive_reflectance(sun_zenith, tb_near_ir, tb_thermal, tb_ir_co2=tb_ir_co2, lut=lut).reflectance
+
+    def derive_reflectance(self, sun_zenith, tb_near_ir, tb_thermal, tb_ir_co2=None, lut=None,
+                           emissive_part=False):
+        """Derive the reflectances of the 3.x band, and optionally its emissive part, from the Tb's.
+
+        Nothing is kept on the calculator, so it can be shared between threads
+        and dask tasks. All the per pixel steps are done in a single pass over
+        the data, one tile of pixels at a time, block by block for dask arrays.
+
+        Args:
+            sun_zenith: Sun zenith angle for every pixel - in degrees
+            tb_near_ir: The 3.7 (or 3.9 or equivalent) IR Tb's at every pixel (Kelvin)
+            tb_thermal: The 10.8 (or 11 or 12 or equivalent) IR Tb's at every pixel (Kelvin)
+            tb_ir_co2: The 13.4 micron channel (or similar - co2 absorption band)
+                brightness temperatures at every pixel. If None, no CO2
+                absorption correction will be applied.
+            lut: Tb to radiance look-up table to use instead of the one of the calculator.
+            emissive_part: If True, the radiances and Tb's of the emissive part
+                of the band are derived too.
+
+        Returns:
+            A :class:`NIRReflectance` with the reflectances, without units and
+            normally between 0 and 1, and the emissive part if requested.
+
+        """
+        return self._derive_reflectance(sun_zenith, tb_near_ir, tb_thermal, tb_ir_co2,
+                                        self.lut if lut is None else lut, emissive_part=emissive_part)
+
+    def _derive_reflectance(self, sun_zenith, tb_near_ir, tb_thermal, tb_ir_co2, lut, emissive_part=False):
         if not self.rsr:
             raise NotImplementedError("Reflectance calculations without rsr not yet supported!")
 
-        tb_nir = get_as_array(tb_near_ir)
-        tb_therm = get_as_array(tb_thermal)
+        inputs = [sun_zenith, tb_near_ir, tb_thermal] + ([] if tb_ir_co2 is None else [tb_ir_co2])
+        use_dask = da is not None and any(hasattr(variable, "compute") for variable in inputs)
+        sun_zenith, tb_nir, tb_therm, *tbco2 = [_get_as_array(variable, use_dask) for variable in inputs]
         if tb_therm.shape != tb_nir.shape:
             raise ValueError(f"Dimensions do not match! {tb_therm.shape} and {tb_nir.shape}")
 
@@ -215,71 +307,235 @@ class Calculator(RadTbConverter):
         if hasattr(tb_near_ir, "mask") or hasattr(tb_thermal, "mask"):
             is_masked = True
 
-        sun_zenith = get_as_array(sun_zenith)
-        tb_ir_co2 = kwargs.get("tb_ir_co2")
-        lut = kwargs.get("lut", self.lut)
-
-        co2corr = False
-        tbco2 = None
-        if tb_ir_co2 is not None:
-            co2corr = True
-            tbco2 = get_as_array(tb_ir_co2)
-
+        if tbco2:
+            LOG.debug("CO2 correction applied...")
+        LOG.debug("Apply sun-zenith angle clipping between 0 and %5.2f", self.masking_limit)
         # Assume rsr is in microns!!!
         # FIXME!
-        self._rad3x_t11 = self.tb2radiance(tb_therm, lut=lut)["radiance"]
-        self._rad3x = self.tb2radiance(tb_nir, lut=lut)["radiance"]
+        kernel = _NIRReflectanceKernel(self, lut)
+        arrays = (sun_zenith, tb_nir, tb_therm, *tbco2)
+        if emissive_part:
+            res = _apply_kernel(kernel, "reflectance_and_emissive_part", *arrays, nresults=3)
+        else:
+            res = _apply_kernel(kernel, "reflectance", *arrays)
 
-        LOG.debug("Apply sun-zenith angle clipping between 0 and %5.2f", self.masking_limit)
+        if hasattr(res, "compute") and compute:
+            res = res.compute()
+        result = NIRReflectance(*res) if emissive_part else NIRReflectance(res)
+        if is_masked:
+            result = result._replace(reflectance=np.ma.masked_invalid(result.reflectance))
+        return result
 
-        self._calculate_solar_radiance(tb_nir, sun_zenith)
-        self._calculate_rad3x_correction(co2corr, tb_therm, tbco2, tb_nir.dtype)
 
-        self._calculate_r3x(tb_therm, sun_zenith, tb_nir)
+class NIRReflectance(NamedTuple):
+    """Reflectances of a 3.x band, with the radiances and Tb's of its emissive part when requested."""
 
-        res = self._r3x
-        if hasattr(self._r3x, "compute") and compute:
-            res = self._r3x.compute()
-        if is_masked:
-            res = np.ma.masked_invalid(res)
-        return res
+    reflectance: np.ndarray
+    emissive_radiance: np.ndarray | None = None
+    emissive_tb: np.ndarray | None = None
+
+
+class _WeakInputs:
+    """Weak references to the inputs of a derivation, giving them back while the caller holds them.
+
+    Scalars and the look-up tables, which can't be referenced weakly, are small and kept as they are.
+    """
+
+    def __init__(self, *inputs):
+        """Reference the *inputs*, lists and other arrays that can't be referenced weakly being lost."""
+        self._refs = [self._reference(variable) for variable in inputs]
+
+    @staticmethod
+    def _reference(variable):
+        if variable is None or isinstance(variable, dict) or np.ndim(variable) == 0:
+            return False, variable
+        try:
+            return True, weakref.ref(variable)
+        except TypeError:
+            return True, _lost_reference
+
+    def __call__(self):
+        """Get the inputs, or None if one of them is no longer held by the caller."""
+        inputs = [ref() if is_weak else ref for is_weak, ref in self._refs]
+        if any(is_weak and variable is None for (is_weak, _), variable in zip(self._refs, inputs)):
+            return None
+        return inputs
+
+
+def _lost_reference():
+    return None
+
+
+#: Number of pixels processed at once by the NIR reflectance kernel
+NIR_TILE_SIZE = 65536
+
+
+class _NIRReflectanceKernel:
+    """Pixel by pixel derivation of the NIR reflectances and emissive parts from the Tb's.
+
+    The Tb to radiance look-ups, the CO2 correction, the solar radiance, the
+    reflectance and its masking are done together on tiles of
+    :data:`NIR_TILE_SIZE` pixels, so the intermediate arrays stay small and
+    the output is the only full size array allocated. The operations and data
+    types are the ones of the step by step derivation.
+    """
+
+    def __init__(self, calculator, lut):
+        """Get the parameters of the derivation from *calculator*, the radiances being taken from *lut*."""
+        self.rsr_integral = calculator.rsr_integral
+        self.solar_flux = calculator.solar_flux
+        self.sunz_threshold = calculator.sunz_threshold
+        self.masking_limit = calculator.masking_limit
+        self.lut = lut
+        self._tb2radiance = calculator.tb2radiance
+        self._radiance2tb = calculator.radiance2tb
+        self._interpolate = calculator.lut_interpolation
+        self._tb_scale = calculator.tb_scale
+        if lut and not self._interpolate:
+            _check_uniform_tb_lut(lut["tb"], calculator.tb_resolution)
+        self._lut_tables = {}
+
+    def __dask_tokenize__(self):
+        """Identify the kernel in the dask graphs."""
+        return type(self).__name__, id(self)
+
+    def reflectance(self, sun_zenith, tb_nir, tb_therm, tb_co2=None):
+        """Get the reflectances of the pixels, *tb_co2* being the Tb's of the CO2 band for the CO2 correction."""
+        arrays = [sun_zenith, tb_nir, tb_therm] + ([] if tb_co2 is None else [tb_co2])
+        return _apply_by_tiles(self._reflectance_tile, self.get_dtype("reflectance", *arrays), arrays)
+
+    def reflectance_and_emissive_part(self, sun_zenith, tb_nir, tb_therm, tb_co2=None):
+        """Get the reflectances, the emissive radiances and the emissive Tb's, stacked along a first axis."""
+        arrays = [sun_zenith, tb_nir, tb_therm] + ([] if tb_co2 is None else [tb_co2])
+        return _apply_by_tiles(self._reflectance_and_emissive_part_tile,
+                               self.get_dtype("reflectance_and_emissive_part", *arrays), arrays, nresults=3)
+
+    def get_dtype(self, method, *arrays):
+        """Get the data type of the results of *method* (e.g. "reflectance") for inputs like *arrays*."""
+        tile_func = getattr(self, f"_{method}_tile")
+        with np.errstate(all="ignore"):
+            res = tile_func(*(np.ones(1, dtype=arr.dtype) for arr in arrays))
+        return np.result_type(*res) if isinstance(res, tuple) else res.dtype
+
+    def _reflectance_tile(self, *arrays):
+        return self._get_reflectance_and_radiances(*arrays)[0]
+
+    def _reflectance_and_emissive_part_tile(self, *arrays):
+        r3x, rad3x_t11, rad3x = self._get_reflectance_and_radiances(*arrays)
+        # Emissive part:
+        e3x = rad3x_t11 * (1 - r3x)
+        # Use the original channel data on the night side
+        e3x = np.where(np.isnan(e3x), rad3x, e3x)
+        return r3x, e3x, self._radiance2tb(e3x)
+
+    def _get_reflectance_and_radiances(self, sun_zenith, tb_nir, tb_therm, tb_co2=None):
+        rad3x_t11 = self._get_radiance(tb_therm)
+        rad3x = self._get_radiance(tb_nir)
 
-    def _calculate_solar_radiance(self, tb_nir, sun_zenith):
         sunz = sun_zenith.clip(0, self.sunz_threshold)
         mu0 = np.cos(np.deg2rad(sunz))
-        # mu0 = np.where(np.less(mu0, 0.1), 0.1, mu0)
-        self._solar_radiance = (self.solar_flux * mu0 / np.pi).astype(tb_nir.dtype)
+        solar_radiance = (self.solar_flux * mu0 / np.pi).astype(tb_nir.dtype)
 
-    def _calculate_rad3x_correction(self, co2corr, tb_therm, tbco2, dtype):
         # CO2 correction to the 3.9 radiance, only if tbs of a co2 band around
         # 13.4 micron is provided:
-        if co2corr:
-            self.derive_rad39_corr(tb_therm, tbco2)
-            LOG.debug("CO2 correction applied...")
+        if tb_co2 is None:
+            rad3x_correction = np.float64(1.0)
         else:
-            self._rad3x_correction = np.float64(1.0)
-        self._rad3x_correction = self._rad3x_correction.astype(dtype)
+            rad3x_correction = _get_rad39_correction(tb_therm, tb_co2)
+        rad3x_correction = rad3x_correction.astype(tb_nir.dtype)
 
-    def _calculate_r3x(self, tb_therm, sun_zenith, tb_nir):
         rsr_integral = tb_therm.dtype.type(self.rsr_integral)
-        thermal_emiss_one = self._rad3x_t11 * rsr_integral
-        if thermal_emiss_one.ravel().shape[0] < 10:
-            LOG.debug("thermal_emiss_one = %s", str(thermal_emiss_one))
-        corrected_thermal_emiss_one = thermal_emiss_one * self._rad3x_correction
-        l_nir = self._rad3x * rsr_integral
-        if l_nir.ravel().shape[0] < 10:
-            LOG.debug("l_nir = %s", str(l_nir))
+        corrected_thermal_emiss_one = rad3x_t11 * rsr_integral * rad3x_correction
+        l_nir = rad3x * rsr_integral
         nomin = l_nir - corrected_thermal_emiss_one
-        denom = self._solar_radiance - corrected_thermal_emiss_one
+        denom = solar_radiance - corrected_thermal_emiss_one
         data = nomin / denom
         mask = denom < EPSILON
 
         if self.masking_limit is not None:
-            sunzmask = (sun_zenith < 0.0) | (sun_zenith > self.masking_limit)
-            logical_or(sunzmask, mask, out=mask)
-        logical_or(mask, np.isnan(tb_nir), out=mask)
+            mask |= (sun_zenith < 0.0) | (sun_zenith > self.masking_limit)
+        mask |= np.isnan(tb_nir)
+        return np.where(mask, np.nan, data), rad3x_t11, rad3x
+
+    def _get_radiance(self, tb_):
+        if not self.lut:
+            return self._tb2radiance(tb_, lut=self.lut)["radiance"]
+        lut_tb, lut_radiance = self._get_lut_tables(tb_.dtype)
+        if self._interpolate:
+            return np.interp(tb_, lut_tb, lut_radiance).astype(lut_radiance.dtype, copy=False)
+        scaled_tb = tb_ * self._tb_scale
+        valid = np.isfinite(scaled_tb)
+        # invalid and out of range Tb's are replaced before the cast, which would warn about them
+        int16_range = np.iinfo(np.int16)
+        ntb = np.where(valid, scaled_tb, 0).clip(int16_range.min, int16_range.max).astype('int16')
+        start = int(lut_tb[0] * self._tb_scale)
+        index = (ntb - start).clip(0, lut_radiance.shape[0] - 1)
+        radiance = lut_radiance[index]
+        if not valid.all():
+            radiance = np.where(valid, radiance, np.nan).astype(radiance.dtype, copy=False)
+        return radiance
+
+    def _get_lut_tables(self, dtype):
+        tables = self._lut_tables.get(dtype)
+        if tables is None:
+            if self._interpolate and not np.issubdtype(dtype, np.floating):
+                dtype = np.dtype(np.float64)
+            tables = self._lut_tables[dtype] = (np.asarray(self.lut["tb"]).astype(dtype, copy=False),
+                                                np.asarray(self.lut["radiance"]).astype(dtype, copy=False))
+        return tables
+
+
+def _apply_kernel(kernel, method, *arrays, nresults=None):
+    """Apply *method* of *kernel* directly to numpy arrays, or block by block to dask arrays.
+
+    The kernel is a single key of the dask graph, shared by all the blocks.
+    Methods giving *nresults* results stack them along a new first axis.
+    """
+    if da is None or not any(isinstance(arr, da.Array) for arr in arrays):
+        return getattr(kernel, method)(*arrays)
+    dtype = kernel.get_dtype(method, *arrays)
+    kwargs = {}
+    if nresults is not None:
+        arrays = da.broadcast_arrays(*arrays)
+        index = tuple(range(arrays[0].ndim))
+        _, arrays = da.core.unify_chunks(*itertools.chain.from_iterable((arr, index) for arr in arrays))
+        kwargs = {"new_axis": 0, "chunks": ((nresults,),) + arrays[0].chunks}
+    return da.map_blocks(_call_kernel, *arrays, kernel=as_graph_constant(kernel), method=method,
+                         dtype=dtype, meta=np.array((), dtype=dtype), **kwargs)
+
+
+def _call_kernel(*blocks, kernel, method):
+    return getattr(kernel, method)(*blocks)
+
+
+def _apply_by_tiles(tile_func, dtype, arrays, nresults=None):
+    """Apply *tile_func* to the broadcast *arrays*, flattened, one tile at a time into a single output array.
 
-        self._r3x = where(mask, np.nan, data)
+    With *nresults*, *tile_func* returns that many results, which are
+    stacked along the first axis of the output.
+    """
+    arrays = np.broadcast_arrays(*(np.ma.getdata(arr) for arr in arrays))
+    shape = arrays[0].shape
+    res = np.empty(shape if nresults is None else (nresults,) + shape, dtype=dtype)
+    flat_arrays = [arr.reshape(-1) if arr.flags.c_contiguous else arr.flat for arr in arrays]
+    flat_res = res.reshape(-1) if nresults is None else res.reshape(nresults, -1)
+    for start in range(0, arrays[0].size, NIR_TILE_SIZE):
+        tile = slice(start, start + NIR_TILE_SIZE)
+        flat_res[..., tile] = tile_func(*(arr[tile] for arr in flat_arrays))
+    return res
+
+
+def _get_rad39_correction(bt11, bt13):
+    """Get the Rosenfeld CO2 correction factor of the 3.9 radiance."""
+    return (bt11 - 0.25 * (bt11 - bt13)) ** 4 / bt11 ** 4
+
+
+def _get_as_array(variable, use_dask):
+    if use_dask:
+        return get_as_array(variable)
+    if np.isscalar(variable):
+        return np.asanyarray([variable, ])
+    return np.asanyarray(variable)
 
 
 def get_as_array(variable):
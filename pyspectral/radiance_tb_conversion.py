@@ -5,14 +5,26 @@ various satellite sensors
 """
 
 import logging
+import os
+import threading
+from collections.abc import Callable, Mapping
+from functools import partial
 from numbers import Number
 
 import numpy as np
 from scipy.integrate import trapezoid
 
+from pyspectral.bandnames import BANDNAMES
 from pyspectral.blackbody import C_SPEED, H_PLANCK, K_BOLTZMANN, blackbody, blackbody_wn
-from pyspectral.rsr_reader import RelativeSpectralResponse
-from pyspectral.utils import BANDNAMES, WAVE_LENGTH, WAVE_NUMBER, convert2wavenumber, get_bandname_from_wavelength
+from pyspectral.rsr_reader import BandResponse, RelativeSpectralResponse
+from pyspectral.shared_arrays import SHARED_ARRAY_POOL, shared_memory_enabled
+from pyspectral.utils import (
+    WAVE_LENGTH,
+    WAVE_NUMBER,
+    as_graph_constant,
+    convert2wavenumber,
+    get_bandname_from_wavelength,
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -63,6 +75,65 @@ SEVIRI = {'IR3.9': {'Meteosat-8': [2567.330, 0.9956, 3.410],
           }
 
 
+class Tb2RadLUTRegistry:
+    """Process-wide register of the Tb to radiance look-up tables in memory.
+
+    The ``tb`` and ``radiance`` arrays of each table are fully read once and
+    made read-only, so they are shared by all the :class:`Calculator
+    <pyspectral.near_infrared_reflectance.Calculator>` instances of the same
+    band and repeated conversions don't read the LUT file again. The module
+    level instance :data:`TB2RAD_LUT_REGISTRY` is used by the calculators,
+    which register the tables with the modification time and size of their
+    files, so a file changed on disk is read again. It can be emptied with
+    its :meth:`clear` method.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._entries: dict[tuple, dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of registered tables."""
+        return len(self._entries)
+
+    def get(self, key: tuple, loader: Callable[[], Mapping]) -> dict[str, np.ndarray]:
+        """Get the table identified by *key*, reading it with *loader* if not registered yet.
+
+        *loader* returns the table as a mapping with the ``tb`` and ``radiance``
+        arrays, like :meth:`RadTbConverter.read_tb2rad_lut`.
+
+        """
+        with self._lock:
+            lut = self._entries.get(key)
+        if lut is None:
+            lut = _materialize_tb2rad_lut(loader())
+            with self._lock:
+                lut = self._entries.setdefault(key, lut)
+        return lut
+
+    def clear(self) -> None:
+        """Remove all the tables from the registry."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _materialize_tb2rad_lut(lut: Mapping) -> dict[str, np.ndarray]:
+    try:
+        arrays = {name: np.asarray(lut[name]) for name in ("tb", "radiance")}
+    finally:
+        if hasattr(lut, "close"):
+            lut.close()
+    for arr in arrays.values():
+        arr.flags.writeable = False
+    return arrays
+
+
+#: Tb to radiance look-up tables of the process, used by the NIR reflectance calculators
+TB2RAD_LUT_REGISTRY = Tb2RadLUTRegistry()
+
+
 class RadTbConverter(object):
     """A radiance to brightness temperature calculator.
 
@@ -72,7 +143,7 @@ class RadTbConverter(object):
     """
 
     def __init__(self, platform_name, instrument, band, detector='det-1', wavespace=WAVE_LENGTH,
-                 tb_resolution=0.1):
+                 tb_resolution=0.1, lut_interpolation=False):
         """Initialize the Class instance.
 
         E.g.:
@@ -80,6 +151,11 @@ class RadTbConverter(object):
         instrument = 'seviri'
         band = 3.75
 
+        With *lut_interpolation*, the radiances are linearly interpolated
+        between the temperatures of the look-up tables instead of taking the
+        entry just below, so much coarser tables (e.g. ``tb_resolution=1.``)
+        give the same accuracy.
+
         """
         self.platform_name = platform_name
         self.instrument = instrument
@@ -100,6 +176,7 @@ class RadTbConverter(object):
         self.detector = detector
         self.tb_resolution = tb_resolution
         self.tb_scale = 1. / self.tb_resolution
+        self.lut_interpolation = lut_interpolation
 
         self.blackbody_function = BLACKBODY_FUNC[self.wavespace]
         self.rsr_integral = 1.0
@@ -131,11 +208,17 @@ class RadTbConverter(object):
             self.bandwavelength = self.band
             self.bandname = get_bandname_from_wavelength(self.instrument, self.band, self.rsr)
 
-        self.wavelength_or_wavenumber = (self.rsr[self.bandname][self.detector][self.wavespace] *
+        band_rsr = self.rsr[self.bandname]
+        self.wavelength_or_wavenumber = (band_rsr[self.detector][self.wavespace] *
                                          self._wave_si_scale)
-        self.response = self.rsr[self.bandname][self.detector]['response']
+        self.response = band_rsr[self.detector]['response']
         # Get the integral of the spectral response curve:
-        self.rsr_integral = trapezoid(self.response, self.wavelength_or_wavenumber)
+        if isinstance(band_rsr, BandResponse):
+            # precomputed in the RSR file or shared with the other users of the band
+            detector_index = band_rsr.detector_names.index(self.detector)
+            self.rsr_integral = band_rsr.integral()[detector_index] * self._wave_si_scale
+        else:
+            self.rsr_integral = trapezoid(self.response, self.wavelength_or_wavenumber)
 
     def _getsatname(self):
         """Get the satellite name used in the rsr-reader, from the platform and number."""
@@ -150,7 +233,7 @@ class RadTbConverter(object):
         """Index the lut, numpy style."""
         return lut[block]
 
-    def tb2radiance(self, tb_, lut=None, normalized=True):
+    def tb2radiance(self, tb_, lut=None, normalized=True, interpolate=None):
         """Get the radiance from the brightness temperature (Tb) given the band name.
 
         Input:
@@ -163,6 +246,12 @@ class RadTbConverter(object):
           normalized: If True, the derived radiance values are the spectral radiances for the band.
             If False the radiance is the band integrated radiance. Default is True.
 
+          interpolate: If True, the radiances of the LUT are linearly
+            interpolated at the Tb's, and the temperatures of the LUT may be
+            non-uniformly spaced. If False, the LUT entry just below the Tb
+            is taken, the LUT temperatures being spaced by *tb_resolution*.
+            Defaults to the *lut_interpolation* of the converter.
+
         """
         if self.wavespace == WAVE_NUMBER:
             if normalized:
@@ -177,7 +266,14 @@ class RadTbConverter(object):
                 unit = 'W/m^2 sr^-1'
             scale = 1.0
 
+        if interpolate is None:
+            interpolate = self.lut_interpolation
+        if lut and interpolate:
+            return {'radiance': _interpolate_tb2rad_lut(tb_, lut),
+                    'unit': unit,
+                    'scale': scale}
         if lut:
+            _check_uniform_tb_lut(lut['tb'], self.tb_resolution)
             lut_radiance = lut['radiance'].astype(tb_.dtype)
             ntb = (tb_ * self.tb_scale).astype('int16')
             start = int(lut['tb'][0] * self.tb_scale)
@@ -185,7 +281,9 @@ class RadTbConverter(object):
             bounds = 0, lut_radiance.shape[0] - 1
             index = (ntb - start).clip(bounds[0], bounds[1])
             try:
-                retv['radiance'] = index.map_blocks(self._getitem, lut_radiance, dtype=lut_radiance.dtype)
+                retv['radiance'] = index.map_blocks(self._getitem, as_graph_constant(lut_radiance),
+                                                    dtype=lut_radiance.dtype,
+                                                    meta=np.array((), dtype=lut_radiance.dtype))
             except AttributeError:
                 retv['radiance'] = lut_radiance[index]
             try:
@@ -206,16 +304,46 @@ class RadTbConverter(object):
                 'unit': unit,
                 'scale': scale}
 
-    def make_tb2rad_lut(self, filepath, normalized=True):
-        """Generate a Tb to radiance look-up table."""
-        tb_ = np.arange(TB_MIN, TB_MAX, self.tb_resolution)
+    def make_tb2rad_lut(self, filepath, normalized=True, tb_grid=None):
+        """Generate a Tb to radiance look-up table.
+
+        The temperatures of the table are spaced by *tb_resolution*, unless
+        the increasing temperatures *tb_grid* are given, e.g. to refine the
+        table where the radiance is the most curved for the interpolating
+        mode of :meth:`tb2radiance`.
+
+        The table is written to a temporary file renamed to *filepath* when
+        complete, so other processes never read a partly written file.
+        """
+        if tb_grid is None:
+            tb_ = np.arange(TB_MIN, TB_MAX, self.tb_resolution)
+        else:
+            tb_ = np.asarray(tb_grid, dtype=np.float64)
+            if tb_.ndim != 1 or tb_.size < 2 or np.any(np.diff(tb_) <= 0):
+                raise ValueError("The temperatures of the LUT must be strictly increasing")
         retv = self.tb2radiance(tb_, normalized=normalized)
         rad = retv['radiance']
-        np.savez(filepath, tb=tb_, radiance=rad)
+        tmp_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_filepath, 'wb') as fh:
+                np.savez(fh, tb=tb_, radiance=rad)
+            os.replace(tmp_filepath, filepath)
+        except BaseException:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            raise
 
     @staticmethod
     def read_tb2rad_lut(filepath):
-        """Read the Tb to radiance look-up table."""
+        """Read the Tb to radiance look-up table.
+
+        The table is read from shared memory if enabled, see
+        :mod:`pyspectral.shared_arrays`.
+        """
+        if shared_memory_enabled():
+            stat = os.stat(filepath)
+            key = ("tb2rad", os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size)
+            return SHARED_ARRAY_POOL.get(key, partial(_read_tb2rad_lut_arrays, filepath))
         retv = np.load(filepath, 'r')
         return retv
 
@@ -228,6 +356,53 @@ class RadTbConverter(object):
         return radiance2tb(rad, self.rsr[self.bandname][self.detector]['central_wavelength'] * 1e-6)
 
 
+#: Number of pixels interpolated at once by :func:`_interpolate_tb2rad_lut`
+TB2RAD_LUT_TILE_SIZE = 65536
+
+
+def _check_uniform_tb_lut(lut_tb, tb_resolution):
+    """Check that the temperatures of a LUT are spaced by *tb_resolution*, as needed without interpolation."""
+    spacing = np.diff(np.asarray(lut_tb, dtype=np.float64))
+    if not np.allclose(spacing, tb_resolution, rtol=1e-3, atol=0):
+        raise ValueError(f"The temperatures of the Tb to radiance LUT are not spaced by the Tb resolution of "
+                         f"{tb_resolution:g} K, the LUT can only be used with the LUT interpolation")
+
+
+def _interpolate_tb2rad_lut(tb_, lut):
+    """Interpolate the radiances of *lut* linearly at the temperatures *tb_*, blockwise for dask arrays.
+
+    The table is taken in the data type of *tb_*, and each block is
+    interpolated tile by tile into its single output array.
+    """
+    tb_ = np.asanyarray(tb_) if not hasattr(tb_, "map_blocks") else tb_
+    dtype = tb_.dtype if np.issubdtype(tb_.dtype, np.floating) else np.dtype(np.float64)
+    lut_tb = np.asarray(lut['tb']).astype(dtype, copy=False)
+    lut_radiance = np.asarray(lut['radiance']).astype(dtype, copy=False)
+    if hasattr(tb_, "map_blocks"):
+        return tb_.map_blocks(_interpolate_tb2rad_block, as_graph_constant(lut_tb),
+                              as_graph_constant(lut_radiance), dtype=dtype, meta=np.array((), dtype=dtype))
+    res = _interpolate_tb2rad_block(tb_, lut_tb, lut_radiance)
+    if isinstance(tb_, np.ma.MaskedArray):
+        res = np.ma.masked_array(res, mask=np.ma.getmaskarray(tb_))
+    return res[()] if res.ndim == 0 else res
+
+
+def _interpolate_tb2rad_block(tb_, lut_tb, lut_radiance):
+    tb_ = np.ma.getdata(tb_)
+    res = np.empty(tb_.shape, dtype=lut_radiance.dtype)
+    flat_tb = tb_.reshape(-1)
+    flat_res = res.reshape(-1)
+    for start in range(0, flat_tb.size, TB2RAD_LUT_TILE_SIZE):
+        tile = slice(start, start + TB2RAD_LUT_TILE_SIZE)
+        flat_res[tile] = np.interp(flat_tb[tile], lut_tb, lut_radiance)
+    return res
+
+
+def _read_tb2rad_lut_arrays(filepath):
+    with np.load(filepath) as lut:
+        return {"tb": lut["tb"], "radiance": lut["radiance"]}
+
+
 def radiance2tb(rad, wavelength):
     """Get the Tb from the radiance using the Planck function.
 
@@ -1,9 +1,14 @@
 """Atmospheric correction of shortwave imager bands in the wavelength range 400 to 800 nm."""
+from __future__ import annotations
 
+import json
 import logging
 import numbers
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Hashable, NamedTuple
 
 import h5py
 import numpy as np
@@ -13,31 +18,47 @@ try:
 except ImportError:
     da = None
 
-from geotiepoints.multilinear import MultilinearInterpolator
-
+from pyspectral.bandnames import BANDNAMES
 from pyspectral.config import get_config
-from pyspectral.rsr_reader import RelativeSpectralResponse
+from pyspectral.rsr_reader import BandResponse, RelativeSpectralResponse
+from pyspectral.shared_arrays import SHARED_ARRAY_POOL, shared_memory_enabled
 from pyspectral.utils import (
     AEROSOL_TYPES,
     ATM_CORRECTION_LUT_VERSION,
     ATMOSPHERES,
-    BANDNAMES,
     INSTRUMENTS,
+    RSR_DATA_VERSION,
+    as_graph_constant,
     download_luts,
     get_central_wave,
     get_rayleigh_lut_dir,
+    get_rayleigh_lut_filename,
+    lut_files_fetched,
 )
 
 LOG = logging.getLogger(__name__)
 
+#: Default memory cap in bytes of the :data:`RAYLEIGH_LUT_CACHE`
+DEFAULT_RAYLEIGH_LUT_CACHE_SIZE = 256 * 1024 ** 2
+
+#: Default largest accepted error, in reflectance percent, of the rayleigh
+#: reflectances upsampled from tie points, see :class:`DecimatedRayleighInterpolator`
+DEFAULT_ANGLE_DECIMATION_TOLERANCE = 0.1
+
 
-def _map_blocks_or_direct_call(func, *args, **kwargs):
-    """Call dask's map_blocks or call func directly if dask is not available."""
-    if da is None:
+def _map_blocks_or_direct_call(func, *args, graph_constants=None, **kwargs):
+    """Call dask's map_blocks or call func directly if dask is not available or no argument is a dask array.
+
+    The keyword arguments in *graph_constants* are passed to *func* too, but
+    as single keys of the dask graph instead of being embedded in every task.
+    """
+    graph_constants = graph_constants or {}
+    if da is None or not any(isinstance(arg, da.Array) for arg in args):
         kwargs.pop("meta", None)
         kwargs.pop("dtype", None)
         kwargs.pop("chunks", None)
-        return func(*args, **kwargs)
+        return func(*args, **kwargs, **graph_constants)
+    kwargs.update({name: as_graph_constant(value) for name, value in graph_constants.items()})
     return da.map_blocks(func, *args, **kwargs)
 
 
@@ -131,14 +152,79 @@ class Rayleigh(RayleighConfigBaseClass):
         self.platform_name = platform_name
 
         rayleigh_path = get_rayleigh_lut_dir(aerosol_type)
-        ext = atm_type.replace(' ', '_')
-        lutname = "rayleigh_lut_{0}.h5".format(ext)
-        self.reflectance_lut_filename = rayleigh_path / lutname
+        self.reflectance_lut_filename = rayleigh_path / get_rayleigh_lut_filename(atm_type)
         LOG.debug(f"LUT filename: {self.reflectance_lut_filename}")
 
-        if not self.lutfiles_version_uptodate and self.do_download:
+        self._atm_type = atm_type
+        self._lut_download_checked = False
+        self.band_cache = None
+        if kwargs.get('band_cache', True):
+            self.band_cache = get_rayleigh_band_cache(platform_name, self.sensor, atm_type, aerosol_type)
+        if self.band_cache is not None:
+            LOG.debug(f"Using the rayleigh band cache in {self.band_cache.cache_dir}")
+        else:
+            self._check_lut_download()
+
+        if kwargs.get('preload', False):
+            self.preload_bands()
+
+    def _check_lut_download(self):
+        """Download the LUT file if it is not up to date, once per instance.
+
+        With a band cache this is only done when a band has to be taken from
+        the LUT file.
+        """
+        if self._lut_download_checked:
+            return
+        self._lut_download_checked = True
+        if (not self.lutfiles_version_uptodate and self.do_download
+                and not lut_files_fetched(self._aerosol_type, [self._atm_type])):
             LOG.info("Rayleigh LUT files not up to date, will download from internet...")
-            download_luts(aerosol_types=[aerosol_type])
+            download_luts(aerosol_types=[self._aerosol_type], atmospheres=[self._atm_type])
+
+    def preload_bands(self, band_names=None, dtype=np.float32):
+        """Load the reflectance tables of the bands of the sensor into the :data:`RAYLEIGH_LUT_CACHE`.
+
+        Later calls to :meth:`get_reflectance` with data of the same *dtype*
+        don't need to read the LUT file anymore. Bands with an effective
+        wavelength outside of the LUT are skipped. With a band cache (see
+        :func:`create_rayleigh_band_cache`) the tables of the band cache are
+        loaded instead.
+
+        Args:
+            band_names: Names of the bands to load. Defaults to all the bands
+                of the sensor.
+            dtype: Data type of the reflectance arrays that will be corrected.
+
+        """
+        if band_names is None:
+            if self.band_cache is not None:
+                band_names = list(self.band_cache.bands)
+            else:
+                band_names = RelativeSpectralResponse(self.platform_name, self.sensor).band_names
+        for band_name in band_names:
+            try:
+                self._get_band_interpolator(band_name, dtype)
+            except ValueError:
+                LOG.debug("Band %s is outside of the rayleigh LUT wavelength range, not preloaded", band_name)
+
+    def _get_band_interpolator(self, band_name_or_wavelength, dtype):
+        """Get the interpolator of the reflectance table of a band.
+
+        The table is taken from the band cache if it has the band in a
+        precision sufficient for *dtype*, and from the LUT file otherwise.
+
+        Raises:
+            ValueError: if the effective wavelength of the band is outside of
+                the range of the LUT.
+
+        """
+        if (self.band_cache is not None and band_name_or_wavelength in self.band_cache
+                and self.band_cache.supports_dtype(dtype)):
+            return self.band_cache.get_interpolator(band_name_or_wavelength, dtype)
+        wvl, _ = self._get_effective_wavelength_and_band_name(band_name_or_wavelength)
+        self._check_lut_download()
+        return RAYLEIGH_LUT_CACHE.get_interpolator(self.reflectance_lut_filename, wvl, dtype)
 
     def _get_effective_wavelength_and_band_name(self, band_name_or_wavelength):
         """Get the effective wavelength in nanometers and name of the band/channel.
@@ -165,6 +251,8 @@ class Rayleigh(RayleighConfigBaseClass):
             band_name = f'{wvl:f}um'
         else:
             band_name = band_name_or_wavelength
+            if self.band_cache is not None and band_name in self.band_cache:
+                return self.band_cache.get_wavelength(band_name), band_name
             wvl = _get_rsr_wavelength_from_band_name(
                 self.platform_name,
                 self.sensor,
@@ -175,72 +263,168 @@ class Rayleigh(RayleighConfigBaseClass):
         LOG.debug("Band name: %s  Effective wavelength: %fum", band_name_or_wavelength, wvl)
         return wvl * 1000.0, band_name
 
-    @staticmethod
-    def _interp_rayleigh_refl_by_angles(sun_zenith, sat_zenith, azidiff,
-                                        rayleigh_refl, reflectance_lut_filename):
-        azid_coord, satz_sec_coord, sunz_sec_coord = get_reflectance_lut_from_file(
-            reflectance_lut_filename)
-        azid_coord = azid_coord.astype(rayleigh_refl.dtype, copy=False)
-        satz_sec_coord = satz_sec_coord.astype(rayleigh_refl.dtype, copy=False)
-        sunz_sec_coord = sunz_sec_coord.astype(rayleigh_refl.dtype, copy=False)
-
-        sun_zenith = _clip_angles_inside_coordinate_range(sun_zenith, sunz_sec_coord.max())
-        sunzsec = 1. / np.cos(np.deg2rad(sun_zenith))
-
-        sat_zenith = _clip_angles_inside_coordinate_range(sat_zenith, satz_sec_coord.max())
-        satzsec = 1. / np.cos(np.deg2rad(sat_zenith))
-
-        smin = [sunz_sec_coord[0], azid_coord[0], satz_sec_coord[0]]
-        smax = [sunz_sec_coord[-1], azid_coord[-1], satz_sec_coord[-1]]
-        orders = [len(sunz_sec_coord), len(azid_coord), len(satz_sec_coord)]
-        f_3d_grid = np.atleast_2d(rayleigh_refl.ravel())
-
-        minterp = MultilinearInterpolator(smin, smax, orders, dtype=rayleigh_refl.dtype)
-        minterp.set_values(f_3d_grid)
-        interp_points2 = np.vstack((sunzsec.ravel(), 180 - azidiff.ravel(), satzsec.ravel()))
-        res = minterp(interp_points2)
-        res *= 100
-        return res.reshape(sunzsec.shape)
-
     def get_reflectance(self, sun_zenith, sat_zenith, azidiff,
-                        band_name_or_wavelength, redband=None):
-        """Get the reflectance from the three sun-sat angles."""
+                        band_name_or_wavelength, redband=None, angle_decimation=None,
+                        angle_decimation_tolerance=DEFAULT_ANGLE_DECIMATION_TOLERANCE, static_geometry=None,
+                        reduce_highzenith=None):
+        """Get the reflectance from the three sun-sat angles.
+
+        The interpolation of the LUT, the relaxation where cloudy, the
+        clipping and the optional reduction at high sun zenith angles are done
+        in one pass, as one dask task per chunk.
+
+        Args:
+            sun_zenith: Sun zenith angles.
+            sat_zenith: Satellite zenith angles.
+            azidiff: Sun-satellite azimuth difference angles.
+            band_name_or_wavelength: Name of the band, or its effective
+                wavelength in µm.
+            redband: Optional red band reflectances used to reduce the
+                correction where it is cloudy.
+            angle_decimation: Optional distance in pixels between the tie
+                points where the LUT is interpolated, the reflectances being
+                upsampled bilinearly in between, in each chunk of the last two
+                dimensions of the angles. See
+                :class:`DecimatedRayleighInterpolator`.
+            angle_decimation_tolerance: Largest accepted error in reflectance
+                percent of the upsampled reflectances. The pixels of the tie
+                point cells with a larger error at their centre are
+                interpolated at full resolution.
+            static_geometry: Optional :class:`StaticGeometry` of the area,
+                used instead of *sat_zenith* (which can then be None) to
+                reuse the satellite zenith grid cells between time slots.
+                Can't be combined with *angle_decimation*.
+            reduce_highzenith: Optional ``(thresh_zen, maxzen, strength)``
+                parameters of :meth:`reduce_rayleigh_highzenith`, to reduce
+                the reflectances at high sun zenith angles in the same pass.
+
+        """
+        _check_static_geometry_options(static_geometry, angle_decimation, azidiff)
         # if the user gave us non-dask arrays we'll use the dask
         # version of the algorithm but return numpy arrays back
         compute = da is not None and not isinstance(sun_zenith, da.Array)
 
-        wvl, band_name = self._get_effective_wavelength_and_band_name(band_name_or_wavelength)
         repr_arr = sun_zenith if redband is None else redband
         try:
-            rayleigh_refl = _get_wavelength_adjusted_lut_rayleigh_reflectance(
-                self.reflectance_lut_filename, wvl)
+            interpolator = self._get_band_interpolator(band_name_or_wavelength, repr_arr.dtype)
         except ValueError:
             LOG.warning("Effective wavelength for band %s outside "
-                        "nominal 400-800 nm range!", str(band_name))
+                        "nominal 400-800 nm range!", str(band_name_or_wavelength))
             LOG.info("Setting the rayleigh/aerosol reflectance contribution to zero!")
-            zeros_like = np.zeros_like if isinstance(repr_arr, np.ndarray) else da.zeros_like
-            res = zeros_like(repr_arr)
+            interpolator = None
+            angles = (sun_zenith, sat_zenith, azidiff)
         else:
-            rayleigh_refl = rayleigh_refl.astype(repr_arr.dtype, copy=False)
-            res = _map_blocks_or_direct_call(self._interp_rayleigh_refl_by_angles,
-                                             sun_zenith, sat_zenith, azidiff, rayleigh_refl,
-                                             self.reflectance_lut_filename,
-                                             meta=np.array((), dtype=repr_arr.dtype),
-                                             dtype=repr_arr.dtype,
-                                             chunks=getattr(azidiff, "chunks", None))
-
-        if redband is not None:
-            res = _map_blocks_or_direct_call(self._relax_rayleigh_refl_correction_where_cloudy,
-                                             redband, res,
-                                             meta=np.array((), dtype=res.dtype),
-                                             dtype=res.dtype,
-                                             chunks=getattr(res, "chunks", None))
-
-        res = np.clip(res, 0, 100)
-        if compute:
+            if angle_decimation is not None:
+                interpolator = DecimatedRayleighInterpolator(interpolator, angle_decimation,
+                                                             angle_decimation_tolerance)
+            angles = self._get_interpolation_angles(interpolator, sun_zenith, sat_zenith, azidiff, static_geometry)
+        if reduce_highzenith is not None:
+            LOG.info("Reducing Rayleigh effect at high zenith angles.")
+            reduce_highzenith = tuple(reduce_highzenith)
+
+        arrays = angles + ((redband,) if redband is not None else ())
+        res = _map_blocks_or_direct_call(_rayleigh_refl_block, *arrays,
+                                         graph_constants={"interpolator": interpolator},
+                                         out_dtype=repr_arr.dtype,
+                                         use_redband=redband is not None,
+                                         reduce_highzenith=reduce_highzenith,
+                                         meta=np.array((), dtype=repr_arr.dtype),
+                                         dtype=repr_arr.dtype,
+                                         chunks=getattr(azidiff, "chunks", None))
+
+        if compute and isinstance(res, da.Array):
             res = res.compute()
         return res
 
+    def get_reflectances(self, sun_zenith, sat_zenith, azidiff, bands, redband=None, angle_decimation=None,
+                         angle_decimation_tolerance=DEFAULT_ANGLE_DECIMATION_TOLERANCE, static_geometry=None,
+                         reduce_highzenith=None):
+        """Get the reflectances of several bands from the three sun-sat angles.
+
+        This gives the same results as calling :meth:`get_reflectance` for each
+        band, but the angle computations and the search of the LUT grid cells
+        are done once for all the bands. The interpolation, the relaxation
+        where cloudy, the clipping and the reduction at high sun zenith angles
+        are done in one dask task per chunk, as for :meth:`get_reflectance`.
+
+        Args:
+            sun_zenith: Sun zenith angles.
+            sat_zenith: Satellite zenith angles.
+            azidiff: Sun-satellite azimuth difference angles.
+            bands: Names of the bands, or effective wavelengths in µm, as for
+                :meth:`get_reflectance`.
+            redband: Optional red band reflectances used to reduce the
+                correction where it is cloudy.
+            angle_decimation: Optional distance in pixels between the tie
+                points, as for :meth:`get_reflectance`.
+            angle_decimation_tolerance: Largest accepted error of the
+                upsampled reflectances, as for :meth:`get_reflectance`.
+            static_geometry: Optional static geometry of the area, as for
+                :meth:`get_reflectance`.
+            reduce_highzenith: Optional parameters of the reduction of the
+                reflectances at high sun zenith angles, as for
+                :meth:`get_reflectance`.
+
+        Returns: The rayleigh reflectances of the bands stacked along a new
+            first dimension, in the order of *bands*. Use e.g.
+            ``dict(zip(bands, res))`` to get them by band.
+
+        """
+        _check_static_geometry_options(static_geometry, angle_decimation, azidiff)
+        use_dask = da is not None and isinstance(sun_zenith, da.Array)
+
+        repr_arr = sun_zenith if redband is None else redband
+        interpolators = []
+        for band_name_or_wavelength in bands:
+            try:
+                interpolators.append(self._get_band_interpolator(band_name_or_wavelength, repr_arr.dtype))
+            except ValueError:
+                LOG.warning("Effective wavelength for band %s outside "
+                            "nominal 400-800 nm range!", str(band_name_or_wavelength))
+                LOG.info("Setting the rayleigh/aerosol reflectance contribution to zero!")
+                interpolators.append(None)
+
+        if all(interpolator is None for interpolator in interpolators):
+            zeros = da.zeros if use_dask else np.zeros
+            return zeros((len(bands),) + repr_arr.shape, dtype=repr_arr.dtype)
+
+        interpolator = StackedRayleighInterpolator(interpolators)
+        if angle_decimation is not None:
+            interpolator = DecimatedRayleighInterpolator(interpolator, angle_decimation, angle_decimation_tolerance)
+        angles = self._get_interpolation_angles(interpolator, sun_zenith, sat_zenith, azidiff, static_geometry)
+        if reduce_highzenith is not None:
+            LOG.info("Reducing Rayleigh effect at high zenith angles.")
+            reduce_highzenith = tuple(reduce_highzenith)
+
+        arrays = angles + ((redband,) if redband is not None else ())
+        if not use_dask:
+            return _rayleigh_refl_block(*(np.asarray(arr) for arr in arrays), interpolator=interpolator,
+                                        use_redband=redband is not None, reduce_highzenith=reduce_highzenith)
+        return _map_blocks_or_direct_call(_rayleigh_refl_block, *arrays,
+                                          graph_constants={"interpolator": interpolator},
+                                          out_dtype=repr_arr.dtype,
+                                          use_redband=redband is not None,
+                                          reduce_highzenith=reduce_highzenith,
+                                          meta=np.array((), dtype=repr_arr.dtype),
+                                          dtype=repr_arr.dtype,
+                                          chunks=((len(bands),),) + azidiff.chunks,
+                                          new_axis=0)
+
+    @staticmethod
+    def _get_interpolation_angles(interpolator, sun_zenith, sat_zenith, azidiff, static_geometry):
+        """Get the angle arguments of the interpolation, using the static geometry if provided."""
+        if static_geometry is None:
+            return (sun_zenith, sat_zenith, azidiff)
+        sat_cells = static_geometry.get_satellite_cells(interpolator)
+        if da is not None and isinstance(azidiff, da.Array):
+            sat_cells = tuple(da.asarray(arr).rechunk(azidiff.chunks) for arr in sat_cells)
+        return (sun_zenith,) + tuple(sat_cells) + (azidiff,)
+
+    @classmethod
+    def _relax_and_clip(cls, redband, rayleigh_refl):
+        res = cls._relax_rayleigh_refl_correction_where_cloudy(redband, rayleigh_refl)
+        return np.clip(res, 0, 100, out=res)
+
     @staticmethod
     def _relax_rayleigh_refl_correction_where_cloudy(redband, rayleigh_refl):
         return np.where(redband < 20., rayleigh_refl,
@@ -255,10 +439,53 @@ class Rayleigh(RayleighConfigBaseClass):
         be linearly scaled, from one at `thresh_zen` to zero at `maxzen`.
         """
         LOG.info("Reducing Rayleigh effect at high zenith angles.")
-        factor = 1. - strength * np.where(zenith < thresh_zen, 0, (zenith - thresh_zen) / (maxzen - thresh_zen))
-        # For low zenith factor can be greater than one, so we need to clip it into a sensible range.
-        factor = np.clip(factor, 0, 1)
-        return rayref * factor
+        return rayref * _get_highzenith_reduction_factor(zenith, thresh_zen, maxzen, strength)
+
+
+def _get_highzenith_reduction_factor(zenith, thresh_zen, maxzen, strength):
+    factor = 1. - strength * np.where(zenith < thresh_zen, 0, (zenith - thresh_zen) / (maxzen - thresh_zen))
+    # For low zenith factor can be greater than one, so we need to clip it into a sensible range.
+    return np.clip(factor, 0, 1)
+
+
+def _rayleigh_refl_block(sun_zenith, *arrays, interpolator=None, out_dtype=None, use_redband=False,
+                         reduce_highzenith=None):
+    """Compute the rayleigh reflectances of a block, relaxed where cloudy, clipped and reduced at high zenith.
+
+    The *arrays* are the satellite zenith angles and the azimuth differences,
+    or the satellite grid cells and the azimuth differences with a static
+    geometry, followed by the red band if *use_redband* is set. Without
+    *interpolator* the reflectances are zero. With a
+    :class:`StackedRayleighInterpolator` the reflectances of the bands are
+    stacked along a new first dimension.
+
+    """
+    arrays = list(arrays)
+    redband = arrays.pop() if use_redband else None
+    if interpolator is None:
+        res = np.zeros(np.shape(sun_zenith), dtype=out_dtype)
+    elif len(arrays) == 3:
+        sat_index, sat_weight, azidiff = arrays
+        res = interpolator(sun_zenith, None, azidiff, clip=redband is None, sat_cells=(sat_index, sat_weight))
+    else:
+        sat_zenith, azidiff = arrays
+        res = interpolator(sun_zenith, sat_zenith, azidiff, clip=redband is None)
+    if redband is not None:
+        res = Rayleigh._relax_and_clip(redband, res)
+    if reduce_highzenith is not None:
+        # in place, not to upcast the reflectances to the data type of the angles
+        np.multiply(res, _get_highzenith_reduction_factor(sun_zenith, *reduce_highzenith), out=res)
+    return res
+
+
+def _check_static_geometry_options(static_geometry, angle_decimation, azidiff):
+    if static_geometry is None:
+        return
+    if angle_decimation is not None:
+        raise ValueError("A static geometry can't be used together with an angle decimation")
+    if static_geometry.shape != np.shape(azidiff):
+        raise ValueError(f"The shape {static_geometry.shape} of the static geometry doesn't match "
+                         f"the shape {np.shape(azidiff)} of the angles")
 
 
 def normalize_sensor(platform_name: str, sensor: str) -> str:
@@ -285,34 +512,899 @@ def _get_rsr_wavelength_from_band_name(platform_name, sensor, band_name):
                (str(band_name), platform_name, sensor))
         raise KeyError(msg)
 
-    wvl = rsr.rsr[band_name]['det-1']['wavelength']
-    resp = rsr.rsr[band_name]['det-1']['response']
+    band_rsr = rsr.rsr[band_name]
+    if isinstance(band_rsr, BandResponse):
+        # precomputed in the RSR file or shared with the other users of the band
+        return band_rsr.rayleigh_wavelengths[band_rsr.detector_names.index('det-1')]
+    wvl = band_rsr['det-1']['wavelength']
+    resp = band_rsr['det-1']['response']
     cwvl = get_central_wave(wvl, resp, weight=1. / wvl**4)
     return cwvl
 
 
-def _get_wavelength_adjusted_lut_rayleigh_reflectance(lut_filename: Path, wvl: float) -> np.ndarray:
-    if not lut_filename.is_file():
-        raise FileNotFoundError(
-            f"pyspectral file for Rayleigh scattering correction does not exist! Filename = {lut_filename}")
+def _get_wavelength_index_and_factor(wvl_coord, wvl):
+    wavelength_index = np.searchsorted(wvl_coord, wvl)
+    wvl1 = wvl_coord[wavelength_index - 1]
+    wvl2 = wvl_coord[wavelength_index]
+    wavelength_factor = (wvl2 - wvl) / (wvl2 - wvl1)
+    return wavelength_index, wavelength_factor
+
+
+class RayleighLUT(NamedTuple):
+    """Rayleigh reflectance table of one wavelength with the coordinates of its grid."""
+
+    reflectance: np.ndarray
+    sun_zenith_secant: np.ndarray
+    azimuth_difference: np.ndarray
+    satellite_zenith_secant: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        """Get the total size of the arrays."""
+        return sum(arr.nbytes for arr in self)
+
+
+class RayleighLUTCache:
+    """Process-wide least-recently-used cache of wavelength adjusted rayleigh LUTs.
+
+    Reading and interpolating the reflectance table of a band from the LUT
+    file is done once per LUT file, effective wavelength and data type,
+    instead of once per call (and per dask chunk). Entries are keyed by the
+    resolved file path together with the modification time and size of the
+    file, so a file that is updated on disk is read again. The cached arrays
+    are read-only as they are shared between all the users of the band.
+
+    The total size of the cached arrays is kept below ``max_bytes`` by
+    evicting the least recently used tables first. The module level instance
+    :data:`RAYLEIGH_LUT_CACHE` is used by :class:`Rayleigh`.
+
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_RAYLEIGH_LUT_CACHE_SIZE):
+        """Initialize an empty cache holding at most *max_bytes* of array data."""
+        self._entries: OrderedDict[tuple, RayleighInterpolator] = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """Get the total size of the cached arrays."""
+        return sum(entry.lut.nbytes for entry in list(self._entries.values()))
+
+    def __len__(self) -> int:
+        """Get the number of cached tables."""
+        return len(self._entries)
+
+    def get(self, lut_filename: Path, wvl: float, dtype=np.float64) -> RayleighLUT:
+        """Get the rayleigh LUT of *lut_filename* interpolated to the wavelength *wvl* in nm.
+
+        Raises:
+            FileNotFoundError: if the LUT file doesn't exist.
+            ValueError: if the wavelength is outside of the range of the LUT.
+
+        """
+        return self.get_interpolator(lut_filename, wvl, dtype).lut
+
+    def get_interpolator(self, lut_filename: Path, wvl: float, dtype=np.float64) -> RayleighInterpolator:
+        """Get the prepared interpolator of the rayleigh LUT of *lut_filename* at the wavelength *wvl* in nm.
+
+        See :meth:`get` for the exceptions raised.
+
+        """
+        lut_filename = Path(lut_filename)
+        if not lut_filename.is_file():
+            raise FileNotFoundError(
+                f"pyspectral file for Rayleigh scattering correction does not exist! Filename = {lut_filename}")
+        stat = lut_filename.stat()
+        dtype = np.dtype(dtype)
+        key = (str(lut_filename.resolve()), stat.st_mtime_ns, stat.st_size, float(wvl), dtype.str)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = RayleighInterpolator(_load_rayleigh_lut(lut_filename, wvl, dtype, key), key=key)
+        with self._lock:
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            self._evict()
+        return entry
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        total_nbytes = sum(entry.lut.nbytes for entry in self._entries.values())
+        while len(self._entries) > 1 and total_nbytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            total_nbytes -= entry.lut.nbytes
+
+
+class RayleighInterpolator:
+    """Trilinear interpolation of a rayleigh LUT at the sun-satellite angles of pixels.
+
+    The grid parameters are computed once when the interpolator is created,
+    and the interpolator holds no state modified when called, so one
+    instance can be used concurrently by all the dask workers processing
+    the chunks of a band. The interpolation gives the same results as
+    :class:`geotiepoints.multilinear.MultilinearInterpolator` on the regular
+    grid of the LUT, extrapolating linearly outside of it.
+
+    The pixels are processed in tiles of :data:`RAYLEIGH_TILE_SIZE` pixels,
+    in place in scratch buffers of the data type of the table reused by
+    the calls of each thread, so the memory used besides the angles and the
+    result doesn't grow with the size of the arrays.
+
+    """
+
+    def __init__(self, lut: RayleighLUT, key: Hashable | None = None):
+        """Prepare the interpolation of the reflectance table of *lut*.
+
+        Args:
+            lut: The rayleigh reflectance table and its grid.
+            key: Identifier of the table, used as the dask token of the
+                interpolator. Defaults to an identifier of the instance.
+
+        """
+        self.lut = lut
+        self.dtype = lut.reflectance.dtype
+        self._key = key if key is not None else id(self)
+        coords = (lut.sun_zenith_secant, lut.azimuth_difference, lut.satellite_zenith_secant)
+        self._grid_min = tuple(coord[0] for coord in coords)
+        self._grid_scale = tuple((coord.size - 1) / (coord[-1] - coord[0]) for coord in coords)
+        self._max_index = tuple(coord.size - 2 for coord in coords)
+        self._strides = (coords[1].size * coords[2].size, coords[2].size, 1)
+        self._sunz_clip_angle = self._get_clip_angle(lut.sun_zenith_secant.max())
+        self._satz_clip_angle = self._get_clip_angle(lut.satellite_zenith_secant.max())
+        self._table = lut.reflectance.reshape(-1)
+
+    @staticmethod
+    def _get_clip_angle(zenith_secant_max):
+        """Get the largest zenith angle of the grid, as in :func:`_clip_angles_inside_coordinate_range`."""
+        return np.nan_to_num(np.rad2deg(np.arccos(1. / zenith_secant_max)))
+
+    def __dask_tokenize__(self):
+        """Get a token identifying the table, to avoid hashing the arrays for every dask graph."""
+        return (RayleighInterpolator.__name__, self._key)
+
+    def __call__(self, sun_zenith, sat_zenith, azidiff, out=None, clip=False, sat_cells=None):
+        """Get the rayleigh reflectance in percent at the given angles in degrees.
+
+        Args:
+            sun_zenith: Sun zenith angles.
+            sat_zenith: Satellite zenith angles, same shape as *sun_zenith*.
+            azidiff: Sun-satellite azimuth difference angles, same shape as
+                *sun_zenith*.
+            out: C-contiguous array of the shape of the angles and the
+                dtype of the table to put the result in. A new array is
+                created if not provided.
+            clip: Clip the reflectances to the 0 to 100 range.
+            sat_cells: Precomputed grid cells of the satellite zenith angles,
+                see :meth:`get_satellite_cells`, used instead of
+                *sat_zenith*.
+
+        """
+        if out is None:
+            out = np.empty(np.shape(sun_zenith), dtype=self.dtype)
+        else:
+            _check_out_array(out, np.shape(sun_zenith), self.dtype)
+        self._interpolate_tables(self._table[np.newaxis], sun_zenith, sat_zenith, azidiff,
+                                 out.reshape((1, -1)), clip, sat_cells)
+        return out
+
+    def _interpolate_tables(self, tables, sun_zenith, sat_zenith, azidiff, out, clip, sat_cells=None):
+        """Interpolate the flattened *tables*, stacked along their first dimension, into *out*.
+
+        *out* is a writeable array of shape (number of tables, number of
+        pixels) sharing memory with the array returned to the caller. The
+        grid cells of the satellite zenith angles are taken from *sat_cells*
+        if provided, see :meth:`get_satellite_cells`, and *sat_zenith* is
+        not used.
+
+        """
+        sun_zenith, azidiff = (np.asarray(angle).reshape(-1) for angle in (sun_zenith, azidiff))
+        if sat_cells is None:
+            sat_zenith = np.asarray(sat_zenith).reshape(-1)
+        else:
+            sat_cells = tuple(np.asarray(arr).reshape(-1) for arr in sat_cells)
+        n_tables = tables.shape[0]
+        tile_size = min(RAYLEIGH_TILE_SIZE, sun_zenith.size)
+        points = _get_scratch_buffers("points", 4, (tile_size,), self.dtype)
+        weights = _get_scratch_buffers("weights", 3, (tile_size,), self.dtype)
+        indices = _get_scratch_buffers("indices", 2, (tile_size,), np.intp)
+        corners = _get_scratch_buffers("corners", 2, (n_tables, tile_size), self.dtype)
+        values = _get_scratch_buffers("values", 4, (n_tables, tile_size), self.dtype)
+        for start in range(0, sun_zenith.size, tile_size):
+            stop = min(start + tile_size, sun_zenith.size)
+            size = stop - start
+            tile_weights = [buf[:size] for buf in weights]
+            tile_indices = [buf[:size] for buf in indices]
+            tile_values = [buf[:, :size] for buf in values]
+            if sat_cells is None:
+                tile_sat = sat_zenith[start:stop]
+            else:
+                tile_sat = tuple(arr[start:stop] for arr in sat_cells)
+            self._get_grid_cells(sun_zenith[start:stop], tile_sat, azidiff[start:stop],
+                                 [buf[:size] for buf in points], tile_indices, tile_weights)
+            self._interpolate_tile(tables, tile_indices, tile_weights, [buf[:, :size] for buf in corners],
+                                   tile_values)
+            res = tile_values[0]
+            res *= 100
+            if clip:
+                np.clip(res, 0, 100, out=res)
+            out[:, start:stop] = res
+
+    def _get_grid_cells(self, sun_zenith, sat_zenith, azidiff, points, indices, weights):
+        """Get the grid cells of the LUT holding the angles and the interpolation weights in them.
+
+        The flat index in the table of the lower corner of the cell of each
+        pixel is put in the first buffer of *indices*, and the interpolation
+        weights along the sun zenith secant, azimuth difference and satellite
+        zenith secant dimensions of the table in *weights*. The angles are
+        converted to the grid coordinates in the data type of the table.
+        *sat_zenith* can also be the precomputed satellite grid cells.
+
+        """
+        flat_index, index = indices
+        sun_secant, azimuth, sat_secant, position_index = points
+        _zenith_to_secant(sun_zenith, self._sunz_clip_angle, sun_secant)
+        azimuth[...] = azidiff
+        np.subtract(180, azimuth, out=azimuth)
+        dimensions = [sun_secant, azimuth]
+        if isinstance(sat_zenith, tuple):
+            sat_index, sat_weight = sat_zenith
+            weights[2][...] = sat_weight
+        else:
+            _zenith_to_secant(sat_zenith, self._satz_clip_angle, sat_secant)
+            dimensions.append(sat_secant)
+
+        for point, weight, grid_min, grid_scale, max_index, stride in zip(
+                dimensions, weights, self._grid_min, self._grid_scale, self._max_index, self._strides):
+            point -= grid_min
+            point *= grid_scale
+            np.floor(point, out=position_index)
+            np.clip(position_index, 0, max_index, out=position_index)
+            np.subtract(point, position_index, out=weight)
+            np.copyto(index, position_index, casting='unsafe')
+            if point is dimensions[0]:
+                np.multiply(index, stride, out=flat_index)
+            else:
+                index *= stride
+                flat_index += index
+        if len(dimensions) == 2:
+            # the stride of the satellite zenith secant dimension is one
+            flat_index += sat_index
+
+    @property
+    def satellite_grid_key(self) -> Hashable:
+        """Get a key identifying the satellite zenith secant grid of the table and its data type."""
+        return (self.dtype.str, tuple(self.lut.satellite_zenith_secant.tolist()))
+
+    def get_satellite_cells(self, sat_zenith):
+        """Get the satellite zenith secant grid cells of the table holding the satellite zenith angles.
+
+        The result depends only on :attr:`satellite_grid_key` and can be
+        reused with all the tables sharing it, see :class:`StaticGeometry`.
+
+        Returns: The index of the lower corner of the cell of each pixel, as
+            the smallest sufficient unsigned integer type, and the
+            interpolation weights in the cell, in the data type of the table.
+
+        """
+        sat_zenith = np.asarray(sat_zenith)
+        secant = np.empty(sat_zenith.shape, dtype=self.dtype)
+        _zenith_to_secant(sat_zenith, self._satz_clip_angle, secant)
+        secant -= self._grid_min[2]
+        secant *= self._grid_scale[2]
+        index = np.clip(np.floor(secant), 0, self._max_index[2])
+        # the fractional part of the position is exact in the data type of the table
+        secant -= index
+        return index.astype(np.min_scalar_type(self._max_index[2])), secant
+
+    def _interpolate_tile(self, tables, indices, weights, corners, values):
+        """Interpolate linearly along each dimension of the tables, starting from the lower corner cells.
+
+        The result is put in the first buffer of *values*. The interpolation
+        is done in the data type of the table, as the weights are.
+
+        """
+        sun_weight, azi_weight, sat_weight = weights
+        lower, upper, tmp_lower, tmp = values
+        sun_stride, azi_stride, _ = self._strides
+        for offset, res in ((0, lower), (sun_stride, upper)):
+            self._take_lerp(tables, indices, offset, sat_weight, corners, res, tmp)
+            self._take_lerp(tables, indices, offset + azi_stride, sat_weight, corners, tmp_lower, tmp)
+            _lerp(res, tmp_lower, azi_weight)
+        _lerp(lower, upper, sun_weight)
+
+    @staticmethod
+    def _take_lerp(tables, indices, offset, weight, corners, res, tmp):
+        """Interpolate along the last dimension of the tables between *offset* and the next element."""
+        flat_index, corner_index = indices
+        lower, upper = corners
+        np.add(flat_index, offset, out=corner_index)
+        # the indices are inside of the table, clipping avoids checking it and buffering the output
+        np.take(tables, corner_index, axis=-1, out=lower, mode='clip')
+        corner_index += 1
+        np.take(tables, corner_index, axis=-1, out=upper, mode='clip')
+        np.subtract(upper, lower, out=tmp)
+        tmp *= weight
+        np.add(lower, tmp, out=res)
+
+
+def _check_out_array(out, shape, dtype):
+    """Check that the results can be written in *out* through a flat view of it."""
+    if out.shape != shape or out.dtype != dtype or not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError(f"The output array must be a writeable C-contiguous array of shape {shape} and "
+                         f"dtype {np.dtype(dtype)}, not of shape {out.shape} and dtype {out.dtype}")
+
+
+def _zenith_to_secant(zenith, clip_angle, secant):
+    """Put the secant of the zenith angles, clipped as in :func:`_clip_angles_inside_coordinate_range`, in *secant*."""
+    secant[...] = zenith
+    np.nan_to_num(secant, copy=False)
+    np.clip(secant, 0, clip_angle, out=secant)
+    np.deg2rad(secant, out=secant)
+    np.cos(secant, out=secant)
+    np.divide(1., secant, out=secant)
+
+
+def _lerp(lower, upper, weight):
+    """Put ``lower + weight * (upper - lower)`` in *lower*, overwriting *upper*."""
+    upper -= lower
+    upper *= weight
+    lower += upper
+
+
+#: Number of pixels processed at once by the rayleigh interpolators
+RAYLEIGH_TILE_SIZE = 16384
+
+_SCRATCH = threading.local()
+
+
+def _get_scratch_buffers(name: str, count: int, shape: tuple[int, ...], dtype) -> list[np.ndarray]:
+    """Get *count* scratch arrays of at least *shape* for the current thread, allocated once."""
+    dtype = np.dtype(dtype)
+    key = (name, dtype.str)
+    buffers = getattr(_SCRATCH, "buffers", None)
+    if buffers is None:
+        buffers = _SCRATCH.buffers = {}
+    arrays = buffers.get(key)
+    if arrays is None or len(arrays) < count or any(have < want for have, want in zip(arrays[0].shape, shape)):
+        arrays = buffers[key] = [np.empty(shape, dtype=dtype) for _ in range(count)]
+    return [arr[tuple(slice(0, size) for size in shape)] for arr in arrays[:count]]
+
+
+class StackedRayleighInterpolator:
+    """Interpolation of the rayleigh LUTs of several bands at once.
+
+    The grid cells and interpolation weights of the pixels are computed once
+    and applied to the stacked reflectance tables of all the bands, which must
+    come from the same LUT file. Bands without a table (outside of the
+    wavelength range of the LUT) get a zero reflectance.
+
+    """
 
+    def __init__(self, interpolators: list[RayleighInterpolator | None]):
+        """Stack the tables of the *interpolators*, with None for bands without table."""
+        valid = [interpolator for interpolator in interpolators if interpolator is not None]
+        if not valid:
+            raise ValueError("At least one band must have a rayleigh LUT")
+        self._grid = valid[0]
+        for interpolator in valid[1:]:
+            if not all(np.array_equal(coord, other) for coord, other in zip(interpolator.lut[1:], self._grid.lut[1:])):
+                raise ValueError("The rayleigh LUTs of all the bands must have the same grid")
+        self.dtype = self._grid.dtype
+        self.n_bands = len(interpolators)
+        self._band_index = [idx for idx, interpolator in enumerate(interpolators) if interpolator is not None]
+        self._tables = np.stack([interpolator._table for interpolator in valid])
+        self._tables.flags.writeable = False
+        self._key = tuple(None if interpolator is None else interpolator.__dask_tokenize__()
+                          for interpolator in interpolators)
+
+    def __dask_tokenize__(self):
+        """Get a token identifying the stacked tables."""
+        return (StackedRayleighInterpolator.__name__, self._key)
+
+    @property
+    def satellite_grid_key(self) -> Hashable:
+        """Get a key identifying the satellite zenith secant grid of the tables and their data type."""
+        return self._grid.satellite_grid_key
+
+    def get_satellite_cells(self, sat_zenith):
+        """Get the satellite zenith secant grid cells, see :meth:`RayleighInterpolator.get_satellite_cells`."""
+        return self._grid.get_satellite_cells(sat_zenith)
+
+    def __call__(self, sun_zenith, sat_zenith, azidiff, out=None, clip=False, sat_cells=None):
+        """Get the rayleigh reflectances in percent of all the bands, stacked along a new first dimension.
+
+        See :meth:`RayleighInterpolator.__call__` for the arguments, *out*
+        having an additional first dimension of the size of the number of
+        bands.
+
+        """
+        if out is None:
+            out = np.empty((self.n_bands,) + np.shape(sun_zenith), dtype=self.dtype)
+        else:
+            _check_out_array(out, (self.n_bands,) + np.shape(sun_zenith), self.dtype)
+        flat_out = out.reshape((self.n_bands, -1))
+        if len(self._band_index) == self.n_bands:
+            self._grid._interpolate_tables(self._tables, sun_zenith, sat_zenith, azidiff, flat_out, clip, sat_cells)
+            return out
+        res = np.empty((len(self._band_index), flat_out.shape[1]), dtype=self.dtype)
+        self._grid._interpolate_tables(self._tables, sun_zenith, sat_zenith, azidiff, res, clip, sat_cells)
+        flat_out[...] = 0
+        flat_out[self._band_index] = res
+        return out
+
+
+class StaticGeometry:
+    """Satellite zenith angles of a fixed area, with their rayleigh LUT grid cells computed once.
+
+    For geostationary satellites the satellite zenith angles of an area are
+    the same for every time slot. Passing the static geometry of the area to
+    :meth:`Rayleigh.get_reflectance` instead of the satellite zenith angles,
+    the clipping and secant conversion of the satellite zenith angles and
+    the search of their grid cells in the LUT are done once, the following
+    time slots only computing the sun and azimuth dependent parts. The
+    results are the same as with the satellite zenith angles.
+
+    The grid cells are kept per LUT grid and data type, so they are shared by
+    all the bands, atmospheres and aerosol types. With dask arrays the grid
+    cells are computed in a single pass when first requested and persisted,
+    so the following time slots reuse them. Use :func:`get_static_geometry`
+    to reuse the static geometry of an area between calls.
+
+    """
+
+    def __init__(self, sat_zenith, key: Hashable | None = None):
+        """Prepare the static geometry of the satellite zenith angles *sat_zenith*.
+
+        Args:
+            sat_zenith: Satellite zenith angles of the area, numpy or dask array.
+            key: Identifier of the area, e.g. the hash of its area definition.
+
+        """
+        self.sat_zenith = sat_zenith
+        self.key = key if key is not None else id(self)
+        self._cells: dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """Get the shape of the area."""
+        return self.sat_zenith.shape
+
+    def get_satellite_cells(self, interpolator: RayleighInterpolator | StackedRayleighInterpolator) -> tuple:
+        """Get the satellite zenith secant grid cells of the area in the LUT grid of *interpolator*.
+
+        See :meth:`RayleighInterpolator.get_satellite_cells`.
+
+        """
+        grid_key = interpolator.satellite_grid_key
+        with self._lock:
+            cells = self._cells.get(grid_key)
+        if cells is None:
+            cells = self._compute_satellite_cells(interpolator)
+            with self._lock:
+                cells = self._cells.setdefault(grid_key, cells)
+        return cells
+
+    def _compute_satellite_cells(self, interpolator):
+        LOG.debug(f"Computing the satellite zenith grid cells of the static geometry {self.key}")
+        if da is None or not isinstance(self.sat_zenith, da.Array):
+            return interpolator.get_satellite_cells(self.sat_zenith)
+        import dask
+
+        index_meta, weight_meta = interpolator.get_satellite_cells(np.zeros((0,) * self.sat_zenith.ndim))
+        # both parts in one task per chunk, the small cell indices being exact in the data type of the weights
+        cells = da.map_blocks(_get_stacked_satellite_cells, self.sat_zenith, as_graph_constant(interpolator),
+                              meta=np.array((), dtype=weight_meta.dtype), dtype=weight_meta.dtype,
+                              chunks=((2,),) + self.sat_zenith.chunks, new_axis=0)
+        return dask.persist(cells[0].astype(index_meta.dtype), cells[1])
+
+
+def _get_stacked_satellite_cells(sat_zenith, interpolator):
+    index, weight = interpolator.get_satellite_cells(sat_zenith)
+    return np.stack((index.astype(weight.dtype), weight))
+
+
+#: Number of static geometries kept by :func:`get_static_geometry`
+STATIC_GEOMETRY_CACHE_SIZE = 8
+
+_STATIC_GEOMETRIES: OrderedDict[Hashable, StaticGeometry] = OrderedDict()
+_STATIC_GEOMETRIES_LOCK = threading.Lock()
+
+
+def get_static_geometry(key: Hashable, sat_zenith) -> StaticGeometry:
+    """Get the static geometry of the area identified by *key*.
+
+    The static geometry is created from the satellite zenith angles
+    *sat_zenith* the first time, and the same instance, with its already
+    computed grid cells, is returned for the next calls with the same key.
+    With dask arrays, *sat_zenith* is not computed when the static geometry
+    already exists. The :data:`STATIC_GEOMETRY_CACHE_SIZE` most recently used
+    static geometries are kept.
+
+    Args:
+        key: Identifier of the area, e.g. the hash of its area definition.
+        sat_zenith: Satellite zenith angles of the area.
+
+    """
+    with _STATIC_GEOMETRIES_LOCK:
+        static_geometry = _STATIC_GEOMETRIES.get(key)
+        if static_geometry is None or static_geometry.shape != sat_zenith.shape:
+            static_geometry = _STATIC_GEOMETRIES[key] = StaticGeometry(sat_zenith, key=key)
+        _STATIC_GEOMETRIES.move_to_end(key)
+        while len(_STATIC_GEOMETRIES) > STATIC_GEOMETRY_CACHE_SIZE:
+            _STATIC_GEOMETRIES.popitem(last=False)
+    return static_geometry
+
+
+class DecimatedRayleighInterpolator:
+    """Interpolation of a rayleigh LUT on a coarse grid of tie points, upsampled bilinearly.
+
+    The sun-satellite angles are smooth fields, so the LUT is interpolated at
+    every *decimation*-th pixel along the last two dimensions of each block
+    only (always including the last row and column of the block) and the
+    reflectances are upsampled bilinearly back to the full resolution.
+
+    The accuracy of the upsampling is checked against the LUT at the centre of
+    each cell of tie points. The pixels of the cells where the difference is
+    larger than *tolerance*, or where the angles of a tie point are missing,
+    are interpolated from the LUT at full resolution.
+
+    """
+
+    def __init__(self, interpolator: RayleighInterpolator | StackedRayleighInterpolator,
+                 decimation: int, tolerance: float = DEFAULT_ANGLE_DECIMATION_TOLERANCE):
+        """Wrap *interpolator* to use every *decimation*-th pixel as tie point.
+
+        Args:
+            interpolator: Interpolator of one band or of stacked bands.
+            decimation: Distance in pixels between the tie points.
+            tolerance: Largest accepted difference, in reflectance percent,
+                between the upsampled and the fully interpolated reflectances
+                at the centre of the tie point cells.
+
+        """
+        if decimation < 1:
+            raise ValueError(f"The angle decimation must be a positive integer, not {decimation}")
+        self._interpolator = interpolator
+        self.dtype = interpolator.dtype
+        self.decimation = int(decimation)
+        self.tolerance = tolerance
+
+    def __dask_tokenize__(self):
+        """Get a token identifying the tables and the decimation."""
+        return (DecimatedRayleighInterpolator.__name__, self._interpolator.__dask_tokenize__(),
+                self.decimation, self.tolerance)
+
+    def __call__(self, sun_zenith, sat_zenith, azidiff, clip=False):
+        """Get the rayleigh reflectances in percent at the given angles in degrees.
+
+        See :meth:`RayleighInterpolator.__call__`. Arrays with less than two
+        dimensions, or blocks too small to hold two tie points along both
+        dimensions, are interpolated at full resolution.
+
+        """
+        shape = np.shape(sun_zenith)
+        if self.decimation == 1 or len(shape) < 2 or min(shape[-2:]) <= self.decimation:
+            return self._interpolator(sun_zenith, sat_zenith, azidiff, clip=clip)
+        angles = (np.asarray(sun_zenith), np.asarray(sat_zenith), np.asarray(azidiff))
+
+        rows = _get_tie_point_indices(shape[-2], self.decimation)
+        cols = _get_tie_point_indices(shape[-1], self.decimation)
+        tie_points = np.ix_(rows, cols)
+        res = self._upsample(self._interpolator(*(angle[..., tie_points[0], tie_points[1]] for angle in angles),
+                                                clip=clip),
+                             rows, cols, shape[-2:])
+
+        centres = np.ix_((rows[:-1] + rows[1:]) // 2, (cols[:-1] + cols[1:]) // 2)
+        exact = self._interpolator(*(angle[..., centres[0], centres[1]] for angle in angles), clip=clip)
+        error = np.abs(exact - res[..., centres[0], centres[1]])
+        error = error.reshape((-1,) + error.shape[-2:]).max(axis=0)
+        bad_cells = ~(error <= self.tolerance) | self._get_cells_with_missing_angles(angles, tie_points)
+        LOG.debug("Largest error of the upsampled rayleigh reflectances: %f, %d of %d cells interpolated "
+                  "at full resolution", np.nanmax(np.where(bad_cells, 0, error)), bad_cells.sum(), bad_cells.size)
+        if bad_cells.any():
+            row_cells, _ = _get_upsampling_cells_and_weights(rows, shape[-2], self.dtype)
+            col_cells, _ = _get_upsampling_cells_and_weights(cols, shape[-1], self.dtype)
+            mask = bad_cells[row_cells[:, np.newaxis], col_cells]
+            res[..., mask] = self._interpolator(*(angle[..., mask] for angle in angles), clip=clip)
+        return res
+
+    def _upsample(self, tie_values, rows, cols, shape):
+        row_cells, row_weights = _get_upsampling_cells_and_weights(rows, shape[0], self.dtype)
+        col_cells, col_weights = _get_upsampling_cells_and_weights(cols, shape[1], self.dtype)
+        res = tie_values[..., col_cells] * (1 - col_weights) + tie_values[..., col_cells + 1] * col_weights
+        row_weights = row_weights[:, np.newaxis]
+        return res[..., row_cells, :] * (1 - row_weights) + res[..., row_cells + 1, :] * row_weights
+
+    @staticmethod
+    def _get_cells_with_missing_angles(angles, tie_points):
+        missing = np.zeros(np.broadcast(*tie_points).shape, dtype=bool)
+        for angle in angles:
+            missing |= np.isnan(angle[..., tie_points[0], tie_points[1]]).reshape((-1,) + missing.shape).any(axis=0)
+        return missing[:-1, :-1] | missing[1:, :-1] | missing[:-1, 1:] | missing[1:, 1:]
+
+
+def _get_tie_point_indices(size: int, decimation: int) -> np.ndarray:
+    return np.unique(np.append(np.arange(0, size, decimation), size - 1))
+
+
+def _get_upsampling_cells_and_weights(tie_indices: np.ndarray, size: int, dtype) -> tuple[np.ndarray, np.ndarray]:
+    pixels = np.arange(size)
+    cells = np.clip(np.searchsorted(tie_indices, pixels, side='right') - 1, 0, tie_indices.size - 2)
+    weights = (pixels - tie_indices[cells]) / (tie_indices[cells + 1] - tie_indices[cells])
+    return cells, weights.astype(dtype)
+
+
+def _load_rayleigh_lut(lut_filename: Path, wvl: float, dtype: np.dtype, key: tuple) -> RayleighLUT:
+    """Read the rayleigh LUT at the wavelength *wvl*, from shared memory if enabled."""
+    if not shared_memory_enabled():
+        return _read_rayleigh_lut(lut_filename, wvl, dtype)
+    arrays = SHARED_ARRAY_POOL.get(("rayleigh",) + key, lambda: _read_rayleigh_lut(lut_filename, wvl, dtype)._asdict())
+    return RayleighLUT(**arrays)
+
+
+def _read_rayleigh_lut(lut_filename: Path, wvl: float, dtype: np.dtype) -> RayleighLUT:
     with h5py.File(lut_filename, 'r') as h5f:
-        rayleigh_refl = h5f["reflectance"]
         wvl_coord = h5f["wavelengths"][:]
         if not wvl_coord.min() < wvl < wvl_coord.max():
             raise ValueError("Wavelength out of range for available LUT wavelengths")
         wavelength_index, wavelength_factor = _get_wavelength_index_and_factor(wvl_coord, wvl)
+        rayleigh_refl = h5f["reflectance"]
         raylwvl = (wavelength_factor * rayleigh_refl[wavelength_index - 1, :, :, :] +
                    (1 - wavelength_factor) * rayleigh_refl[wavelength_index, :, :, :])
-    return raylwvl
+        rayleigh_lut = RayleighLUT(
+            raylwvl.astype(dtype, copy=False),
+            h5f['sun_zenith_secant'][:].astype(dtype, copy=False),
+            h5f['azimuth_difference'][:].astype(dtype, copy=False),
+            h5f['satellite_zenith_secant'][:].astype(dtype, copy=False),
+        )
+    for arr in rayleigh_lut:
+        arr.flags.writeable = False
+    return rayleigh_lut
 
 
-def _get_wavelength_index_and_factor(wvl_coord, wvl):
-    wavelength_index = np.searchsorted(wvl_coord, wvl)
-    wvl1 = wvl_coord[wavelength_index - 1]
-    wvl2 = wvl_coord[wavelength_index]
-    wavelength_factor = (wvl2 - wvl) / (wvl2 - wvl1)
-    return wavelength_index, wavelength_factor
+#: Cache of rayleigh LUTs shared by all :class:`Rayleigh` instances
+RAYLEIGH_LUT_CACHE = RayleighLUTCache()
+
+#: Name of the index file of a rayleigh band cache directory
+RAYLEIGH_BAND_CACHE_INDEX = "index.json"
+
+_BAND_CACHES: dict[str, tuple[tuple[int, int], RayleighBandCache]] = {}
+_BAND_CACHES_LOCK = threading.Lock()
+
+
+def get_rayleigh_band_cache_dir(platform_name: str, sensor: str, atmosphere: str = 'us-standard',
+                                aerosol_type: str = 'marine_clean_aerosol',
+                                cache_dir: str | Path | None = None) -> Path:
+    """Get the directory of the rayleigh band cache of a platform, sensor, atmosphere and aerosol type.
+
+    Args:
+        cache_dir: Root directory of the band caches. Defaults to the
+            configured ``rayleigh_band_cache_dir``, or the ``band_cache``
+            subdirectory of ``rayleigh_dir``.
+
+    """
+    if cache_dir is None:
+        options = get_config()
+        cache_dir = options.get('rayleigh_band_cache_dir') or Path(options['rayleigh_dir']) / "band_cache"
+    name = f"{platform_name}-{sensor.replace('/', '')}_{aerosol_type}_{atmosphere}".replace(' ', '_')
+    return Path(cache_dir) / name
+
+
+class RayleighBandCache:
+    """Precomputed rayleigh reflectance tables of the bands of one sensor.
+
+    The tables are created by :func:`create_rayleigh_band_cache` as one
+    ``.npy`` file per band, interpolated to the effective wavelength of the
+    band, together with the coordinates of the grid. Reading them needs
+    neither the RSR nor the LUT files, and the tables are memory-mapped so only
+    the parts actually used are read from disk.
+
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        """Read the index of the band cache in *cache_dir*."""
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / RAYLEIGH_BAND_CACHE_INDEX, 'r') as fpt:
+            index = json.load(fpt)
+        self.sensor = index["sensor"]
+        self.lut_version = index["lut_version"]
+        self.rsr_data_version = index["rsr_data_version"]
+        self.dtype = np.dtype(index["dtype"])
+        self.bands: dict[str, dict] = index["bands"]
+        self._coords = tuple(np.load(self.cache_dir / index["coordinates"][name])
+                             for name in RayleighLUT._fields[1:])
+        self._interpolators: dict[tuple[str, str], RayleighInterpolator] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, band_name) -> bool:
+        """Check if the cache has an entry for the band *band_name*."""
+        return self._get_band_name(band_name) is not None
+
+    def _get_band_name(self, band_name):
+        if not isinstance(band_name, str):
+            return None
+        if band_name in self.bands:
+            return band_name
+        band_name = BANDNAMES.get(self.sensor, BANDNAMES['generic']).get(band_name, band_name)
+        return band_name if band_name in self.bands else None
+
+    def supports_dtype(self, dtype) -> bool:
+        """Check if the tables of the cache are precise enough for data of type *dtype*."""
+        return np.can_cast(dtype, self.dtype, casting='safe')
+
+    def get_wavelength(self, band_name: str) -> float:
+        """Get the effective wavelength in nanometers of the band *band_name*."""
+        return self.bands[self._get_band_name(band_name)]["wavelength"]
+
+    def get_interpolator(self, band_name: str, dtype=np.float64) -> RayleighInterpolator:
+        """Get the interpolator of the reflectance table of the band *band_name*.
+
+        The tables are converted to *dtype*, which should be supported by
+        the cache (see :meth:`supports_dtype`) not to lose precision.
+
+        Raises:
+            KeyError: if the band is not in the cache.
+            ValueError: if the wavelength of the band is outside of the range
+                of the LUT.
+
+        """
+        cached_name = self._get_band_name(band_name)
+        if cached_name is None:
+            raise KeyError(f"Band {band_name} is not in the rayleigh band cache {self.cache_dir}")
+        band = self.bands[cached_name]
+        if band["filename"] is None:
+            raise ValueError("Wavelength out of range for available LUT wavelengths")
+        dtype = np.dtype(dtype)
+        key = (cached_name, dtype.str)
+        with self._lock:
+            interpolator = self._interpolators.get(key)
+        if interpolator is None:
+            reflectance = np.load(self.cache_dir / band["filename"], mmap_mode='r')
+            lut = RayleighLUT(*(arr.astype(dtype, copy=False) for arr in (reflectance,) + self._coords))
+            for arr in lut:
+                if arr.flags.writeable:
+                    arr.flags.writeable = False
+            interpolator = RayleighInterpolator(lut, key=(str(self.cache_dir),) + key)
+            with self._lock:
+                interpolator = self._interpolators.setdefault(key, interpolator)
+        return interpolator
+
+
+def get_rayleigh_band_cache(platform_name: str, sensor: str, atmosphere: str = 'us-standard',
+                            aerosol_type: str = 'marine_clean_aerosol',
+                            cache_dir: str | Path | None = None) -> RayleighBandCache | None:
+    """Get the rayleigh band cache of a platform, sensor, atmosphere and aerosol type.
+
+    The caches are read once per process and read again if their index is
+    modified. See :func:`get_rayleigh_band_cache_dir` for *cache_dir*.
+
+    Returns: The band cache, or None if there is none or if it was made from
+        other versions of the LUT or RSR data than the ones of this version of
+        pyspectral.
+
+    """
+    band_cache_dir = get_rayleigh_band_cache_dir(platform_name, sensor, atmosphere, aerosol_type, cache_dir)
+    index_filename = band_cache_dir / RAYLEIGH_BAND_CACHE_INDEX
+    try:
+        stat = index_filename.stat()
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _BAND_CACHES_LOCK:
+        cached = _BAND_CACHES.get(str(band_cache_dir))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            band_cache = RayleighBandCache(band_cache_dir)
+        except (OSError, ValueError, KeyError) as err:
+            LOG.warning(f"Ignoring unreadable rayleigh band cache {band_cache_dir}: {err}")
+            return None
+        if (band_cache.lut_version != ATM_CORRECTION_LUT_VERSION[aerosol_type]['version'] or
+                band_cache.rsr_data_version != RSR_DATA_VERSION):
+            LOG.info(f"Ignoring outdated rayleigh band cache {band_cache_dir}")
+            return None
+        _BAND_CACHES[str(band_cache_dir)] = (stamp, band_cache)
+    return band_cache
+
+
+def create_rayleigh_band_cache(platform_name: str, sensor: str, atmosphere: str = 'us-standard',
+                               aerosol_type: str = 'marine_clean_aerosol',
+                               cache_dir: str | Path | None = None,
+                               band_names: list[str] | None = None,
+                               dtype=np.float32) -> Path:
+    """Write the rayleigh reflectance tables of the bands of a sensor to a band cache.
+
+    The tables of the LUT of *atmosphere* and *aerosol_type* are interpolated
+    to the effective wavelengths of the bands and saved as ``.npy`` files,
+    picked up by :class:`Rayleigh` instead of reading the RSR and LUT files.
+    The band cache directory can be copied to other machines having the same
+    configuration.
+
+    Args:
+        platform_name: Name of the satellite platform.
+        sensor: Name of the sensor.
+        atmosphere: Name of the standard atmosphere, see
+            :data:`pyspectral.utils.ATMOSPHERES`.
+        aerosol_type: Name of the aerosol type, see
+            :data:`pyspectral.utils.AEROSOL_TYPES`.
+        cache_dir: Root directory of the band caches, see
+            :func:`get_rayleigh_band_cache_dir`.
+        band_names: Names of the bands to write. Defaults to all the bands of
+            the sensor.
+        dtype: Data type of the tables.
+
+    Returns: The directory of the band cache.
+
+    """
+    rayl = Rayleigh(platform_name, sensor, atmosphere=atmosphere, aerosol_type=aerosol_type, band_cache=False)
+    if band_names is None:
+        band_names = RelativeSpectralResponse(platform_name, rayl.sensor).band_names
+    band_cache_dir = get_rayleigh_band_cache_dir(platform_name, rayl.sensor, atmosphere, aerosol_type, cache_dir)
+    band_cache_dir.mkdir(parents=True, exist_ok=True)
+
+    dtype = np.dtype(dtype)
+    lut = None
+    bands = {}
+    for band_name in band_names:
+        wvl, _ = rayl._get_effective_wavelength_and_band_name(band_name)
+        try:
+            band_lut = RAYLEIGH_LUT_CACHE.get(rayl.reflectance_lut_filename, wvl, dtype)
+        except ValueError:
+            LOG.debug("Band %s is outside of the rayleigh LUT wavelength range", band_name)
+            bands[band_name] = {"wavelength": wvl, "filename": None}
+            continue
+        lut = band_lut
+        filename = "reflectance_{0}.npy".format(band_name.replace(os.sep, '_'))
+        _save_npy_atomically(band_cache_dir / filename, band_lut.reflectance)
+        bands[band_name] = {"wavelength": wvl, "filename": filename}
+    if lut is None:
+        azidiff, satz_sec, sunz_sec = get_reflectance_lut_from_file(rayl.reflectance_lut_filename)
+        lut = RayleighLUT(None, sunz_sec.astype(dtype), azidiff.astype(dtype), satz_sec.astype(dtype))
+
+    coordinates = {}
+    for name, coord in zip(RayleighLUT._fields[1:], lut[1:]):
+        coordinates[name] = f"{name}.npy"
+        _save_npy_atomically(band_cache_dir / coordinates[name], coord)
+
+    index = {
+        "platform_name": platform_name,
+        "sensor": rayl.sensor,
+        "atmosphere": atmosphere,
+        "aerosol_type": aerosol_type,
+        "lut_version": ATM_CORRECTION_LUT_VERSION[aerosol_type]['version'],
+        "rsr_data_version": RSR_DATA_VERSION,
+        "dtype": dtype.str,
+        "coordinates": coordinates,
+        "bands": bands,
+    }
+    # the index is written last, so the cache is only used once it is complete
+    tmp_filename = band_cache_dir / f"{RAYLEIGH_BAND_CACHE_INDEX}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'w') as fpt:
+        json.dump(index, fpt, indent=2)
+    os.replace(tmp_filename, band_cache_dir / RAYLEIGH_BAND_CACHE_INDEX)
+    LOG.info(f"Rayleigh band cache with {len(bands)} bands written to {band_cache_dir}")
+    return band_cache_dir
+
+
+def _save_npy_atomically(filename: Path, arr: np.ndarray) -> None:
+    tmp_filename = filename.with_name(f"{filename.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_filename, 'wb') as fh:
+            np.save(fh, np.ascontiguousarray(arr))
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if tmp_filename.exists():
+            os.remove(tmp_filename)
+        raise
 
 
 def get_reflectance_lut_from_file(lut_filename):
@@ -336,18 +1428,21 @@ def get_reflectance_lut_from_file(lut_filename):
     return azidiff, satellite_zenith_secant, sun_zenith_secant
 
 
-def check_and_download(dry_run=False, aerosol_types=None):
+def check_and_download(dry_run=False, aerosol_types=None, atmospheres=None):
     """Download atm correction LUT tables if they are not up-to-date already.
 
     Do a check for the version of the atmospheric correction LUTs and attempt
-    downloading only if needed.
+    downloading only if needed. With a download manifest configured, only the
+    LUTs of the given *atmospheres* are downloaded, see
+    :func:`pyspectral.utils.download_luts`.
 
     """
     aerosol_types = aerosol_types or AEROSOL_TYPES
     needed_aerosol_types = []
     for aerosol_type in aerosol_types:
         atmcorr = RayleighConfigBaseClass(aerosol_type)
-        if atmcorr.lutfiles_version_uptodate:
+        fetched = atmospheres is not None and lut_files_fetched(aerosol_type, atmospheres)
+        if atmcorr.lutfiles_version_uptodate or fetched:
             LOG.info("Atm correction LUTs, for aerosol distribution %s, already the latest!",
                      aerosol_type)
         else:
@@ -355,4 +1450,4 @@ def check_and_download(dry_run=False, aerosol_types=None):
 
     # Download
     if needed_aerosol_types:
-        download_luts(aerosol_types=needed_aerosol_types, dry_run=dry_run)
+        download_luts(aerosol_types=needed_aerosol_types, dry_run=dry_run, atmospheres=atmospheres)
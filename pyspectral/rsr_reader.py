@@ -3,8 +3,12 @@ from __future__ import annotations
 
 import logging
 import os
-from collections.abc import Iterator
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, ItemsView, Iterator, Mapping, ValuesView
+from functools import partial
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, TypedDict
 
 import numpy as np
@@ -12,22 +16,29 @@ import numpy.typing as npt
 
 from pyspectral.bandnames import BANDNAMES
 from pyspectral.config import get_config
+from pyspectral.shared_arrays import SHARED_ARRAY_POOL, shared_memory_enabled
+from pyspectral.spectral_index import SpectralIndex, get_spectral_index
 from pyspectral.utils import (
     INSTRUMENTS,
     RSR_DATA_VERSION,
     RSR_DATA_VERSION_FILENAME,
     WAVE_LENGTH,
     WAVE_NUMBER,
+    WAVE_NUMBER_SI_SCALE,
+    WAVE_NUMBER_UNIT,
     check_and_adjust_instrument_name,
     convert2str,
     convert2wavenumber,
     download_rsr,
-    get_bandname_from_wavelength,
     get_central_wave,
+    rsr_files_fetched,
 )
 
 LOG = logging.getLogger(__name__)
 
+#: Default memory cap, in bytes, of the process-wide RSR cache
+DEFAULT_RSR_CACHE_SIZE = 256 * 1024 ** 2
+
 OSCAR_PLATFORM_NAMES = {'eos-2': 'EOS-Aqua',
                         'meteosat-11': 'Meteosat-11',
                         'meteosat-10': 'Meteosat-10',
@@ -43,27 +54,369 @@ class RSRResponseDict(TypedDict):
     central_wavelength: float
 
 
+_DETECTOR_KEYS = {"response", "wavelength", "central_wavelength"}
+
+#: Spectral constants precomputed for each band and detector and stored in the RSR files:
+#:
+#: - ``integral``: integral of the response over the wavelength in µm
+#: - ``integral_wavenumber``: integral of the response over the wavenumber in cm-1
+#: - ``rayleigh_wavelength``: central wavelength in µm weighted by 1/λ⁴, as used for Rayleigh scattering
+#: - ``central_wavenumber``: central wavenumber in cm-1
+#: - ``solar_flux``: in-band solar flux in W/m² at 1 AU, for a spectrum resolution of
+#:   :data:`SOLAR_FLUX_DLAMBDA` µm
+#: - ``fwhm``: full width at half maximum in µm
+#: - ``energy_bounds``: wavelengths in µm bounding 1-99% of the integrated energy
+SPECTRAL_METADATA = ("integral", "integral_wavenumber", "rayleigh_wavelength", "central_wavenumber",
+                     "solar_flux", "fwhm", "energy_bounds")
+
+#: Resolution in µm of the solar spectrum used for the precomputed in-band solar flux
+SOLAR_FLUX_DLAMBDA = 0.0005
+
+
+class BandResponse(Mapping):
+    """Responses of all the detectors of a band sharing the same spectral grid.
+
+    The responses are held in one ``(n_detectors, n_samples)`` matrix so
+    calculations for all detectors are done in a single vectorized call. For
+    compatibility, the band is also a read-only mapping of the detector names
+    to dictionaries with the ``response``, ``wavelength`` and
+    ``central_wavelength`` of each detector, like the bands of
+    :class:`RSRDict`. These detector dictionaries are read-only views of the
+    arrays of the band.
+
+    The same band in wavenumber space is given by :meth:`to_wavenumber`. Its
+    detector dictionaries hold the ``wavenumber`` and ``central_wavenumber``
+    instead of the ``wavelength``, like after
+    :meth:`RelativeSpectralResponse.convert`.
+
+    The spectral constants listed in :data:`SPECTRAL_METADATA` are available
+    per detector with :meth:`get_metadata` or the corresponding properties.
+    They are taken from the RSR file when they were stored there, and are
+    otherwise computed the first time they are requested.
+
+    """
+
+    __slots__ = ("detector_names", "grid", "wavespace", "responses", "central_wavelengths",
+                 "_central_wavenumbers", "_metadata", "_views", "_wavenumber_band")
+
+    def __init__(self, detector_names: list[str], grid: np.ndarray, responses: np.ndarray,
+                 central_wavelengths: npt.ArrayLike, wavespace: str = WAVE_LENGTH,
+                 central_wavenumbers: npt.ArrayLike | None = None,
+                 metadata: Mapping[str, npt.ArrayLike] | None = None):
+        """Store the shared grid and the responses and central wavelengths of the detectors.
+
+        The grid is in µm for the wavelength space and in cm-1 for the
+        wavenumber space, in which case the central wavenumbers are needed too.
+        *metadata* holds the precomputed spectral constants of the detectors
+        (see :data:`SPECTRAL_METADATA`), if any.
+
+        """
+        self.detector_names = tuple(detector_names)
+        self.grid = grid
+        self.wavespace = wavespace
+        self.responses = responses
+        self.central_wavelengths = np.asarray(central_wavelengths)
+        self._central_wavenumbers = None if central_wavenumbers is None else np.asarray(central_wavenumbers)
+        if self.responses.shape != (len(self.detector_names), self.grid.size):
+            raise ValueError(f"Responses of shape {self.responses.shape} don't match "
+                             f"{len(self.detector_names)} detectors and a grid of {self.grid.size} samples")
+        if (wavespace == WAVE_NUMBER) == (self._central_wavenumbers is None):
+            raise ValueError("Central wavenumbers must be provided in wavenumber space only")
+        for arr in (self.grid, self.responses, self.central_wavelengths, self._central_wavenumbers):
+            if arr is not None:
+                arr.flags.writeable = False
+        self._metadata: dict[str, np.ndarray] = {}
+        for name, value in (metadata or {}).items():
+            self._set_metadata(name, value)
+        self._views: dict[str, Mapping] = {}
+        self._wavenumber_band: BandResponse | None = None
+
+    @classmethod
+    def from_detectors(
+            cls,
+            band_rsr: dict[str, RSRResponseDict],
+            metadata: Mapping[str, npt.ArrayLike] | None = None,
+    ) -> BandResponse | dict[str, RSRResponseDict]:
+        """Create the band from the dictionaries of each detector.
+
+        The detector dictionaries are returned unchanged if the detectors
+        don't share the same wavelength grid.
+
+        """
+        detector_names = list(band_rsr)
+        if not detector_names or any(det_rsr.keys() != _DETECTOR_KEYS for det_rsr in band_rsr.values()):
+            return band_rsr
+        wavelength = band_rsr[detector_names[0]]["wavelength"]
+        for det_rsr in band_rsr.values():
+            if (det_rsr["wavelength"].dtype != wavelength.dtype or
+                    det_rsr["response"].shape != wavelength.shape or
+                    not np.array_equal(det_rsr["wavelength"], wavelength)):
+                return band_rsr
+        responses = np.stack([det_rsr["response"] for det_rsr in band_rsr.values()])
+        central_wavelengths = [det_rsr["central_wavelength"] for det_rsr in band_rsr.values()]
+        return cls(detector_names, wavelength, responses, central_wavelengths, metadata=metadata)
+
+    @property
+    def wavelength(self) -> np.ndarray:
+        """Get the wavelength grid in µm."""
+        if self.wavespace != WAVE_LENGTH:
+            raise AttributeError("Band responses are in wavenumber space")
+        return self.grid
+
+    @property
+    def wavenumber(self) -> np.ndarray:
+        """Get the wavenumber grid in cm-1."""
+        if self.wavespace != WAVE_NUMBER:
+            raise AttributeError("Band responses are in wavelength space")
+        return self.grid
+
+    def __getitem__(self, detector_name: str) -> Mapping:
+        """Get a read-only dictionary view of the responses of one detector."""
+        view = self._views.get(detector_name)
+        if view is None:
+            try:
+                idx = self.detector_names.index(detector_name)
+            except ValueError:
+                raise KeyError(detector_name) from None
+            if self.wavespace == WAVE_LENGTH:
+                view = MappingProxyType({
+                    "response": self.responses[idx],
+                    "wavelength": self.grid,
+                    "central_wavelength": self.central_wavelengths[idx],
+                })
+            else:
+                view = MappingProxyType({
+                    "response": self.responses[idx],
+                    "central_wavelength": self.central_wavelengths[idx],
+                    "wavenumber": self.grid,
+                    "central_wavenumber": self._central_wavenumbers[idx],
+                })
+            self._views[detector_name] = view
+        return view
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the detector names."""
+        return iter(self.detector_names)
+
+    def __len__(self) -> int:
+        """Get the number of detectors."""
+        return len(self.detector_names)
+
+    def __repr__(self) -> str:
+        """Represent the band without its arrays."""
+        unit = "µm" if self.wavespace == WAVE_LENGTH else "cm-1"
+        return (f"<BandResponse: {len(self.detector_names)} detectors, {self.grid.size} samples, "
+                f"{self.grid[0]:.4f}-{self.grid[-1]:.4f} {unit}>")
+
+    @property
+    def nbytes(self) -> int:
+        """Get the size of the arrays of the band in bytes."""
+        return self.grid.nbytes + self.responses.nbytes + self.central_wavelengths.nbytes
+
+    def integral(self) -> np.ndarray:
+        """Get the integral of the spectral response function of each detector."""
+        integral = self._metadata.get("integral")
+        if integral is None:
+            from scipy.integrate import trapezoid
+
+            integral = self._set_metadata("integral", trapezoid(self.responses, self.grid, axis=-1))
+        return integral
+
+    def get_central_wave(self, weight: npt.ArrayLike = 1.0) -> np.ndarray:
+        """Calculate the (weighted) central wavelength or wavenumber of each detector.
+
+        See :func:`pyspectral.utils.get_central_wave` for the meaning of *weight*.
+
+        """
+        from scipy.integrate import trapezoid
+
+        weighted_responses = self.responses * weight
+        return (trapezoid(weighted_responses * self.grid, self.grid, axis=-1) /
+                trapezoid(weighted_responses, self.grid, axis=-1))
+
+    def get_metadata(self, name: str) -> np.ndarray:
+        """Get one of the :data:`SPECTRAL_METADATA` constants for each detector.
+
+        The value stored in the RSR file is used if available, otherwise it is
+        computed and kept for the next requests. Only available in wavelength
+        space.
+
+        """
+        if self.wavespace != WAVE_LENGTH:
+            raise ValueError("Spectral metadata are only available for band responses in wavelength space")
+        if name not in SPECTRAL_METADATA:
+            raise KeyError(f"Unknown spectral metadata: {name}")
+        value = self._metadata.get(name)
+        if value is None:
+            value = self._set_metadata(name, self._compute_metadata(name))
+        return value
+
+    @property
+    def stored_metadata(self) -> dict[str, np.ndarray]:
+        """Get the spectral metadata available without computing them."""
+        return dict(self._metadata)
+
+    @property
+    def central_wavenumbers(self) -> np.ndarray:
+        """Get the central wavenumber of each detector in cm-1."""
+        if self.wavespace == WAVE_NUMBER:
+            return self._central_wavenumbers
+        return self.get_metadata("central_wavenumber")
+
+    @property
+    def rayleigh_wavelengths(self) -> np.ndarray:
+        """Get the 1/λ⁴-weighted central wavelength of each detector in µm."""
+        return self.get_metadata("rayleigh_wavelength")
+
+    @property
+    def solar_fluxes(self) -> np.ndarray:
+        """Get the in-band solar flux of each detector in W/m²."""
+        return self.get_metadata("solar_flux")
+
+    @property
+    def fwhms(self) -> np.ndarray:
+        """Get the full width at half maximum of each detector in µm."""
+        return self.get_metadata("fwhm")
+
+    @property
+    def energy_bounds(self) -> np.ndarray:
+        """Get the wavelengths bounding 1-99% of the integrated energy of each detector, as (n_detectors, 2)."""
+        return self.get_metadata("energy_bounds")
+
+    def _set_metadata(self, name: str, value: npt.ArrayLike) -> np.ndarray:
+        value = np.asarray(value)
+        value.flags.writeable = False
+        self._metadata[name] = value
+        return value
+
+    def _compute_metadata(self, name: str) -> np.ndarray:
+        from pyspectral.utils import get_bounds_integrated_energy, get_fullwidth_halfmax
+
+        if name == "integral":
+            return self.integral()
+        if name == "integral_wavenumber":
+            return self.to_wavenumber().integral()
+        if name == "rayleigh_wavelength":
+            return self.get_central_wave(weight=1. / self.grid ** 4)
+        if name == "central_wavenumber":
+            return self.to_wavenumber().central_wavenumbers
+        if name == "solar_flux":
+            from pyspectral.solar import SolarIrradianceSpectrum
+
+            return SolarIrradianceSpectrum(dlambda=SOLAR_FLUX_DLAMBDA).inband_solarflux_detectors(self)
+        if name == "fwhm":
+            fwhms = []
+            for response in self.responses:
+                try:
+                    fwhms.append(get_fullwidth_halfmax(response, self.grid))
+                except ValueError:
+                    fwhms.append(np.nan)
+            return np.array(fwhms)
+        bounds = []
+        for response in self.responses:
+            try:
+                bounds.append(get_bounds_integrated_energy(response, self.grid))
+            except IndexError:
+                bounds.append((np.nan, np.nan))
+        return np.array(bounds)
+
+    def to_wavenumber(self) -> BandResponse:
+        """Get the band in wavenumber space.
+
+        The conversion is done once for all the detectors and the result is
+        kept, so it is shared by everyone using this band. The responses are
+        reversed views of the responses in wavelength space.
+
+        """
+        if self.wavespace == WAVE_NUMBER:
+            return self
+        wavenumber_band = self._wavenumber_band
+        if wavenumber_band is None:
+            from scipy.integrate import trapezoid
+
+            # micro meters to cm
+            wavenumber = (1. / (1e-4 * self.grid))[::-1]
+            responses = self.responses[:, ::-1]
+            central_wavenumbers = self._metadata.get("central_wavenumber")
+            if central_wavenumbers is None:
+                central_wavenumbers = (trapezoid(responses * wavenumber, wavenumber, axis=-1) /
+                                       trapezoid(responses, wavenumber, axis=-1))
+            metadata = {}
+            if "integral_wavenumber" in self._metadata:
+                metadata["integral"] = self._metadata["integral_wavenumber"]
+            wavenumber_band = BandResponse(self.detector_names, wavenumber, responses, self.central_wavelengths,
+                                           wavespace=WAVE_NUMBER, central_wavenumbers=central_wavenumbers,
+                                           metadata=metadata)
+            self._wavenumber_band = wavenumber_band
+        return wavenumber_band
+
+
+class LazyBand:
+    """Placeholder for the responses of a band which are loaded on first access."""
+
+    __slots__ = ("_load", "_lock", "_value", "central_wavelength")
+
+    def __init__(self, load: Callable[[], dict[str, RSRResponseDict]], central_wavelength: float | None = None):
+        """Store the function loading the detector responses of the band.
+
+        The *central_wavelength* of the first detector, if known without
+        loading the band, is kept to search the bands by wavelength.
+        """
+        self._load = load
+        self.central_wavelength = central_wavelength
+        self._lock = threading.Lock()
+        self._value: dict[str, RSRResponseDict] | None = None
+
+    def load(self) -> dict[str, RSRResponseDict]:
+        """Load the detector responses of the band, only reading them the first time."""
+        with self._lock:
+            if self._value is None:
+                self._value = self._load()
+            return self._value
+
+    def __repr__(self) -> str:
+        """Represent the placeholder without loading the band."""
+        return "<LazyBand: not loaded>"
+
+
 class RSRDict(dict):
-    """Helper dict-like class to handle multiple names for band keys."""
+    """Helper dict-like class to handle multiple names for band keys.
+
+    Values may be :class:`LazyBand` placeholders, in which case the band is
+    loaded the first time it is accessed with ``__getitem__``/``get`` (or
+    through ``values()``/``items()``) and then kept in the dictionary. Band
+    names can be listed without loading any band data.
+
+    The responses read from an RSR file have the path, modification time and
+    size of the file as *file_key*, identifying them e.g. for
+    :func:`~pyspectral.spectral_index.get_spectral_index`.
+
+    """
 
-    def __init__(self, instrument: str):
+    def __init__(self, instrument: str, file_key: tuple[str, int, int] | None = None):
         """Initialize dict and primary instrument name."""
         self.instrument = instrument
+        self.file_key = file_key
         dict.__init__(self)
 
     def __getitem__(self, key):
         """Get value either directly or fallback to pre-configured 'standard' names."""
-        try:
-            val = dict.__getitem__(self, key)
-        except KeyError:
-            if self.instrument in BANDNAMES and key in BANDNAMES[self.instrument]:
-                val = dict.__getitem__(self, BANDNAMES[self.instrument][key])
-            elif key in BANDNAMES['generic']:
-                val = dict.__getitem__(self, BANDNAMES['generic'][key])
-            else:
-                raise KeyError(f'Band not found in RSR for {self.instrument}: {key}')
+        band_name = self._get_band_name(key)
+        val = dict.__getitem__(self, band_name)
+        if isinstance(val, LazyBand):
+            val = val.load()
+            dict.__setitem__(self, band_name, val)
         return val
 
+    def _get_band_name(self, key):
+        if dict.__contains__(self, key):
+            return key
+        if self.instrument in BANDNAMES and key in BANDNAMES[self.instrument]:
+            return BANDNAMES[self.instrument][key]
+        if key in BANDNAMES['generic']:
+            return BANDNAMES['generic'][key]
+        raise KeyError(f'Band not found in RSR for {self.instrument}: {key}')
+
     def get(self, key, default=None):
         """Get value either directly or fallback to pre-configured 'standard' names."""
         try:
@@ -71,6 +424,204 @@ class RSRDict(dict):
         except KeyError:
             return default
 
+    def values(self):
+        """Get the band values, loading any band not loaded yet."""
+        return ValuesView(self)
+
+    def items(self):
+        """Get the band names and values, loading any band not loaded yet."""
+        return ItemsView(self)
+
+    def is_loaded(self, key) -> bool:
+        """Check if the data of a band has been loaded already."""
+        return not isinstance(dict.__getitem__(self, self._get_band_name(key)), LazyBand)
+
+    def get_central_wavelength(self, key) -> float:
+        """Get the central wavelength of the first detector of a band, without loading the band if known."""
+        val = dict.__getitem__(self, self._get_band_name(key))
+        if isinstance(val, LazyBand) and val.central_wavelength is not None:
+            return val.central_wavelength
+        return self[key]["det-1"]["central_wavelength"]
+
+
+class RSRCache:
+    """Process-wide least-recently-used cache of the content of RSR files.
+
+    Entries are keyed by the resolved file path together with the modification
+    time and size of the file, so a file that is updated on disk is read again.
+    The cached arrays are made read-only as they are shared between all
+    :class:`RelativeSpectralResponse` instances created from the same file.
+
+    The total size of the cached arrays is kept below ``max_bytes`` by evicting
+    the least recently used files first. The module level instance
+    :data:`RSR_CACHE` is used by :class:`RelativeSpectralResponse`, e.g.::
+
+        >>> from pyspectral.rsr_reader import RSR_CACHE
+        >>> RSR_CACHE.max_bytes = 64 * 1024 ** 2
+        >>> RSR_CACHE.clear()
+
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_RSR_CACHE_SIZE):
+        """Initialize an empty cache holding at most *max_bytes* of array data."""
+        self._entries: OrderedDict[tuple[str, int, int], dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_bytes = max_bytes
+
+    @property
+    def max_bytes(self) -> int:
+        """Get the memory cap of the cache in bytes."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        """Set the memory cap of the cache in bytes, evicting entries if needed."""
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        """Get the total size of the bands loaded so far by the cached files."""
+        return sum(_loaded_rsr_nbytes(rsr_info["rsr"]) for rsr_info in list(self._entries.values()))
+
+    def __len__(self) -> int:
+        """Get the number of cached files."""
+        return len(self._entries)
+
+    def get(self, filename: Path, loader: Callable[[Path], dict[str, Any]]) -> dict[str, Any]:
+        """Get the RSR information of *filename*, reading it with *loader* if not cached.
+
+        Files that can't be accessed are passed directly to *loader* without
+        being cached, leaving it up to the loader to raise an appropriate error.
+        Bands are typically loaded lazily after the file is cached, so the
+        memory cap is enforced each time the cache is accessed.
+
+        """
+        try:
+            key = _get_file_cache_key(filename)
+        except OSError:
+            return loader(filename)
+
+        with self._lock:
+            rsr_info = self._entries.get(key)
+            if rsr_info is not None:
+                self._entries.move_to_end(key)
+                self._evict()
+                return rsr_info
+
+        rsr_info = loader(filename)
+        _freeze_rsr_arrays(rsr_info["rsr"])
+        with self._lock:
+            rsr_info = self._entries.setdefault(key, rsr_info)
+            self._entries.move_to_end(key)
+            self._evict()
+        return rsr_info
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        """Evict the least recently used files until the cache fits in the memory cap."""
+        total_nbytes = sum(_loaded_rsr_nbytes(rsr_info["rsr"]) for rsr_info in self._entries.values())
+        while self._entries and total_nbytes > self._max_bytes:
+            _, rsr_info = self._entries.popitem(last=False)
+            total_nbytes -= _loaded_rsr_nbytes(rsr_info["rsr"])
+
+
+def _get_file_cache_key(filename: Path) -> tuple[str, int, int]:
+    stat = filename.stat()
+    return str(filename.resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def _loaded_rsr_nbytes(rsr: dict[str, dict[str, RSRResponseDict]]) -> int:
+    """Get the total size in bytes of the arrays of the bands loaded so far."""
+    return sum(_band_nbytes(band_rsr) for band_rsr in dict.values(rsr) if not isinstance(band_rsr, LazyBand))
+
+
+def _band_nbytes(band_rsr: dict[str, RSRResponseDict] | BandResponse) -> int:
+    if isinstance(band_rsr, BandResponse):
+        return band_rsr.nbytes
+    return sum(value.nbytes for det_rsr in band_rsr.values()
+               for value in det_rsr.values() if isinstance(value, np.ndarray))
+
+
+def _freeze_rsr_arrays(rsr: dict[str, dict[str, RSRResponseDict]]) -> None:
+    """Make the arrays of all bands loaded so far read-only."""
+    for band_rsr in dict.values(rsr):
+        if not isinstance(band_rsr, LazyBand):
+            _freeze_band_arrays(band_rsr)
+
+
+def _freeze_band_arrays(
+        band_rsr: dict[str, RSRResponseDict] | BandResponse,
+) -> dict[str, RSRResponseDict] | BandResponse:
+    if isinstance(band_rsr, BandResponse):
+        # always read-only
+        return band_rsr
+    for det_rsr in band_rsr.values():
+        for value in det_rsr.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+    return band_rsr
+
+
+def _copy_rsr_dicts(rsr: dict[str, dict[str, RSRResponseDict]]) -> dict[str, dict[str, RSRResponseDict] | LazyBand]:
+    """Copy the nested band and detector dictionaries, sharing the arrays.
+
+    Bands that are not loaded yet are replaced by placeholders loading them
+    through *rsr*, so they are only read once for all the copies.
+
+    """
+    rsr_copy: dict[str, dict[str, RSRResponseDict] | LazyBand] = {}
+    for band_name, band_rsr in dict.items(rsr):
+        if isinstance(band_rsr, LazyBand):
+            rsr_copy[band_name] = LazyBand(partial(_copy_band_dicts_from, rsr, band_name),
+                                           central_wavelength=band_rsr.central_wavelength)
+        else:
+            rsr_copy[band_name] = _copy_band_dicts(band_rsr)
+    return rsr_copy
+
+
+def _band_to_wavenumber_from(rsr: RSRDict, band_name: str) -> dict[str, dict[str, Any]] | BandResponse:
+    return _band_to_wavenumber(rsr[band_name])
+
+
+def _band_to_wavenumber(
+        band_rsr: dict[str, RSRResponseDict] | BandResponse,
+) -> dict[str, dict[str, Any]] | BandResponse:
+    """Convert the responses of all detectors of a band to wavenumber space."""
+    if isinstance(band_rsr, BandResponse):
+        return band_rsr.to_wavenumber()
+    wavenumber_rsr, _ = convert2wavenumber({"band": band_rsr})
+    band_wavenumbers = {}
+    for det, det_wavenumbers in wavenumber_rsr["band"].items():
+        det_rsr = {key: value for key, value in band_rsr[det].items() if key != WAVE_LENGTH}
+        det_rsr[WAVE_NUMBER] = det_wavenumbers[WAVE_NUMBER]
+        det_rsr['response'] = det_wavenumbers['response']
+        det_rsr['central_wavenumber'] = get_central_wave(det_rsr[WAVE_NUMBER], det_rsr['response'])
+        band_wavenumbers[det] = det_rsr
+    return band_wavenumbers
+
+
+def _copy_band_dicts_from(rsr: dict[str, dict[str, RSRResponseDict]], band_name: str) -> dict[str, RSRResponseDict]:
+    return _copy_band_dicts(rsr[band_name])
+
+
+def _copy_band_dicts(
+        band_rsr: dict[str, RSRResponseDict] | BandResponse,
+) -> dict[str, RSRResponseDict] | BandResponse:
+    if isinstance(band_rsr, BandResponse):
+        # read-only, so safely shared
+        return band_rsr
+    return {det_name: det_rsr.copy() for det_name, det_rsr in band_rsr.items()}  # type: ignore[misc]
+
+
+#: Cache of RSR file content shared by all :class:`RelativeSpectralResponse` instances
+RSR_CACHE = RSRCache()
+
 
 class _RSRDataBase:
     """Directory and configuration manager for Relative Spectral Responses (RSR) on disk.
@@ -107,7 +658,13 @@ class _RSRDataBase:
         """Determine if the current RSR directory is up to date."""
         return self.rsr_data_version == RSR_DATA_VERSION
 
-    def download_rsr_updates(self, dest_dir: Path | str | None = None, dry_run: bool = False) -> bool:
+    def download_rsr_updates(
+            self,
+            dest_dir: Path | str | None = None,
+            dry_run: bool = False,
+            platform_names: list[str] | None = None,
+            instruments: list[str] | None = None,
+    ) -> bool:
         """Check RSR directory version and download updates if necessary.
 
         Args:
@@ -118,6 +675,11 @@ class _RSRDataBase:
                 then the download is performed. This is different than the
                 'download_from_internet' configuration value as this stops the
                 download, but otherwise seems like it occurred.
+            platform_names: Only download the RSR files of these platforms if
+                a download manifest is configured, see
+                :func:`pyspectral.utils.download_rsr`.
+            instruments: Only download the RSR files of these instruments if
+                a download manifest is configured.
         Returns: True if the directory was out of date and an update was
             needed (even if 'download_from_internet' configuration value
             disabled the actual update download). False is returned if no
@@ -126,13 +688,17 @@ class _RSRDataBase:
         """
         if self.rsr_data_version_uptodate:
             return False
+        if (platform_names is not None or instruments is not None) and rsr_files_fetched(
+                dest_dir if dest_dir is not None else self.rsr_dir, platform_names, instruments):
+            # fetched from a download manifest, which doesn't mark the whole directory as up to date
+            return False
 
         if not self.do_download:
             LOG.warning("RSR data are old but updates are not downloaded due to 'download_from_internet' setting")
             return True
 
         LOG.info("Downloading RSR update from internet...")
-        download_rsr(dest_dir=dest_dir, dry_run=dry_run)
+        download_rsr(dest_dir=dest_dir, dry_run=dry_run, platform_names=platform_names, instruments=instruments)
         return True
 
 
@@ -166,7 +732,7 @@ class RelativeSpectralResponse(_RSRDataBase):
 
         if filename is None:
             # if the user didn't provide a specific file, then make sure we have the most up to date RSRs
-            self.download_rsr_updates()
+            self.download_rsr_updates(platform_names=[self.platform_name], instruments=[self.instrument])
 
         rsr_info = self._load_rsr_info()
         if self.platform_name is None:
@@ -176,8 +742,14 @@ class RelativeSpectralResponse(_RSRDataBase):
         self.description = rsr_info["description"]
         self.band_names = rsr_info["band_names"]
 
-        self.rsr = RSRDict(self.instrument)
-        self.rsr.update(rsr_info["rsr"])
+        try:
+            file_key = _get_file_cache_key(self.filename)
+        except OSError:
+            file_key = None
+        self.rsr = RSRDict(self.instrument, file_key=file_key)
+        self.rsr.update(_copy_rsr_dicts(rsr_info["rsr"]))
+        self._spectral_index: SpectralIndex | None = None
+        self._wavenumber_rsr: RSRDict | None = None
 
     def _sanitize_inputs(
             self,
@@ -203,7 +775,7 @@ class RelativeSpectralResponse(_RSRDataBase):
 
     def _load_rsr_info(self) -> dict:
         try:
-            return _load_rsr_info_from_file(self.filename)
+            return RSR_CACHE.get(self.filename, _load_rsr_info_from_file)
         except FileNotFoundError as e:
             # provide more helpful information if the user didn't provide an explicit filename
             if self.platform_name is not None and self.instrument is not None:
@@ -216,6 +788,10 @@ class RelativeSpectralResponse(_RSRDataBase):
         """Calculate the integral of the spectral response function for each detector."""
         from scipy.integrate import trapezoid
 
+        band_rsr = self.rsr[band_name]
+        if isinstance(band_rsr, BandResponse):
+            return dict(zip(band_rsr.detector_names, band_rsr.integral()))
+
         intg = {}
         for detector_name in self.rsr[band_name].keys():
             wvl = self.rsr[band_name][detector_name]['wavelength']
@@ -223,36 +799,83 @@ class RelativeSpectralResponse(_RSRDataBase):
             intg[detector_name] = trapezoid(resp, wvl)
         return intg
 
+    @property
+    def wavenumber_rsr(self) -> RSRDict:
+        """Get the spectral response functions in wavenumber space.
+
+        The conversion is done once per band, the first time the band is
+        accessed, and :attr:`rsr` is left unchanged so both wave spaces can be
+        used side by side. Bands with a response matrix are converted in one
+        vectorized pass and shared read-only with the other instances using
+        the same RSR file.
+
+        """
+        if self._wavespace == WAVE_NUMBER:
+            return self.rsr
+        if self._wavenumber_rsr is None:
+            wavenumber_rsr = RSRDict(self.instrument)
+            for band in self.rsr.keys():
+                wavenumber_rsr[band] = LazyBand(partial(_band_to_wavenumber_from, self.rsr, band))
+            self._wavenumber_rsr = wavenumber_rsr
+        return self._wavenumber_rsr
+
     def convert(self):
-        """Convert spectral response functions from wavelength to wavenumber."""
+        """Convert spectral response functions from wavelength to wavenumber.
+
+        The responses in wavelength space are replaced by the ones of
+        :attr:`wavenumber_rsr`.
+
+        """
         if self._wavespace == WAVE_LENGTH:
-            rsr, info = convert2wavenumber(self.rsr)
-            for band in rsr.keys():
-                for det in rsr[band].keys():
-                    self.rsr[band][det][WAVE_NUMBER] = rsr[
-                        band][det][WAVE_NUMBER]
-                    self.rsr[band][det]['response'] = rsr[
-                        band][det]['response']
-                    self.unit = info['unit']
-                    self.si_scale = info['si_scale']
+            self.rsr = self.wavenumber_rsr
+            self.unit = WAVE_NUMBER_UNIT
+            self.si_scale = WAVE_NUMBER_SI_SCALE
             self._wavespace = WAVE_NUMBER
-            for band in rsr.keys():
-                for det in rsr[band].keys():
-                    self.rsr[band][det]['central_wavenumber'] = \
-                        get_central_wave(self.rsr[band][det][WAVE_NUMBER], self.rsr[band][det]['response'])
-                    del self.rsr[band][det][WAVE_LENGTH]
         else:
             errmsg = "Conversion from {wn} to {wl} not supported yet".format(wn=WAVE_NUMBER, wl=WAVE_LENGTH)
             raise NotImplementedError(errmsg)
 
+    @property
+    def spectral_index(self) -> SpectralIndex:
+        """Get the index of the central wavelengths and support ranges of the bands.
+
+        The index is created the first time it is needed. The support ranges
+        are only known if the index is created before converting the responses
+        to wavenumber space with :meth:`convert`.
+
+        """
+        if self._spectral_index is None:
+            self._spectral_index = get_spectral_index(self.instrument, self.rsr)
+        return self._spectral_index
+
     def get_bandname_from_wavelength(self, wavelength, epsilon=0.1, multiple_bands=False):
         """Get the band name from the wavelength."""
-        return get_bandname_from_wavelength(self.instrument, wavelength, self.rsr,
-                                            epsilon=epsilon, multiple_bands=multiple_bands)
+        return self.spectral_index.get_bandname(wavelength, epsilon=epsilon, multiple_bands=multiple_bands)
 
 
 def _load_rsr_info_from_file(filename: Path) -> dict[str, Any]:
-    """Read the internally formated HDF5 relative spectral response data."""
+    """Read the internally formated HDF5 relative spectral response data.
+
+    The data are taken from the consolidated RSR store in the same directory
+    if it is up to date for this file (see :mod:`pyspectral.rsr_store`), and
+    from the HDF5 file otherwise.
+
+    """
+    from pyspectral.rsr_store import load_rsr_info_from_store
+
+    rsr_info = load_rsr_info_from_store(filename)
+    if rsr_info is not None:
+        return rsr_info
+    return _load_rsr_info_from_hdf5(filename)
+
+
+def _load_rsr_info_from_hdf5(filename: Path) -> dict[str, Any]:
+    """Read the internally formated HDF5 relative spectral response data.
+
+    Only the file metadata are read here, the responses of each band are read
+    from the file the first time the band is accessed.
+
+    """
     import h5py
 
     if not filename.is_file():
@@ -263,7 +886,12 @@ def _load_rsr_info_from_file(filename: Path) -> dict[str, Any]:
         description = convert2str(h5f.attrs['description'])
         platform_name = _get_platform_name(h5f)
         instrument = _get_instrument(h5f, platform_name)
-        rsr = _get_relative_spectral_responses(h5f, band_names)
+        central_wavelengths = {band_name: _get_stored_central_wavelength(h5f, band_name) for band_name in band_names}
+
+    rsr = RSRDict(instrument)
+    for band_name in band_names:
+        rsr[band_name] = LazyBand(partial(_load_band_from_file, filename, band_name),
+                                  central_wavelength=central_wavelengths[band_name])
 
     return {
         "platform_name": platform_name,
@@ -274,6 +902,52 @@ def _load_rsr_info_from_file(filename: Path) -> dict[str, Any]:
     }
 
 
+def _load_band_from_file(filename: Path, band_name: str) -> dict[str, RSRResponseDict] | BandResponse:
+    """Read the responses of all detectors of one band as read-only arrays.
+
+    Bands whose detectors share the same grid are read from shared memory if
+    enabled, see :mod:`pyspectral.shared_arrays`.
+
+    """
+    if shared_memory_enabled():
+        key = ("rsr",) + _get_file_cache_key(filename) + (band_name,)
+        arrays = SHARED_ARRAY_POOL.get(key, partial(_read_band_arrays_from_file, filename, band_name))
+        if arrays:
+            return _band_response_from_arrays(arrays)
+    return _read_band_from_file(filename, band_name)
+
+
+def _read_band_arrays_from_file(filename: Path, band_name: str) -> dict[str, np.ndarray]:
+    """Read the arrays of a band response, or nothing if the detectors don't share the same grid."""
+    band_rsr = _read_band_from_file(filename, band_name)
+    if not isinstance(band_rsr, BandResponse):
+        return {}
+    arrays = {
+        "detector_names": np.array(band_rsr.detector_names),
+        "grid": band_rsr.grid,
+        "responses": band_rsr.responses,
+        "central_wavelengths": band_rsr.central_wavelengths,
+    }
+    arrays.update({f"metadata/{name}": value for name, value in band_rsr.stored_metadata.items()})
+    return arrays
+
+
+def _band_response_from_arrays(arrays: Mapping[str, np.ndarray]) -> BandResponse:
+    metadata = {name.split("/", 1)[1]: value for name, value in arrays.items() if name.startswith("metadata/")}
+    return BandResponse([str(name) for name in arrays["detector_names"]], arrays["grid"], arrays["responses"],
+                        arrays["central_wavelengths"], metadata=metadata)
+
+
+def _read_band_from_file(filename: Path, band_name: str) -> dict[str, RSRResponseDict] | BandResponse:
+    import h5py
+
+    LOG.debug(f"Loading band {band_name} from RSR file {filename}")
+    with h5py.File(filename, "r") as h5f:
+        band_rsr = _get_band_relative_spectral_responses(h5f, band_name)
+        metadata = _get_band_spectral_metadata(h5f, band_name, list(band_rsr))
+    return _freeze_band_arrays(BandResponse.from_detectors(band_rsr, metadata=metadata))
+
+
 def _get_platform_name(h5f):
     """Get the platform name."""
     try:
@@ -302,21 +976,19 @@ def _get_instrument(h5f, platform_name):
     return instrument
 
 
-def _get_relative_spectral_responses(h5f, band_names: list[str]) -> dict[str, dict[str, RSRResponseDict]]:
-    """Read the rsr data into a single dictionary."""
-    rsr_dict: dict[str, dict[str, RSRResponseDict]] = {}
-    for band_name in band_names:
-        rsr_dict[band_name] = {}
-        for dname in _detector_names(h5f, band_name):
-            response = _get_band_responses_per_detector(h5f, band_name, dname)
-            wavelength = _get_band_wavelengths_per_detector(h5f, band_name, dname)
-            central_wavelength = _get_band_central_wavelength_per_detector(h5f, band_name, dname)
-            rsr_dict[band_name][dname] = RSRResponseDict(
-                response=response,
-                wavelength=wavelength,
-                central_wavelength=central_wavelength,
-            )
-    return rsr_dict
+def _get_band_relative_spectral_responses(h5f, band_name: str) -> dict[str, RSRResponseDict]:
+    """Read the rsr data of all detectors of a band into a single dictionary."""
+    band_rsr: dict[str, RSRResponseDict] = {}
+    for dname in _detector_names(h5f, band_name):
+        response = _get_band_responses_per_detector(h5f, band_name, dname)
+        wavelength = _get_band_wavelengths_per_detector(h5f, band_name, dname)
+        central_wavelength = _get_band_central_wavelength_per_detector(h5f, band_name, dname)
+        band_rsr[dname] = RSRResponseDict(
+            response=response,
+            wavelength=wavelength,
+            central_wavelength=central_wavelength,
+        )
+    return band_rsr
 
 
 def _detector_names(h5f, band_name: str) -> Iterator[str]:
@@ -365,14 +1037,52 @@ def _get_band_central_wavelength_per_detector(h5f, band_name: str, detector_name
     return central_wvl
 
 
+def _get_stored_central_wavelength(h5f, band_name: str) -> float | None:
+    """Get the central wavelength of the first detector of a band from the attributes only, if there."""
+    try:
+        return float(_get_band_central_wavelength_per_detector(h5f, band_name, "det-1"))
+    except KeyError:
+        return None
+
+
+def _get_band_spectral_metadata(h5f, band_name: str, detector_names: list[str]) -> dict[str, np.ndarray]:
+    """Get the spectral metadata stored for all detectors of a band."""
+    metadata = {}
+    for name in SPECTRAL_METADATA:
+        values = []
+        for detector_name in detector_names:
+            try:
+                values.append(h5f[band_name][detector_name].attrs[name])
+            except KeyError:
+                try:
+                    values.append(h5f[band_name].attrs[name])
+                except KeyError:
+                    break
+        else:
+            metadata[name] = np.array(values)
+    return metadata
+
+
 def _get_rsr_filename(platform_name: str, instrument: str) -> str:
     return f"rsr_{instrument}_{platform_name}.h5"
 
 
-def check_and_download(dest_dir: str | Path | None = None, dry_run: bool = False) -> None:
-    """Do a check for the version and attempt downloading only if needed."""
+def check_and_download(
+        dest_dir: str | Path | None = None,
+        dry_run: bool = False,
+        platform_names: list[str] | None = None,
+        instruments: list[str] | None = None,
+) -> None:
+    """Do a check for the version and attempt downloading only if needed.
+
+    With a download manifest configured, only the files of the given
+    *platform_names* and *instruments* are downloaded, see
+    :func:`pyspectral.utils.download_rsr`.
+
+    """
     rsr = _RSRDataBase()
-    if not rsr.download_rsr_updates(dest_dir=dest_dir, dry_run=dry_run):
+    if not rsr.download_rsr_updates(dest_dir=dest_dir, dry_run=dry_run,
+                                    platform_names=platform_names, instruments=instruments):
         LOG.info("RSR data already the latest!")
 
 
@@ -0,0 +1,279 @@
+"""Consolidated single-file store of relative spectral responses.
+
+Opening the many ``rsr_<instrument>_<platform>.h5`` files is dominated by the
+HDF5 metadata overhead. The store gathers the content of all the RSR files of a
+directory in one binary file made of a small header and one contiguous blob
+holding all the arrays::
+
+    magic (8 bytes) | header length (uint64) | JSON header | padding | arrays
+
+The JSON header indexes every (platform, instrument, band, detector) to the
+offset, shape and dtype of its response and wavelength arrays. The detectors of
+a band sharing the same wavelength grid are stored as one response matrix, see
+:class:`~pyspectral.rsr_reader.BandResponse`, together with all their
+precomputed spectral constants. When reading,
+the whole file is memory-mapped once and the arrays are zero-copy read-only
+views into the mapping, so only the pages actually used are read from disk.
+
+Each entry of the store records the modification time and size of the HDF5
+file it was created from. :class:`~pyspectral.rsr_reader.RelativeSpectralResponse`
+uses the store transparently when it lies next to the RSR files and its entry
+for the requested file is up to date, and falls back to the HDF5 file otherwise.
+The store is created with :func:`create_rsr_store` or the
+``convert_rsr_to_store.py`` script.
+
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from pyspectral.config import get_config
+from pyspectral.utils import RSR_DATA_VERSION
+
+LOG = logging.getLogger(__name__)
+
+#: Name of the store file in the RSR directory
+RSR_STORE_FILENAME = "rsr_store.bin"
+
+_MAGIC = b"PSPRSR02"
+_HEADER_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 64
+
+_STORES: dict[tuple[str, int, int], RSRStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+class RSRStore:
+    """Read-only access to a consolidated RSR store file."""
+
+    def __init__(self, filename: str | Path):
+        """Read the header of the store and memory-map its arrays."""
+        self.filename = Path(filename)
+        with open(self.filename, "rb") as fh:
+            magic = fh.read(len(_MAGIC))
+            if magic != _MAGIC:
+                raise ValueError(f"Not a pyspectral RSR store: {self.filename}")
+            header_length, = _HEADER_LENGTH.unpack(fh.read(_HEADER_LENGTH.size))
+            header = json.loads(fh.read(header_length).decode("utf-8"))
+        self.rsr_data_version = header["rsr_data_version"]
+        self.files: dict[str, dict[str, Any]] = header["files"]
+        data_offset = _aligned(len(_MAGIC) + _HEADER_LENGTH.size + header_length)
+        if self.filename.stat().st_size > data_offset:
+            self._data = np.memmap(self.filename, dtype=np.uint8, mode="r", offset=data_offset)
+        else:
+            # no arrays in the store, and empty files can't be memory-mapped
+            self._data = np.empty(0, dtype=np.uint8)
+
+    def is_up_to_date(self, rsr_filename: str | Path) -> bool:
+        """Check if the store holds the current content of the RSR file *rsr_filename*."""
+        rsr_filename = Path(rsr_filename)
+        entry = self.files.get(rsr_filename.name)
+        if entry is None or self.rsr_data_version != RSR_DATA_VERSION:
+            return False
+        try:
+            stat = rsr_filename.stat()
+        except OSError:
+            return False
+        return entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def load_rsr_info(self, rsr_filename: str | Path) -> dict[str, Any]:
+        """Get the RSR information of the file *rsr_filename* from the store.
+
+        The returned dictionary has the same content as the one read from the
+        HDF5 file, with the arrays being read-only views of the store.
+
+        """
+        from pyspectral.rsr_reader import RSRDict
+
+        entry = self.files[Path(rsr_filename).name]
+        rsr = RSRDict(entry["instrument"])
+        for band_name, band_index in entry["bands"].items():
+            rsr[band_name] = self._load_band(band_index)
+        return {
+            "platform_name": entry["platform_name"],
+            "instrument": entry["instrument"],
+            "band_names": list(entry["band_names"]),
+            "description": entry["description"],
+            "rsr": rsr,
+        }
+
+    def get_detector_rsr(self, platform_name: str, instrument: str, band_name: str,
+                         detector_name: str = "det-1") -> dict[str, Any]:
+        """Get the response and wavelength arrays of one detector of a band."""
+        for entry in self.files.values():
+            if entry["platform_name"] == platform_name and entry["instrument"] == instrument:
+                return dict(self._load_band(entry["bands"][band_name])[detector_name])
+        raise KeyError(f"No RSR for {instrument} on {platform_name} in {self.filename}")
+
+    def _load_band(self, band_index: dict[str, Any]):
+        from pyspectral.rsr_reader import BandResponse, RSRResponseDict
+
+        if "detectors" not in band_index:
+            return BandResponse(band_index["detector_names"], self._get_array(band_index["wavelength"]),
+                                self._get_array(band_index["responses"]), band_index["central_wavelengths"],
+                                metadata=band_index.get("metadata"))
+        return {
+            det_name: RSRResponseDict(
+                response=self._get_array(det_index["response"]),
+                wavelength=self._get_array(det_index["wavelength"]),
+                central_wavelength=det_index["central_wavelength"],
+            )
+            for det_name, det_index in band_index["detectors"].items()
+        }
+
+    def _get_array(self, array_index: dict[str, Any]) -> np.ndarray:
+        return np.ndarray(tuple(array_index["shape"]), dtype=np.dtype(array_index["dtype"]),
+                          buffer=self._data, offset=array_index["offset"])
+
+
+def get_rsr_store(store_filename: str | Path) -> RSRStore | None:
+    """Get the store in *store_filename*, or None if there is none.
+
+    The stores are opened once per process and opened again if the file is
+    modified.
+
+    """
+    try:
+        stat = os.stat(store_filename)
+    except OSError:
+        return None
+    key = (os.path.abspath(store_filename), stat.st_mtime_ns, stat.st_size)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            try:
+                store = RSRStore(store_filename)
+            except (OSError, ValueError, KeyError) as err:
+                LOG.warning(f"Ignoring unreadable RSR store {store_filename}: {err}")
+                return None
+            for old_key in [old_key for old_key in _STORES if old_key[0] == key[0]]:
+                del _STORES[old_key]
+            _STORES[key] = store
+    return store
+
+
+def load_rsr_info_from_store(rsr_filename: Path) -> dict[str, Any] | None:
+    """Get the RSR information of *rsr_filename* from the store in the same directory.
+
+    Returns None if there is no store or if the store is not up to date for
+    this file.
+
+    """
+    store = get_rsr_store(rsr_filename.parent / RSR_STORE_FILENAME)
+    if store is None or not store.is_up_to_date(rsr_filename):
+        return None
+    LOG.debug(f"Reading RSR data of {rsr_filename.name} from store {store.filename}")
+    return store.load_rsr_info(rsr_filename)
+
+
+def create_rsr_store(rsr_dir: str | Path | None = None, store_filename: str | Path | None = None) -> Path:
+    """Create the RSR store from all the RSR files of a directory.
+
+    Args:
+        rsr_dir: Directory of the ``rsr_*.h5`` files. Defaults to the
+            configured ``rsr_dir``.
+        store_filename: Name of the store file to write. Defaults to
+            :data:`RSR_STORE_FILENAME` in *rsr_dir*, where it is picked up by
+            :class:`~pyspectral.rsr_reader.RelativeSpectralResponse`.
+
+    Returns: The path of the store file.
+
+    """
+    if rsr_dir is None:
+        rsr_dir = get_config()["rsr_dir"]
+    rsr_dir = Path(rsr_dir)
+    if store_filename is None:
+        store_filename = rsr_dir / RSR_STORE_FILENAME
+    rsr_files = sorted(rsr_dir.glob("rsr_*.h5"))
+    write_rsr_store(rsr_files, store_filename)
+    return Path(store_filename)
+
+
+def write_rsr_store(rsr_files: list[Path], store_filename: str | Path) -> None:
+    """Write the content of the HDF5 RSR files *rsr_files* to a single store file.
+
+    The store is written to a temporary file first and then moved in place, so
+    readers never see a partially written store.
+
+    """
+    from pyspectral.rsr_reader import SPECTRAL_METADATA, BandResponse, _load_rsr_info_from_hdf5
+
+    files_index: dict[str, dict[str, Any]] = {}
+    arrays: list[tuple[int, np.ndarray]] = []
+    data_length = 0
+
+    def _add_array(arr):
+        nonlocal data_length
+        arr = np.ascontiguousarray(arr)
+        offset = _aligned(data_length)
+        arrays.append((offset, arr))
+        data_length = offset + arr.nbytes
+        return {"offset": offset, "shape": list(arr.shape), "dtype": arr.dtype.str}
+
+    for rsr_filename in rsr_files:
+        rsr_filename = Path(rsr_filename)
+        LOG.debug(f"Adding {rsr_filename} to the RSR store")
+        stat = rsr_filename.stat()
+        rsr_info = _load_rsr_info_from_hdf5(rsr_filename)
+        bands_index = {}
+        for band_name in rsr_info["band_names"]:
+            band_rsr = rsr_info["rsr"][band_name]
+            if isinstance(band_rsr, BandResponse):
+                bands_index[band_name] = {
+                    "detector_names": list(band_rsr.detector_names),
+                    "wavelength": _add_array(band_rsr.wavelength),
+                    "responses": _add_array(band_rsr.responses),
+                    "central_wavelengths": band_rsr.central_wavelengths.tolist(),
+                    # computed here if not stored in the hdf5 file
+                    "metadata": {name: band_rsr.get_metadata(name).tolist() for name in SPECTRAL_METADATA},
+                }
+                continue
+            bands_index[band_name] = {"detectors": {
+                det_name: {
+                    "response": _add_array(det_rsr["response"]),
+                    "wavelength": _add_array(det_rsr["wavelength"]),
+                    "central_wavelength": float(det_rsr["central_wavelength"]),
+                }
+                for det_name, det_rsr in band_rsr.items()
+            }}
+        files_index[rsr_filename.name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "platform_name": rsr_info["platform_name"],
+            "instrument": rsr_info["instrument"],
+            "description": rsr_info["description"],
+            "band_names": rsr_info["band_names"],
+            "bands": bands_index,
+        }
+
+    header = json.dumps({"rsr_data_version": RSR_DATA_VERSION, "files": files_index}).encode("utf-8")
+    data_offset = _aligned(len(_MAGIC) + _HEADER_LENGTH.size + len(header))
+    store_filename = Path(store_filename)
+    tmp_filename = store_filename.with_name(f"{store_filename.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_filename, "wb") as fh:
+            fh.write(_MAGIC)
+            fh.write(_HEADER_LENGTH.pack(len(header)))
+            fh.write(header)
+            for offset, arr in arrays:
+                fh.seek(data_offset + offset)
+                fh.write(arr.tobytes())
+            fh.truncate(data_offset + data_length)
+        os.replace(tmp_filename, store_filename)
+    except BaseException:
+        if tmp_filename.exists():
+            os.remove(tmp_filename)
+        raise
+    LOG.info(f"RSR store with {len(files_index)} files written to {store_filename}")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
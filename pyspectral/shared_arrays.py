@@ -0,0 +1,287 @@
+"""Sharing of the look-up tables and spectral responses between the processes of a host.
+
+When pyspectral runs in many processes of the same host, e.g. in the workers of
+a :mod:`multiprocessing` pool or of a dask distributed cluster, each process
+normally reads and keeps its own copy of the wavelength adjusted rayleigh
+tables, the Tb to radiance look-up tables and the spectral responses. With the
+``use_shared_memory`` configuration option set::
+
+    use_shared_memory: True
+
+these arrays are instead published once in :mod:`multiprocessing.shared_memory`
+segments by the first process needing them, and the other processes attach
+read-only numpy views of the same memory. A segment is identified by the
+file it was read from (path, modification time and size) and the parameters
+of the table, so updated files give new segments.
+
+The segments are reference counted: each process attaching a segment holds
+one reference until it exits or calls :meth:`SharedArrayPool.close`, and the
+last process releasing it removes the segment. Segments of processes killed
+without running their exit handlers are not removed, on Linux they can be
+found in ``/dev/shm`` with the ``psp_`` prefix.
+
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+from collections.abc import Callable, Hashable, Mapping
+from multiprocessing import shared_memory, util
+from pathlib import Path
+
+import numpy as np
+
+from pyspectral.config import get_config
+from pyspectral.utils import interprocess_lock
+
+LOG = logging.getLogger(__name__)
+
+#: Prefix of the names of the shared memory segments
+SEGMENT_PREFIX = "psp_"
+# layout version of the segments, part of their names
+_SEGMENT_FORMAT_VERSION = 1
+# length of the json description of the arrays, written last, and number of processes using the segment
+_SEGMENT_HEADER = struct.Struct("<qq")
+_ARRAY_ALIGNMENT = 64
+
+
+def shared_memory_enabled() -> bool:
+    """Check if the arrays are shared between processes, see the ``use_shared_memory`` configuration option."""
+    return bool(get_config().get("use_shared_memory", False))
+
+
+def get_segment_name(key: Hashable) -> str:
+    """Get the name of the shared memory segment of the arrays identified by *key*.
+
+    The names are short enough for all platforms and differ between users.
+
+    """
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "")
+    digest = hashlib.sha1(repr((_SEGMENT_FORMAT_VERSION, user, key)).encode()).hexdigest()
+    return SEGMENT_PREFIX + digest[:24]
+
+
+class SharedArrayPool:
+    """Process-wide register of the shared memory segments attached by the process.
+
+    The module level instance :data:`SHARED_ARRAY_POOL` is used by
+    :mod:`pyspectral.rayleigh`, :mod:`pyspectral.radiance_tb_conversion` and
+    :mod:`pyspectral.rsr_reader` when :func:`shared_memory_enabled`, e.g.::
+
+        >>> from pyspectral.shared_arrays import SHARED_ARRAY_POOL
+        >>> arrays = SHARED_ARRAY_POOL.get(("my-table", 1), lambda: {"table": np.arange(10.)})
+
+    Loading and publishing the arrays of a key is done under a lock file in
+    *lock_dir*, so the arrays are loaded once for all the processes.
+
+    """
+
+    def __init__(self, lock_dir: str | Path | None = None):
+        """Initialize the pool, with the lock files in *lock_dir* (defaults to the temporary directory)."""
+        self._segments: dict[str, shared_memory.SharedMemory] = {}
+        self._arrays: dict[str, dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._lock_dir = lock_dir
+        self._exit_handlers_registered = False
+
+    def __len__(self) -> int:
+        """Get the number of segments attached by this process."""
+        return len(self._arrays)
+
+    def get(self, key: Hashable, loader: Callable[[], Mapping[str, np.ndarray]]) -> dict[str, np.ndarray]:
+        """Get read-only views of the shared arrays identified by *key*.
+
+        If no process published them yet, the arrays returned by *loader* are
+        copied to a new shared memory segment first. Exceptions raised by
+        *loader* are propagated and nothing is published.
+
+        """
+        name = get_segment_name(key)
+        with self._lock:
+            self._forget_parent_segments()
+            arrays = self._arrays.get(name)
+        if arrays is not None:
+            return arrays
+
+        with interprocess_lock(self._get_lock_filename(name)):
+            with self._lock:
+                arrays = self._arrays.get(name)
+            if arrays is not None:
+                return arrays
+            shm = _attach_segment(name)
+            if shm is None:
+                LOG.debug(f"Publishing the arrays of {key} in shared memory segment {name}")
+                shm = _publish_segment(name, loader())
+            _add_segment_users(shm, 1)
+            arrays = _get_segment_arrays(shm)
+            with self._lock:
+                self._segments[name] = shm
+                self._arrays[name] = arrays
+                self._register_exit_handlers()
+        return arrays
+
+    def release(self, key: Hashable) -> None:
+        """Release the segment of *key* attached by this process, removing it if no other process uses it.
+
+        Arrays obtained from the segment stay valid as long as they are
+        referenced.
+
+        """
+        name = get_segment_name(key)
+        with self._lock:
+            shm = self._segments.pop(name, None)
+            self._arrays.pop(name, None)
+        if shm is not None:
+            self._release_segment(name, shm)
+
+    def close(self) -> None:
+        """Release all the segments attached by this process."""
+        with self._lock:
+            self._forget_parent_segments()
+            segments = list(self._segments.items())
+            self._segments.clear()
+            self._arrays.clear()
+        for name, shm in segments:
+            self._release_segment(name, shm)
+
+    def _release_segment(self, name: str, shm: shared_memory.SharedMemory) -> None:
+        with interprocess_lock(self._get_lock_filename(name)):
+            if _add_segment_users(shm, -1) <= 0:
+                LOG.debug(f"Removing shared memory segment {name}")
+                shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            # arrays of the segment are still in use, unmapped when they are garbage collected
+            pass
+
+    def _forget_parent_segments(self) -> None:
+        """Forget the segments inherited from the parent process after a fork, they are released by the parent."""
+        if self._pid != os.getpid():
+            self._segments.clear()
+            self._arrays.clear()
+            self._pid = os.getpid()
+            self._exit_handlers_registered = False
+
+    def _register_exit_handlers(self) -> None:
+        if self._exit_handlers_registered:
+            return
+        atexit.register(self.close)
+        # multiprocessing workers exit without running the atexit handlers
+        util.Finalize(self, self.close, exitpriority=0)
+        self._exit_handlers_registered = True
+
+    def _get_lock_filename(self, name: str) -> Path:
+        lock_dir = tempfile.gettempdir() if self._lock_dir is None else self._lock_dir
+        return Path(lock_dir) / f"{name}.lock"
+
+
+class _SharedMemory(shared_memory.SharedMemory):
+    """Shared memory segment that can be garbage collected while arrays still use its buffer."""
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+    def unlink(self):
+        """Remove the segment, keeping the resource tracker consistent with :func:`_open_segment`."""
+        if sys.version_info < (3, 13) and os.name == "posix":
+            from multiprocessing import resource_tracker
+
+            # unlink() unregisters the segment from the resource tracker too
+            resource_tracker.register(self._name, "shared_memory")  # type: ignore[attr-defined]
+        super().unlink()
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """Open a segment whose lifetime is handled by the reference counting instead of the resource tracker."""
+    if sys.version_info >= (3, 13):
+        return _SharedMemory(name, create=create, size=size, track=False)
+    shm = _SharedMemory(name, create=create, size=size)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory | None:
+    try:
+        shm = _open_segment(name)
+    except FileNotFoundError:
+        return None
+    header_length, _ = _SEGMENT_HEADER.unpack_from(shm.buf)
+    if header_length > 0:
+        return shm
+    LOG.warning(f"Removing incomplete shared memory segment {name}")
+    shm.close()
+    shm.unlink()
+    return None
+
+
+def _publish_segment(name: str, arrays: Mapping[str, np.ndarray]) -> shared_memory.SharedMemory:
+    arrays = {array_name: np.ascontiguousarray(arr) for array_name, arr in arrays.items()}
+    for array_name, arr in arrays.items():
+        if arr.dtype.hasobject:
+            raise ValueError(f"Array {array_name} of dtype {arr.dtype} can't be shared")
+    layout = []
+    offset = 0
+    for array_name, arr in arrays.items():
+        layout.append((array_name, arr.dtype.str, arr.shape, offset))
+        offset += _aligned(arr.nbytes)
+    header = json.dumps(layout).encode()
+    data_offset = _aligned(_SEGMENT_HEADER.size + len(header))
+
+    shm = _open_segment(name, create=True, size=max(data_offset + offset, 1))
+    try:
+        shm.buf[_SEGMENT_HEADER.size:_SEGMENT_HEADER.size + len(header)] = header
+        for (_, _, _, array_offset), arr in zip(layout, arrays.values()):
+            start = data_offset + array_offset
+            shm.buf[start:start + arr.nbytes] = arr.reshape(-1).view(np.uint8)
+        # mark the segment as complete
+        _SEGMENT_HEADER.pack_into(shm.buf, 0, len(header), 0)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm
+
+
+def _add_segment_users(shm: shared_memory.SharedMemory, count: int) -> int:
+    """Change the number of processes using the segment, must be called under the lock of the segment."""
+    header_length, users = _SEGMENT_HEADER.unpack_from(shm.buf)
+    users += count
+    _SEGMENT_HEADER.pack_into(shm.buf, 0, header_length, users)
+    return users
+
+
+def _get_segment_arrays(shm: shared_memory.SharedMemory) -> dict[str, np.ndarray]:
+    header_length, _ = _SEGMENT_HEADER.unpack_from(shm.buf)
+    layout = json.loads(bytes(shm.buf[_SEGMENT_HEADER.size:_SEGMENT_HEADER.size + header_length]))
+    data_offset = _aligned(_SEGMENT_HEADER.size + header_length)
+    arrays = {}
+    for array_name, dtype, shape, offset in layout:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        arr = np.frombuffer(shm.buf, dtype=dtype, count=count, offset=data_offset + offset).reshape(shape)
+        arr.flags.writeable = False
+        arrays[array_name] = arr
+    return arrays
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ARRAY_ALIGNMENT) * _ARRAY_ALIGNMENT
+
+
+#: Shared memory segments attached by the process, used when :func:`shared_memory_enabled`
+SHARED_ARRAY_POOL = SharedArrayPool()
@@ -163,15 +163,61 @@ class SolarIrradianceSpectrum(object):
                 wvl = rsr[detector_name]['wavenumber'] * scale
                 resp = rsr[detector_name]['response']
 
+        ius = InterpolatedUnivariateSpline(wvl, resp)
+        wvl, irr, resp_ipol = self._get_band_irradiance_and_response(wvl, ius)
+
+        # Calculate the solar-flux: (w/m2)
+        if flux:
+            return trapezoid(irr * resp_ipol, wvl)
+
+        # Divide by the equivalent band width:
+        return trapezoid(irr * resp_ipol, wvl) / trapezoid(resp_ipol, wvl)
+
+    def inband_solarflux_detectors(self, band_rsr, scale=1.0):
+        """Get the in band solar flux of all the detectors of a band.
+
+        Same as :meth:`inband_solarflux`, but returning an array with the
+        solar flux of each detector of the band. The calculation is vectorized
+        over the detectors of a :class:`~pyspectral.rsr_reader.BandResponse`.
+        """
+        return self._band_detectors_calculations(band_rsr, True, scale)
+
+    def inband_solarirradiance_detectors(self, band_rsr, scale=1.0):
+        """Get the in band solar irradiance of all the detectors of a band.
+
+        Same as :meth:`inband_solarirradiance`, but returning an array with the
+        solar irradiance of each detector of the band.
+        """
+        return self._band_detectors_calculations(band_rsr, False, scale)
+
+    def _band_detectors_calculations(self, band_rsr, flux, scale):
+        """Derive in band solar flux or irradiance for all the detectors of a band."""
+        from scipy.interpolate import make_interp_spline
+
+        from pyspectral.rsr_reader import BandResponse
+
+        if not isinstance(band_rsr, BandResponse) or self.wavespace != 'wavelength':
+            return np.array([self._band_calculations(band_rsr[detector_name], flux, scale)
+                             for detector_name in band_rsr])
+
+        # Interpolating cubic spline with not-a-knot end conditions, like InterpolatedUnivariateSpline
+        spline = make_interp_spline(band_rsr.wavelength * scale, band_rsr.responses, k=3, axis=-1)
+        wvl, irr, resp_ipol = self._get_band_irradiance_and_response(band_rsr.wavelength * scale, spline)
+
+        if flux:
+            return trapezoid(irr * resp_ipol, wvl, axis=-1)
+
+        return trapezoid(irr * resp_ipol, wvl, axis=-1) / trapezoid(resp_ipol, wvl, axis=-1)
+
+    def _get_band_irradiance_and_response(self, wvl, response_spline):
+        """Resample the response and the solar irradiance over the band at the resolution of the spectrum."""
         start = wvl[0]
         end = wvl[-1]
-        # print "Start and end: ", start, end
         LOG.debug("Begin and end wavelength/wavenumber: %f %f ", start, end)
         dlambda = self._dlambda
         xspl = np.linspace(start, end, int(round((end - start) / self._dlambda)) + 1)
 
-        ius = InterpolatedUnivariateSpline(wvl, resp)
-        resp_ipol = ius(xspl)
+        resp_ipol = response_spline(xspl)
 
         # Interpolate solar spectrum to specified resolution and over specified
         # Spectral interval:
@@ -182,13 +228,7 @@ class SolarIrradianceSpectrum(object):
                                  np.less_equal(self.ipol_wavelength, end))
         wvl = np.repeat(self.ipol_wavelength, maskidx)
         irr = np.repeat(self.ipol_irradiance, maskidx)
-
-        # Calculate the solar-flux: (w/m2)
-        if flux:
-            return trapezoid(irr * resp_ipol, wvl)
-
-        # Divide by the equivalent band width:
-        return trapezoid(irr * resp_ipol, wvl) / trapezoid(resp_ipol, wvl)
+        return wvl, irr, resp_ipol
 
     def interpolate(self, **options):
         """Interpolate Irradiance to a specified evenly spaced resolution/grid.
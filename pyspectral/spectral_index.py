@@ -0,0 +1,249 @@
+"""Index of the spectral intervals covered by the bands of one or more sensors.
+
+The index keeps the central wavelengths and the support ranges (the
+wavelength range where the response is positive) of a set of bands sorted,
+so that looking up the bands close to many wavelengths or overlapping a
+wavelength range is done with :func:`numpy.searchsorted` instead of scanning
+all the bands for every wavelength.
+
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Mapping, Sequence
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from pyspectral.bandnames import BANDNAMES
+
+LOG = logging.getLogger(__name__)
+
+#: Bands with a central wavelength further away than this from the requested wavelength are never matched
+MAX_BAND_DISTANCE = 2.0
+
+#: Number of sensor indexes kept by :func:`get_spectral_index`
+SPECTRAL_INDEX_CACHE_SIZE = 32
+
+
+class SpectralIndex:
+    """Sorted index of the central wavelengths and support ranges of bands.
+
+    Each band is identified by a key, which is the (standard) band name for
+    the index of one sensor (see :meth:`from_rsr`), and a ``(platform_name,
+    instrument, band_name)`` tuple for an index over several sensors (see
+    :meth:`from_rsr_files`). Query results are always listed in the order the
+    bands were added to the index.
+
+    The support ranges are only needed by :meth:`bands_overlapping`, they may
+    be given by a *support_loader* function called the first time they are
+    used instead.
+
+    """
+
+    def __init__(self, keys: Sequence[Hashable], central_wavelengths: npt.ArrayLike,
+                 support_min: npt.ArrayLike | None = None, support_max: npt.ArrayLike | None = None,
+                 support_loader: Callable[[], tuple[npt.ArrayLike, npt.ArrayLike]] | None = None):
+        """Create the index from the band keys and their central wavelengths and support ranges in µm."""
+        self.keys = list(keys)
+        self.central_wavelengths = np.asarray(central_wavelengths, dtype=np.float64).reshape(len(self.keys))
+        self._central_order = np.argsort(self.central_wavelengths, kind="stable")
+        self._sorted_central = self.central_wavelengths[self._central_order]
+
+        self._supports: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None = None
+        self._support_loader = support_loader
+        if support_loader is None:
+            self._set_supports(support_min, support_max)
+
+    @classmethod
+    def from_rsr(cls, sensor: str, rsr: Mapping, min_response: float = 0.0) -> SpectralIndex:
+        """Create the index of the bands of one sensor.
+
+        The central wavelengths of the bands not loaded yet from their RSR file
+        are taken from the file attributes, the responses are only loaded if
+        the support ranges are needed.
+
+        Args:
+            sensor: Name of the instrument, used to translate the band names
+                of the *rsr* to the standard band names.
+            rsr: Relative spectral responses of the bands, as in
+                :attr:`~pyspectral.rsr_reader.RelativeSpectralResponse.rsr`.
+                Only the first detector of each band is used.
+            min_response: The support range of a band is where its response
+                is larger than this value.
+
+        """
+        band_name_mapping = BANDNAMES.get(sensor, BANDNAMES["generic"])
+        channels = list(rsr)
+        keys = [band_name_mapping.get(channel, channel) for channel in channels]
+        central_wavelengths = [_get_central_wavelength(rsr, channel) for channel in channels]
+        return cls(keys, central_wavelengths, support_loader=partial(_get_supports, rsr, channels, min_response))
+
+    @classmethod
+    def from_rsr_files(cls, rsr_dir: str | Path | None = None, min_response: float = 0.0) -> SpectralIndex:
+        """Create the index of the bands of all the RSR files installed in *rsr_dir*.
+
+        The keys of the index are ``(platform_name, instrument, band_name)``
+        tuples. *rsr_dir* defaults to the configured RSR directory.
+
+        """
+        from pyspectral.rsr_reader import RelativeSpectralResponse, _RSRDataBase
+
+        rsr_dir = _RSRDataBase().rsr_dir if rsr_dir is None else Path(rsr_dir)
+        keys: list[Hashable] = []
+        central_wavelengths: list[float] = []
+        support_min: list[float] = []
+        support_max: list[float] = []
+        for rsr_filename in sorted(rsr_dir.glob("rsr_*.h5")):
+            rsr = RelativeSpectralResponse(filename=rsr_filename)
+            sensor_index = cls.from_rsr(rsr.instrument, rsr.rsr, min_response=min_response)
+            keys.extend((rsr.platform_name, rsr.instrument, band_name) for band_name in sensor_index.keys)
+            central_wavelengths.extend(sensor_index.central_wavelengths)
+            support_min.extend(sensor_index.support_min)
+            support_max.extend(sensor_index.support_max)
+        LOG.debug(f"Spectral index of {len(keys)} bands created from {rsr_dir}")
+        return cls(keys, central_wavelengths, support_min, support_max)
+
+    def __len__(self) -> int:
+        """Get the number of bands in the index."""
+        return len(self.keys)
+
+    @property
+    def support_min(self) -> np.ndarray:
+        """Get the lower bound of the support range of each band in µm, NaN if unknown."""
+        return self._get_supports()[0]
+
+    @property
+    def support_max(self) -> np.ndarray:
+        """Get the upper bound of the support range of each band in µm, NaN if unknown."""
+        return self._get_supports()[1]
+
+    def _get_supports(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self._supports is None:
+            self._set_supports(*self._support_loader())  # type: ignore[misc]
+        return self._supports  # type: ignore[return-value]
+
+    def _set_supports(self, support_min: npt.ArrayLike | None, support_max: npt.ArrayLike | None) -> None:
+        if support_min is None:
+            support_min = np.full(len(self.keys), np.nan)
+        if support_max is None:
+            support_max = np.full(len(self.keys), np.nan)
+        support_min = np.asarray(support_min, dtype=np.float64).reshape(len(self.keys))
+        support_max = np.asarray(support_max, dtype=np.float64).reshape(len(self.keys))
+        # bands with unknown support are never found when looking for overlaps
+        support_order = np.argsort(support_min, kind="stable")
+        self._supports = support_min, support_max, support_order, support_min[support_order]
+
+    def bands_near(self, wavelengths: npt.ArrayLike, epsilon: float = 0.1) -> list:
+        """Get the bands with a central wavelength within *epsilon* µm of each of the *wavelengths*.
+
+        Returns: The list of the matching band keys for a scalar wavelength,
+            or a list of such lists, one per wavelength, for an array of
+            wavelengths.
+
+        """
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        epsilon = min(epsilon, MAX_BAND_DISTANCE)
+        flat_wavelengths = wavelengths.ravel()
+        # widen the search a little to be exactly consistent with the distance test below
+        margin = 1e-9 * (np.abs(flat_wavelengths) + epsilon)
+        starts = np.searchsorted(self._sorted_central, flat_wavelengths - epsilon - margin, side="left")
+        stops = np.searchsorted(self._sorted_central, flat_wavelengths + epsilon + margin, side="right")
+        found = []
+        for wavelength, start, stop in zip(flat_wavelengths, starts, stops):
+            candidates = np.sort(self._central_order[start:stop])
+            distance = np.abs(self.central_wavelengths[candidates] - wavelength)
+            found.append([self.keys[idx] for idx in candidates[distance < epsilon]])
+        if wavelengths.ndim == 0:
+            return found[0]
+        return found
+
+    def bands_overlapping(self, wvl_min: float, wvl_max: float) -> list:
+        """Get the bands with a support range overlapping the [*wvl_min*, *wvl_max*] µm range."""
+        _, support_max, support_order, sorted_support_min = self._get_supports()
+        stop = np.searchsorted(sorted_support_min, wvl_max, side="right")
+        candidates = np.sort(support_order[:stop])
+        overlapping = candidates[support_max[candidates] >= wvl_min]
+        return [self.keys[idx] for idx in overlapping]
+
+    def get_bandname(self, wavelength: float, epsilon: float = 0.1, multiple_bands: bool = False):
+        """Get the band closer than *epsilon* µm to *wavelength*.
+
+        Returns None if no band is found. If several bands are found, an
+        AttributeError is raised unless *multiple_bands* is True, in which case
+        the list of bands is returned.
+
+        """
+        chfound = self.bands_near(wavelength, epsilon)
+        if len(chfound) == 1:
+            return chfound[0]
+        if len(chfound) > 1:
+            bstrlist = ["band={}".format(b) for b in chfound]
+            if not multiple_bands:
+                raise AttributeError("More than one band found with that wavelength! {}".format(str(bstrlist)))
+            LOG.debug("More than one band found with requested wavelength: %s", str(bstrlist))
+            return chfound
+        return None
+
+
+_SPECTRAL_INDEX_CACHE: OrderedDict[Hashable, SpectralIndex] = OrderedDict()
+_SPECTRAL_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def get_spectral_index(sensor: str, rsr: Mapping) -> SpectralIndex:
+    """Get the index of the bands of *rsr*, created once per sensor and RSR file.
+
+    The responses read from an RSR file (see
+    :attr:`~pyspectral.rsr_reader.RelativeSpectralResponse.rsr`) are
+    identified by the path, modification time and size of the file, and the
+    :data:`SPECTRAL_INDEX_CACHE_SIZE` most recently used indexes are kept. The
+    index of any other mapping of responses is created on every call.
+
+    """
+    file_key = getattr(rsr, "file_key", None)
+    if file_key is None:
+        return SpectralIndex.from_rsr(sensor, rsr)
+    key = (sensor, file_key)
+    with _SPECTRAL_INDEX_CACHE_LOCK:
+        index = _SPECTRAL_INDEX_CACHE.get(key)
+        if index is not None:
+            _SPECTRAL_INDEX_CACHE.move_to_end(key)
+            return index
+    index = SpectralIndex.from_rsr(sensor, rsr)
+    with _SPECTRAL_INDEX_CACHE_LOCK:
+        index = _SPECTRAL_INDEX_CACHE.setdefault(key, index)
+        _SPECTRAL_INDEX_CACHE.move_to_end(key)
+        while len(_SPECTRAL_INDEX_CACHE) > SPECTRAL_INDEX_CACHE_SIZE:
+            _SPECTRAL_INDEX_CACHE.popitem(last=False)
+    return index
+
+
+def _get_central_wavelength(rsr: Mapping, channel: str) -> float:
+    """Get the central wavelength of the first detector of a band, without loading it if possible."""
+    get_central_wavelength = getattr(rsr, "get_central_wavelength", None)
+    if get_central_wavelength is not None:
+        return get_central_wavelength(channel)
+    return rsr[channel]["det-1"]["central_wavelength"]
+
+
+def _get_supports(rsr: Mapping, channels: list[str], min_response: float) -> tuple[np.ndarray, np.ndarray]:
+    supports = [_get_support(rsr[channel]["det-1"], min_response) for channel in channels]
+    support_min, support_max = np.array(supports, dtype=np.float64).reshape(len(channels), 2).T
+    return support_min, support_max
+
+
+def _get_support(det_rsr: dict, min_response: float) -> tuple[float, float]:
+    """Get the wavelength range where the response is larger than *min_response*."""
+    try:
+        wavelength = np.asarray(det_rsr["wavelength"])
+        response = np.asarray(det_rsr["response"])
+    except KeyError:
+        return np.nan, np.nan
+    supported = wavelength[response > min_response]
+    if supported.size == 0:
+        return np.nan, np.nan
+    return float(supported.min()), float(supported.max())
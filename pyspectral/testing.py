@@ -169,7 +169,7 @@ def mock_tb_conversion(
         rsr_dir,
         **rsr_files_kwargs,
     )
-    with config_cm, rsr_files_cm as load_rsr:
+    with config_cm, rsr_files_cm as load_rsr, init_tb_cache(tb2rad_dir):
         yield load_rsr
 
     # NOTE: Temporary directory created by tempfile is deleted on garbage collection
@@ -182,8 +182,15 @@ def init_tb_cache(tb2rad_dir: Path) -> Iterator[None]:
 
     It will be filled when tests call the necessary methods of the effected classes.
     """
+    from pyspectral.radiance_tb_conversion import TB2RAD_LUT_REGISTRY
+
     tb2rad_dir.mkdir(parents=True, exist_ok=True)
-    yield
+    # the LUTs of previous uses of the directory may not be on disk anymore
+    TB2RAD_LUT_REGISTRY.clear()
+    try:
+        yield
+    finally:
+        TB2RAD_LUT_REGISTRY.clear()
 
 
 @contextlib.contextmanager
@@ -469,6 +476,8 @@ def override_config(
     config_options: dict | None = None, config_path: Path | None = None
 ) -> Iterator[Path]:
     """Override builtin config with temporary on-disk YAML file."""
+    from pyspectral.config import clear_config_cache
+
     old_config_env = os.getenv("PSP_CONFIG_FILE", None)
 
     config_path_cm = (
@@ -479,6 +488,7 @@ def override_config(
 
     with config_path_cm as config_path:
         os.environ["PSP_CONFIG_FILE"] = str(config_path)
+        clear_config_cache()
         try:
             yield config_path
         finally:
@@ -486,6 +496,7 @@ def override_config(
                 del os.environ["PSP_CONFIG_FILE"]
             else:
                 os.environ["PSP_CONFIG_FILE"] = old_config_env
+            clear_config_cache()
 
 
 @contextlib.contextmanager
@@ -666,11 +677,13 @@ def forbid_pyspectral_downloads():
     a pytest mark to control when tests are allowed to access downloads.
 
     """
-    with mock.patch("pyspectral.utils.requests") as mock_requests:
-        mock_requests.get.side_effect = RuntimeError(
+    with mock.patch("pyspectral.utils.requests") as mock_requests, mock.patch("pyspectral.utils._SESSION", None):
+        download_error = RuntimeError(
             "Pyspectral is attempting a download during tests. Mock pyspectral as necessary to avoid this. "
             "See 'pyspectral.testing' for pyspectral-provided mocking functionality. This message is "
             "configured via a context manager likely being used from a 'your_pkg/tests/conftest.py' "
             "fixture."
         )
+        mock_requests.get.side_effect = download_error
+        mock_requests.Session.return_value.get.side_effect = download_error
         yield
@@ -0,0 +1,56 @@
+"""Test the pyspectral configuration handling."""
+
+import os
+from unittest import mock
+
+import yaml
+
+from pyspectral.config import clear_config_cache, get_config
+from pyspectral.testing import override_config
+
+
+def _write_config(config_path, config_options):
+    with open(config_path, "w") as config_file:
+        yaml.dump(config_options, config_file)
+
+
+def test_get_config_is_cached(tmp_path):
+    """Test that the configuration file is only parsed once."""
+    config_path = tmp_path / "pyspectral.yaml"
+    _write_config(config_path, {"rsr_dir": str(tmp_path / "rsr"), "rayleigh_dir": str(tmp_path / "rayleigh")})
+    clear_config_cache()
+
+    with mock.patch("pyspectral.config.yaml.load", wraps=yaml.load) as load, \
+            mock.patch("pyspectral.config.os.makedirs", wraps=os.makedirs) as makedirs:
+        config1 = get_config(config_path)
+        config2 = get_config(config_path)
+    assert load.call_count == 1
+    assert makedirs.call_count == 2
+    assert config1 == config2
+    assert config1 is not config2
+    assert (tmp_path / "rsr").is_dir()
+    assert (tmp_path / "rayleigh").is_dir()
+
+    config1["rsr_dir"] = "modified"
+    assert get_config(config_path)["rsr_dir"] == str(tmp_path / "rsr")
+
+
+def test_get_config_rereads_modified_file(tmp_path):
+    """Test that a modified configuration file is read again."""
+    config_path = tmp_path / "pyspectral.yaml"
+    _write_config(config_path, {"rsr_dir": str(tmp_path / "rsr")})
+    clear_config_cache()
+    assert get_config(config_path)["rsr_dir"] == str(tmp_path / "rsr")
+
+    _write_config(config_path, {"rsr_dir": str(tmp_path / "other_rsr")})
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_config(config_path)["rsr_dir"] == str(tmp_path / "other_rsr")
+
+
+def test_override_config_invalidates_cache(tmp_path):
+    """Test that overriding the configuration is seen by get_config."""
+    with override_config(config_options={"rsr_dir": str(tmp_path / "rsr1")}):
+        assert get_config()["rsr_dir"] == str(tmp_path / "rsr1")
+    with override_config(config_options={"rsr_dir": str(tmp_path / "rsr2")}):
+        assert get_config()["rsr_dir"] == str(tmp_path / "rsr2")
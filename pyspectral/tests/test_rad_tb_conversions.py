@@ -1,5 +1,7 @@
 """Testing the radiance to brightness temperature conversion."""
 
+import os
+import tempfile
 import unittest
 import warnings
 from unittest.mock import patch
@@ -329,6 +331,71 @@ class TestRadTbConversions(unittest.TestCase):
         res = self.modis.tb2radiance(200.1, lut=False)
         assert res['radiance'] == pytest.approx(865.09759706)
 
+    def test_tb2radiance_lut_is_a_single_dask_key(self):
+        """Test that the look-up table is one key of the dask graph instead of being embedded in every task."""
+        da = pytest.importorskip("dask.array")
+        tb_ = np.arange(200., 320., 0.1)
+        lut = {'tb': tb_, 'radiance': self.modis.tb2radiance(tb_, lut=False)['radiance']}
+        tbs = np.array([237.5, 277.25, 290., 300.5, 310.])
+
+        res = self.modis.tb2radiance(da.from_array(tbs, chunks=1), lut=lut)
+        graph = dict(res['radiance'].__dask_graph__())
+        lut_keys = [key for key in graph if isinstance(key, str) and key.startswith("ndarray-")]
+        assert len(lut_keys) == 1
+        expected = self.modis.tb2radiance(tbs, lut=lut)['radiance']
+        np.testing.assert_allclose(res['radiance'].compute(), expected)
+
+    def _get_lut(self, tb_grid):
+        return {'tb': tb_grid, 'radiance': self.modis.tb2radiance(tb_grid, lut=False)['radiance']}
+
+    def test_tb2radiance_interpolated_lut(self):
+        """Test that interpolating a 1 K LUT is more accurate than the nearest entries of a 0.1 K LUT."""
+        tbs = np.linspace(180., 340., 1001)
+        expected = self.modis.tb2radiance(tbs, lut=False)['radiance']
+        nearest = self.modis.tb2radiance(tbs, lut=self._get_lut(np.arange(150., 360., 0.1)))['radiance']
+
+        lut = self._get_lut(np.arange(150., 360., 1.))
+        interpolated = self.modis.tb2radiance(tbs, lut=lut, interpolate=True)['radiance']
+        assert np.max(np.abs(interpolated / expected - 1)) < np.max(np.abs(nearest / expected - 1)) / 5
+
+        self.modis.lut_interpolation = True
+        interpolated32 = self.modis.tb2radiance(tbs.astype(np.float32), lut=lut)['radiance']
+        assert interpolated32.dtype == np.float32
+        np.testing.assert_allclose(interpolated32, interpolated, rtol=1e-6)
+        expected_scalar = np.interp(237., lut['tb'], lut['radiance'])
+        assert self.modis.tb2radiance(237., lut=lut)['radiance'] == pytest.approx(expected_scalar)
+
+    def test_tb2radiance_interpolated_non_uniform_lut(self):
+        """Test interpolating a LUT with non-uniformly spaced temperatures, for numpy and dask arrays."""
+        da = pytest.importorskip("dask.array")
+        tb_grid = np.concatenate((np.arange(150., 250., 0.5), np.arange(250., 361., 2.)))
+        tbs = np.array([[200.25, 237.], [251., 300.5]])
+        expected = self.modis.tb2radiance(tbs.ravel(), lut=False)['radiance'].reshape(tbs.shape)
+
+        lut = self._get_lut(tb_grid)
+        res = self.modis.tb2radiance(tbs, lut=lut, interpolate=True)['radiance']
+        np.testing.assert_allclose(res, expected, rtol=2e-3)
+        dask_res = self.modis.tb2radiance(da.from_array(tbs, chunks=1), lut=lut, interpolate=True)['radiance']
+        assert len(dask_res.dask.layers) == 4
+        np.testing.assert_array_equal(dask_res.compute(), res)
+
+        masked = np.ma.masked_array(tbs, mask=[[False, True], [False, False]])
+        masked_res = self.modis.tb2radiance(masked, lut=lut, interpolate=True)['radiance']
+        np.testing.assert_array_equal(np.ma.getmaskarray(masked_res), masked.mask)
+        with pytest.raises(ValueError, match="not spaced by the Tb resolution"):
+            self.modis.tb2radiance(tbs, lut=lut)
+
+    def test_make_tb2rad_lut_non_uniform(self):
+        """Test writing a LUT with given temperatures."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "lut.npz")
+            self.modis.make_tb2rad_lut(filepath, tb_grid=[200., 210., 230.])
+            lut = self.modis.read_tb2rad_lut(filepath)
+            np.testing.assert_array_equal(lut['tb'], [200., 210., 230.])
+            assert lut['radiance'].shape == (3,)
+            with pytest.raises(ValueError):
+                self.modis.make_tb2rad_lut(filepath, tb_grid=[200., 200., 230.])
+
 
 def test_rad2tb_types():
     """Test radiance to brightness temperature conversion preserves shape and type."""
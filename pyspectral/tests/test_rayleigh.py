@@ -4,7 +4,7 @@ import os
 import unittest
 from pathlib import Path
 from typing import Iterator
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import dask.array as da
 import numpy as np
@@ -192,7 +192,8 @@ class TestRayleighDask:
             refl_corr = refl_corr_np
 
         assert isinstance(refl_corr, np.ndarray)
-        np.testing.assert_allclose(refl_corr, exp_result.astype(dtype), atol=4.0e-06)
+        np.testing.assert_allclose(refl_corr, exp_result.astype(dtype), atol=4.0e-06,
+                                   rtol=2e-6 if dtype == np.float32 else 1e-7)
         assert refl_corr.dtype == dtype  # check that the dask array's dtype is equal
 
     def test_get_reflectance_wvl_outside_range(self, override_rayleigh_luts):
@@ -362,7 +363,8 @@ class TestRayleigh:
                 'ch3',
                 redband_refl.astype(dtype))
         assert isinstance(refl_corr, np.ndarray)
-        np.testing.assert_allclose(refl_corr, exp_result.astype(dtype), atol=4.0e-06)
+        np.testing.assert_allclose(refl_corr, exp_result.astype(dtype), atol=4.0e-06,
+                                   rtol=2e-6 if dtype == np.float32 else 1e-7)
 
     @patch('pyspectral.rayleigh.da', None)
     def test_get_reflectance_no_rsr(self, override_rayleigh_luts):
@@ -422,6 +424,467 @@ class TestRayleigh:
                 np.zeros((5, 5), dtype=np.float64),
                 0.64)
 
+    def test_get_reflectance_lut_read_once(self, override_rayleigh_luts):
+        """Test that the LUT file is read once for all the chunks and calls with the same band."""
+        rayleigh.RAYLEIGH_LUT_CACHE.clear()
+        rayl = _create_rayleigh()
+        sun_zenith = da.from_array(np.array([67., 32., 60., 20.]), chunks=1)
+        sat_zenith = da.from_array(np.array([45., 18., 49., 26.]), chunks=1)
+        azidiff = da.from_array(np.array([150., 110., 140., 130.]), chunks=1)
+        with mocked_rsr(), patch("pyspectral.rayleigh.h5py.File", wraps=rayleigh.h5py.File) as h5_file:
+            refl_corr1 = rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, 'ch3')
+            refl_corr2 = rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, 'ch3')
+        assert h5_file.call_count == 1
+        np.testing.assert_allclose(refl_corr1, refl_corr2)
+        interpolator, = rayleigh.RAYLEIGH_LUT_CACHE._entries.values()
+        assert not interpolator.lut.reflectance.flags.writeable
+
+    def test_rayleigh_lut_cache_reloads_modified_file(self, override_rayleigh_luts):
+        """Test that a LUT file modified on disk is read again."""
+        from pyspectral.testing import _create_fake_rayleigh_file, _default_rayleigh_lut_data
+
+        cache = rayleigh.RayleighLUTCache()
+        rayl = _create_rayleigh()
+        lut_filename = rayl.reflectance_lut_filename.parent / "rayleigh_lut_test.h5"
+        lut_data = _default_rayleigh_lut_data()
+        _create_fake_rayleigh_file(lut_filename, "test", lut_data)
+        first = cache.get(lut_filename, 500., np.float32)
+        assert cache.get(lut_filename, 500., np.float32) is first
+        assert first.reflectance.dtype == np.float32
+
+        lut_data["reflectance"] = lut_data["reflectance"] * 2
+        _create_fake_rayleigh_file(lut_filename, "test", lut_data)
+        os.utime(lut_filename, ns=(0, os.stat(lut_filename).st_mtime_ns + 10 ** 9))
+        second = cache.get(lut_filename, 500., np.float32)
+        np.testing.assert_allclose(second.reflectance, first.reflectance * 2)
+
+    def test_rayleigh_lut_in_shared_memory(self, override_rayleigh_luts, tmp_path, monkeypatch):
+        """Test that the wavelength adjusted LUTs are shared between the caches of different processes."""
+        from pyspectral.shared_arrays import SharedArrayPool
+
+        lut_filename = _create_rayleigh().reflectance_lut_filename
+        expected = rayleigh.RayleighLUTCache().get(lut_filename, 634., np.float32)
+        pool = SharedArrayPool(tmp_path)
+        monkeypatch.setattr(rayleigh, "SHARED_ARRAY_POOL", pool)
+        monkeypatch.setattr(rayleigh, "shared_memory_enabled", lambda: True)
+        try:
+            with patch("pyspectral.rayleigh._read_rayleigh_lut", side_effect=rayleigh._read_rayleigh_lut,
+                       autospec=True) as read_lut:
+                # two caches like in two processes
+                first = rayleigh.RayleighLUTCache().get(lut_filename, 634., np.float32)
+                second = rayleigh.RayleighLUTCache().get(lut_filename, 634., np.float32)
+        finally:
+            pool.close()
+        read_lut.assert_called_once()
+        assert first.reflectance is second.reflectance
+        for arr, expected_arr in zip(first, expected):
+            np.testing.assert_array_equal(arr, expected_arr)
+            assert arr.dtype == expected_arr.dtype
+
+    def test_rayleigh_preload(self, override_rayleigh_luts):
+        """Test preloading the LUTs of all the bands when creating the Rayleigh object."""
+        rayleigh.RAYLEIGH_LUT_CACHE.clear()
+        with mocked_rsr() as rsr_obj:
+            rsr_obj.return_value.band_names = ["ch3"]
+            rayl = rayleigh.Rayleigh('NOAA-20', 'VIIRS', atmosphere='midlatitude summer', preload=True)
+            assert len(rayleigh.RAYLEIGH_LUT_CACHE) == 1
+            with patch("pyspectral.rayleigh.h5py.File") as h5_file:
+                rayl.get_reflectance(np.array([67.], dtype=np.float32), np.array([45.], dtype=np.float32),
+                                     np.array([150.], dtype=np.float32), 'ch3')
+            h5_file.assert_not_called()
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    @pytest.mark.parametrize("use_redband", [False, True])
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_get_reflectances(self, override_rayleigh_luts, use_dask, use_redband, dtype):
+        """Test that the reflectances of several bands are the ones of each band computed alone."""
+        rayl = _create_rayleigh()
+        angles = [np.array([[67., 32.], [60., 20.]]), np.array([[45., 18.], [49., 26.]]),
+                  np.array([[150., 110.], [140., 130.]]), np.array([[14., 5.], [12., 28.]])]
+        if use_dask:
+            angles = [_create_dask_array(angle, dtype).rechunk(1) for angle in angles]
+        else:
+            angles = [angle.astype(dtype) for angle in angles]
+        sun_zenith, sat_zenith, azidiff, redband = angles
+        redband = redband if use_redband else None
+        bands = ['ch3', 0.634, 1.2]
+        with mocked_rsr():
+            refl_corrs = rayl.get_reflectances(sun_zenith, sat_zenith, azidiff, bands, redband)
+            expected = [rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, band, redband) for band in bands]
+        assert isinstance(refl_corrs, da.Array if use_dask else np.ndarray)
+        assert refl_corrs.shape == (3, 2, 2)
+        assert refl_corrs.dtype == dtype
+        np.testing.assert_allclose(refl_corrs, np.stack(expected), rtol=1e-6)
+        np.testing.assert_allclose(refl_corrs[2], 0)
+
+    def test_get_reflectance_single_dask_layer(self, override_rayleigh_luts):
+        """Test that the interpolation and the clipping of the reflectances are done in one dask task per chunk."""
+        rayl = _create_rayleigh()
+        angles = [da.from_array(np.array([67., 32.]), chunks=1), da.from_array(np.array([45., 18.]), chunks=1),
+                  da.from_array(np.array([150., 110.]), chunks=1)]
+        refl_corr = rayl.get_reflectance(*angles, 0.634)
+        # the angles, the interpolator key and the reflectance tasks
+        assert len(refl_corr.dask.layers) == len(angles) + 2
+        assert refl_corr.npartitions == 2
+
+    def test_get_reflectance_interpolator_is_a_single_dask_key(self, override_rayleigh_luts):
+        """Test that the interpolator and its tables are one key of the dask graph, whatever the number of chunks."""
+        rayl = _create_rayleigh()
+        for chunks in (1, 2):
+            angles = [da.from_array(np.array([67., 32., 12., 41.]), chunks=chunks),
+                      da.from_array(np.array([45., 18., 20., 5.]), chunks=chunks),
+                      da.from_array(np.array([150., 110., 80., 20.]), chunks=chunks)]
+            refl_corr = rayl.get_reflectance(*angles, 0.634)
+            graph = dict(refl_corr.__dask_graph__())
+            interpolator_keys = [key for key in graph if isinstance(key, str)]
+            assert len(interpolator_keys) == 1
+            assert len(graph) == (len(angles) + 1) * refl_corr.npartitions + 1
+
+    @pytest.mark.parametrize("wavelength", [0.634, 1.2])
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_get_reflectance_fused_relaxation_and_reduction(self, override_rayleigh_luts, wavelength, dtype):
+        """Test that the relaxation where cloudy and the high zenith reduction are done in the interpolation task."""
+        rayl = _create_rayleigh()
+        sun_zenith = np.array([[67., 32.], [85., np.nan]], dtype=dtype)
+        sat_zenith = np.array([[45., 18.], [49., 26.]], dtype=dtype)
+        azidiff = np.array([[150., 110.], [140., 130.]], dtype=dtype)
+        redband = np.array([[14., 5.], [40., 12.]], dtype=dtype)
+        expected = rayl.reduce_rayleigh_highzenith(
+            sun_zenith, rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, wavelength, redband), 70., 90., 0.8)
+
+        angles = [da.from_array(arr, chunks=1) for arr in (sun_zenith, sat_zenith, azidiff, redband)]
+        refl_corr = rayl.get_reflectance(*angles[:3], wavelength, angles[3], reduce_highzenith=(70., 90., 0.8))
+        assert len(refl_corr.dask.layers) == len(angles) + 2
+        assert refl_corr.dtype == dtype
+        computed = refl_corr.compute()
+        assert computed.dtype == dtype
+        np.testing.assert_allclose(computed, expected)
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    def test_get_reflectance_float32_reduction_with_float64_angles(self, override_rayleigh_luts, use_dask):
+        """Test that the high zenith reduction keeps float32 reflectances in float32 with float64 angles."""
+        rayl = _create_rayleigh()
+        sun_zenith = np.array([[67., 32.], [85., 75.]])
+        sat_zenith = np.array([[45., 18.], [49., 26.]])
+        azidiff = np.array([[150., 110.], [140., 130.]])
+        redband = np.array([[14., 5.], [40., 12.]], dtype=np.float32)
+        expected = rayl.reduce_rayleigh_highzenith(
+            sun_zenith, rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, 0.634, redband), 70., 90., 0.8)
+        arrays = [sun_zenith, sat_zenith, azidiff, redband]
+        if use_dask:
+            arrays = [da.from_array(arr, chunks=1) for arr in arrays]
+        refl_corr = rayl.get_reflectance(*arrays[:3], 0.634, arrays[3], reduce_highzenith=(70., 90., 0.8))
+        assert refl_corr.dtype == np.float32
+        computed = np.asarray(refl_corr)
+        assert computed.dtype == np.float32
+        np.testing.assert_allclose(computed, expected, rtol=1e-6)
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_get_reflectances_fused_relaxation_and_reduction(self, override_rayleigh_luts, dtype):
+        """Test that the bands are relaxed where cloudy and reduced at high zenith in the interpolation task."""
+        rayl = _create_rayleigh()
+        sun_zenith = np.array([[67., 32.], [85., np.nan]], dtype=dtype)
+        sat_zenith = np.array([[45., 18.], [49., 26.]], dtype=dtype)
+        azidiff = np.array([[150., 110.], [140., 130.]], dtype=dtype)
+        redband = np.array([[14., 5.], [40., 12.]], dtype=dtype)
+        bands = [0.634, 0.5, 1.2]
+        reduce_highzenith = (70., 90., 0.8)
+        expected = np.stack([rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, band, redband,
+                                                  reduce_highzenith=reduce_highzenith) for band in bands])
+        np.testing.assert_allclose(rayl.get_reflectances(sun_zenith, sat_zenith, azidiff, bands, redband,
+                                                         reduce_highzenith=reduce_highzenith), expected)
+
+        angles = [da.from_array(arr, chunks=1) for arr in (sun_zenith, sat_zenith, azidiff, redband)]
+        refl_corrs = rayl.get_reflectances(*angles[:3], bands, angles[3], reduce_highzenith=reduce_highzenith)
+        assert len(refl_corrs.dask.layers) == len(angles) + 2
+        assert refl_corrs.npartitions == 4
+        computed = refl_corrs.compute()
+        assert computed.dtype == dtype
+        np.testing.assert_allclose(computed, expected)
+
+    def test_rayleigh_interpolator_tiles(self, override_rayleigh_luts, monkeypatch):
+        """Test that the pixels are interpolated tile by tile in reused scratch buffers."""
+        rayl = _create_rayleigh()
+        interpolator = rayl._get_band_interpolator(0.634, np.float32)
+        rng = np.random.default_rng(0)
+        sun_zenith, sat_zenith = rng.uniform(0, 90, (2, 7, 5)).astype(np.float32)
+        azidiff = rng.uniform(0, 180, (7, 5)).astype(np.float32)
+        expected = interpolator(sun_zenith, sat_zenith, azidiff)
+        monkeypatch.setattr(rayleigh, "RAYLEIGH_TILE_SIZE", 8)
+        res = interpolator(sun_zenith, sat_zenith, azidiff)
+        buffers = rayleigh._SCRATCH.buffers[("values", np.dtype(np.float32).str)]
+        interpolator(sun_zenith, sat_zenith, azidiff)
+        assert rayleigh._SCRATCH.buffers[("values", np.dtype(np.float32).str)] is buffers
+        assert res.dtype == np.float32
+        np.testing.assert_array_equal(res, expected)
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_rayleigh_interpolator_keeps_table_dtype(self, override_rayleigh_luts, dtype):
+        """Test that the interpolation is done in the data type of the table, without upcasting float32."""
+        interpolator = _create_rayleigh()._get_band_interpolator(0.634, dtype)
+        angles = [np.array([67., 32.], dtype=dtype), np.array([45., 18.], dtype=dtype),
+                  np.array([150., 110.], dtype=dtype)]
+        with patch.object(rayleigh, "_get_scratch_buffers", wraps=rayleigh._get_scratch_buffers) as get_buffers:
+            res = interpolator(*angles)
+        buffer_dtypes = {call.args[0]: np.dtype(call.args[3]) for call in get_buffers.call_args_list}
+        for name in ("points", "weights", "corners", "values"):
+            assert buffer_dtypes[name] == dtype
+        assert res.dtype == dtype
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    def test_get_reflectance_angle_decimation(self, override_rayleigh_luts, use_dask):
+        """Test that the reflectances upsampled from tie points are close to the fully interpolated ones."""
+        rayl = _create_rayleigh()
+        rows, cols = np.mgrid[0:40, 0:50]
+        sun_zenith = (20 + rows + cols / 5).astype(np.float32)
+        sat_zenith = (10 + cols).astype(np.float32)
+        azidiff = (30 + rows + cols).astype(np.float32)
+        sun_zenith[:3, :3] = np.nan
+        # a discontinuity the tie points can't follow
+        azidiff[20:, 30:] += 40
+        angles = (sun_zenith, sat_zenith, azidiff)
+        if use_dask:
+            angles = tuple(da.from_array(angle, chunks=(15, 20)) for angle in angles)
+        expected = rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, 0.634)
+        refl_corr = rayl.get_reflectance(*angles, 0.634, angle_decimation=4, angle_decimation_tolerance=0.05)
+        refl_corrs = rayl.get_reflectances(*angles, [0.634, 1.2], angle_decimation=4,
+                                           angle_decimation_tolerance=0.05)
+        assert isinstance(refl_corr, da.Array if use_dask else np.ndarray)
+        assert refl_corr.dtype == np.float32
+        refl_corr, refl_corrs = np.asarray(refl_corr), np.asarray(refl_corrs)
+        # the tolerance is checked at the centre of the tie point cells only
+        np.testing.assert_allclose(refl_corr, expected, atol=0.1)
+        np.testing.assert_allclose(refl_corrs[0], refl_corr)
+        np.testing.assert_allclose(refl_corrs[1], 0)
+        # without the check the cells around the discontinuity and the missing angles are wrong
+        unchecked = rayl.get_reflectance(*angles, 0.634, angle_decimation=4, angle_decimation_tolerance=np.inf)
+        assert np.abs(np.asarray(unchecked) - expected).max() > 1
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_get_reflectance_static_geometry(self, override_rayleigh_luts, use_dask, dtype):
+        """Test that the static geometry gives the results of the satellite zenith angles, computing them once."""
+        rayl = _create_rayleigh()
+        rng = np.random.default_rng(0)
+        sun_zenith, sat_zenith = rng.uniform(0, 90, (2, 6, 5)).astype(dtype)
+        azidiff = rng.uniform(0, 180, (6, 5)).astype(dtype)
+        sat_zenith[0, :2] = np.nan
+        if use_dask:
+            sun_zenith, sat_zenith, azidiff = (da.from_array(arr, chunks=3) for arr in (sun_zenith, sat_zenith,
+                                                                                        azidiff))
+        expected = rayl.get_reflectance(sun_zenith, sat_zenith, azidiff, 0.634)
+        expected_stack = rayl.get_reflectances(sun_zenith, sat_zenith, azidiff, [0.634, 0.5])
+
+        static_geometry = rayleigh.StaticGeometry(sat_zenith, key="area")
+        with patch.object(rayleigh.RayleighInterpolator, "get_satellite_cells",
+                          side_effect=rayleigh.RayleighInterpolator.get_satellite_cells, autospec=True) as get_cells:
+            refl_corrs = rayl.get_reflectances(sun_zenith, None, azidiff, [0.634, 0.5],
+                                               static_geometry=static_geometry)
+            # with dask, one call to get the dtypes of the grid cells and one per chunk
+            exp_calls = 1 + 4 if use_dask else 1
+            assert get_cells.call_count == exp_calls
+            if use_dask:
+                assert all(len(arr.dask) == arr.npartitions
+                           for arr in static_geometry.get_satellite_cells(rayl._get_band_interpolator(0.634, dtype)))
+                refl_corrs = refl_corrs.compute()
+            refl_corr = rayl.get_reflectance(sun_zenith, None, azidiff, 0.634, static_geometry=static_geometry)
+            # the following time slots reuse the grid cells
+            assert get_cells.call_count == exp_calls
+        np.testing.assert_array_equal(refl_corr, np.asarray(expected))
+        np.testing.assert_array_equal(refl_corrs, np.asarray(expected_stack))
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    def test_get_reflectance_static_geometry_shape_mismatch(self, override_rayleigh_luts, use_dask):
+        """Test that a static geometry of another shape than the angles is refused."""
+        rayl = _create_rayleigh()
+        sun_zenith, azidiff = np.full((2, 4, 5), 30.)
+        static_geometry = rayleigh.StaticGeometry(np.full((4, 4), 30.))
+        if use_dask:
+            sun_zenith, azidiff = da.from_array(sun_zenith), da.from_array(azidiff)
+        with pytest.raises(ValueError, match="doesn't match the shape"):
+            rayl.get_reflectance(sun_zenith, None, azidiff, 0.634, static_geometry=static_geometry)
+        with pytest.raises(ValueError, match="doesn't match the shape"):
+            rayl.get_reflectances(sun_zenith, None, azidiff, [0.634], static_geometry=static_geometry)
+
+    def test_get_static_geometry(self):
+        """Test that the static geometry of an area is reused."""
+        sat_zenith = da.zeros((4, 4), chunks=2)
+        static_geometry = rayleigh.get_static_geometry("area", sat_zenith)
+        assert rayleigh.get_static_geometry("area", da.ones((4, 4))) is static_geometry
+        assert rayleigh.get_static_geometry("other_area", sat_zenith) is not static_geometry
+        assert rayleigh.get_static_geometry("area", da.ones((3, 4))) is not static_geometry
+
+    def test_static_geometry_and_angle_decimation(self, override_rayleigh_luts):
+        """Test that a static geometry can't be combined with an angle decimation."""
+        rayl = _create_rayleigh()
+        angles = np.zeros((3, 4, 4))
+        with pytest.raises(ValueError):
+            rayl.get_reflectance(angles[0], None, angles[2], 0.634, angle_decimation=2,
+                                 static_geometry=rayleigh.StaticGeometry(angles[1]))
+
+    def test_decimated_interpolator_upsamples_tie_points(self):
+        """Test that the pixels between tie points are upsampled when the tolerance allows it."""
+        interpolator = MagicMock(dtype=np.float64, side_effect=lambda sunz, satz, azi, clip: sunz + satz + azi)
+        decimated = rayleigh.DecimatedRayleighInterpolator(interpolator, 4)
+        rows, cols = np.mgrid[0:10, 0:10]
+        res = decimated(rows * 2., cols * 3., np.ones((10, 10)))
+        np.testing.assert_allclose(res, rows * 2. + cols * 3. + 1)
+        tie_point_rows = interpolator.call_args_list[0].args[0][..., 0]
+        np.testing.assert_array_equal(tie_point_rows, [0, 8, 16, 18])
+        assert interpolator.call_count == 2
+
+    def test_decimated_interpolator_bad_decimation(self):
+        """Test that the decimation must be positive."""
+        with pytest.raises(ValueError):
+            rayleigh.DecimatedRayleighInterpolator(MagicMock(), 0)
+
+
+@pytest.fixture
+def rayleigh_band_cache_dir(tmp_path, rayleigh_lut_dir, fake_lut_hdf5):
+    """Configure a rayleigh band cache directory for the duration of the test."""
+    from pyspectral.testing import override_config
+
+    band_cache_dir = tmp_path / "band_cache"
+    config_options = {
+        "rsr_dir": str(rayleigh_lut_dir),
+        "rayleigh_dir": str(rayleigh_lut_dir),
+        "download_from_internet": False,
+        "rayleigh_band_cache_dir": str(band_cache_dir),
+    }
+    with override_config(config_options):
+        yield band_cache_dir
+
+
+class TestRayleighBandCache:
+    """Test the precomputed band tables of the rayleigh correction."""
+
+    def _create_band_cache(self, dtype=np.float32):
+        with mocked_rsr() as rsr_obj:
+            rsr_obj.return_value.band_names = ['ch3']
+            return rayleigh.create_rayleigh_band_cache('NOAA-20', 'VIIRS', atmosphere='midlatitude summer',
+                                                       dtype=dtype)
+
+    def test_create_band_cache(self, rayleigh_band_cache_dir):
+        """Test writing the band tables and coordinates."""
+        band_cache_dir = self._create_band_cache()
+        assert band_cache_dir == rayleigh_band_cache_dir / "NOAA-20-viirs_marine_clean_aerosol_midlatitude_summer"
+        assert sorted(path.name for path in band_cache_dir.iterdir()) == [
+            "azimuth_difference.npy", "index.json", "reflectance_ch3.npy",
+            "satellite_zenith_secant.npy", "sun_zenith_secant.npy"]
+        assert np.load(band_cache_dir / "reflectance_ch3.npy").dtype == np.float32
+
+    @pytest.mark.parametrize("use_dask", [False, True])
+    def test_get_reflectance_from_band_cache(self, rayleigh_band_cache_dir, use_dask):
+        """Test that the band cache gives the results of the LUT file without reading the RSR and LUT files."""
+        angles = [np.array([67., 32.], dtype=np.float32), np.array([45., 18.], dtype=np.float32),
+                  np.array([150., 110.], dtype=np.float32)]
+        if use_dask:
+            angles = [da.from_array(angle, chunks=1) for angle in angles]
+        with mocked_rsr():
+            expected = _create_rayleigh().get_reflectance(*angles, 'ch3')
+        self._create_band_cache()
+
+        with patch("pyspectral.rayleigh.RelativeSpectralResponse") as rsr_obj, \
+                patch("pyspectral.rayleigh.h5py.File") as h5_file:
+            rayl = _create_rayleigh()
+            assert rayl.band_cache is not None
+            refl_corr = rayl.get_reflectance(*angles, 'ch3')
+            refl_corrs = rayl.get_reflectances(*angles, ['ch3', 'ch3'])
+            if use_dask:
+                refl_corr, refl_corrs = da.compute(refl_corr, refl_corrs)
+        rsr_obj.assert_not_called()
+        h5_file.assert_not_called()
+        np.testing.assert_allclose(refl_corr, expected, rtol=1e-6)
+        np.testing.assert_allclose(refl_corrs, [expected, expected], rtol=1e-6)
+
+    def test_band_not_in_band_cache(self, rayleigh_band_cache_dir):
+        """Test that bands missing in the band cache are taken from the LUT file."""
+        self._create_band_cache()
+        rayl = _create_rayleigh()
+        refl_corr = rayl.get_reflectance(np.array([67., 32.]), np.array([45., 18.]), np.array([150., 110.]), 0.634)
+        assert refl_corr.shape == (2,)
+        assert 0.634 not in rayl.band_cache
+
+    @pytest.mark.parametrize("cache_dtype", [np.float32, np.float64])
+    def test_band_cache_precision(self, rayleigh_band_cache_dir, cache_dtype):
+        """Test that float64 data use the LUT file instead of a float32 band cache."""
+        angles = [np.array([67., 32.]), np.array([45., 18.]), np.array([150., 110.])]
+        with mocked_rsr():
+            expected = _create_rayleigh().get_reflectance(*angles, 'ch3')
+        self._create_band_cache(dtype=cache_dtype)
+
+        rayl = _create_rayleigh()
+        assert rayl.band_cache.dtype == cache_dtype
+        assert rayl.band_cache.supports_dtype(np.float32)
+        assert rayl.band_cache.supports_dtype(np.float64) == (cache_dtype == np.float64)
+        with mocked_rsr(), patch.object(rayl.band_cache, "get_interpolator",
+                                        wraps=rayl.band_cache.get_interpolator) as get_interpolator:
+            refl_corr = rayl.get_reflectance(*angles, 'ch3')
+        assert get_interpolator.called == (cache_dtype == np.float64)
+        assert refl_corr.dtype == np.float64
+        np.testing.assert_allclose(refl_corr, expected, rtol=1e-12)
+
+    def test_band_not_in_band_cache_downloads_lut(self, rayleigh_band_cache_dir):
+        """Test that the LUT file is downloaded if needed before a band missing in the band cache is taken from it."""
+        self._create_band_cache()
+        rayl = _create_rayleigh()
+        rayl.do_download = True
+        rayl.lutfiles_version_uptodate = False
+        angles = [np.array([67., 32.]), np.array([45., 18.]), np.array([150., 110.])]
+        with patch("pyspectral.rayleigh.download_luts") as download_luts:
+            rayl.get_reflectance(*(angle.astype(np.float32) for angle in angles), 'ch3')
+            download_luts.assert_not_called()
+            rayl.get_reflectance(*angles, 0.634)
+            rayl.get_reflectance(*angles, 0.5)
+        download_luts.assert_called_once_with(aerosol_types=['marine_clean_aerosol'],
+                                              atmospheres=['midlatitude summer'])
+
+    def test_outdated_band_cache_is_ignored(self, rayleigh_band_cache_dir):
+        """Test that a band cache made from another version of the LUTs is not used."""
+        import json
+
+        band_cache_dir = self._create_band_cache()
+        index_filename = band_cache_dir / rayleigh.RAYLEIGH_BAND_CACHE_INDEX
+        index = json.loads(index_filename.read_text())
+        index["lut_version"] = "v0.0.0"
+        index_filename.write_text(json.dumps(index))
+        os.utime(index_filename, ns=(0, os.stat(index_filename).st_mtime_ns + 10 ** 9))
+        assert _create_rayleigh().band_cache is None
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_rayleigh_interpolator_matches_multilinear_interpolator(dtype):
+    """Test that the prepared interpolator gives the results of the geotiepoints interpolator."""
+    pytest.importorskip("geotiepoints")
+    from geotiepoints.multilinear import MultilinearInterpolator
+
+    lut = rayleigh.RayleighLUT(
+        TEST_RAYLEIGH_LUT[1].astype(dtype),
+        TEST_RAYLEIGH_SUNZ_COORD.astype(dtype),
+        TEST_RAYLEIGH_AZID_COORD.astype(dtype),
+        TEST_RAYLEIGH_SATZ_COORD.astype(dtype),
+    )
+    rng = np.random.default_rng(12)
+    # angles outside of the grid too, and an azimuth difference extrapolated below the grid
+    sun_zenith = rng.uniform(0, 95, (20, 30)).astype(dtype)
+    sat_zenith = rng.uniform(0, 80, (20, 30)).astype(dtype)
+    azidiff = rng.uniform(-10, 180, (20, 30)).astype(dtype)
+    out = np.empty((20, 30), dtype=dtype)
+
+    res = rayleigh.RayleighInterpolator(lut)(sun_zenith, sat_zenith, azidiff, out=out)
+
+    sunz_sec = 1. / np.cos(np.deg2rad(
+        rayleigh._clip_angles_inside_coordinate_range(sun_zenith, lut.sun_zenith_secant.max())))
+    satz_sec = 1. / np.cos(np.deg2rad(
+        rayleigh._clip_angles_inside_coordinate_range(sat_zenith, lut.satellite_zenith_secant.max())))
+    coords = (lut.sun_zenith_secant, lut.azimuth_difference, lut.satellite_zenith_secant)
+    minterp = MultilinearInterpolator([coord[0] for coord in coords], [coord[-1] for coord in coords],
+                                      [coord.size for coord in coords], dtype=dtype)
+    minterp.set_values(np.atleast_2d(lut.reflectance.ravel()))
+    expected = minterp(np.vstack((sunz_sec.ravel(), 180 - azidiff.ravel(), satz_sec.ravel()))) * 100
+    assert res is out
+    np.testing.assert_allclose(res, expected.reshape(res.shape), rtol=1e-5 if dtype == np.float32 else 1e-12)
+
 
 @pytest.mark.parametrize(
     ("version", "exp_download"),
@@ -443,3 +906,22 @@ def test_check_and_download(tmp_path, version, exp_download):
             download.assert_called()
         else:
             download.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "out",
+    [
+        np.empty((30, 20), dtype=np.float32).T,
+        np.empty((20, 40), dtype=np.float32)[:, ::2],
+        np.empty((20, 30), dtype=np.float64),
+        np.empty((20, 31), dtype=np.float32),
+    ]
+)
+def test_rayleigh_interpolator_bad_out_array(out):
+    """Test that output arrays the results can't be written in directly are refused."""
+    lut = rayleigh.RayleighLUT(TEST_RAYLEIGH_LUT[1].astype(np.float32), TEST_RAYLEIGH_SUNZ_COORD.astype(np.float32),
+                               TEST_RAYLEIGH_AZID_COORD.astype(np.float32),
+                               TEST_RAYLEIGH_SATZ_COORD.astype(np.float32))
+    angles = np.full((3, 20, 30), 30., dtype=np.float32)
+    with pytest.raises(ValueError, match="C-contiguous array of shape"):
+        rayleigh.RayleighInterpolator(lut)(*angles, out=out)
@@ -240,6 +240,292 @@ class TestReflectance:
         except ImportError:
             pass
 
+    def test_lut_registry(self, tmp_path):
+        """Test that the Tb to radiance LUT is read once for all the calculators of a band and kept in memory."""
+        from pyspectral.radiance_tb_conversion import TB2RAD_LUT_REGISTRY
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value), \
+                patch("pyspectral.radiance_tb_conversion.np.load", wraps=np.load) as np_load:
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+            refl37_again = Calculator('EOS-Aqua', 'modis', '20')
+            assert len(TB2RAD_LUT_REGISTRY) == 1
+            refl37_again.reflectance_from_tbs(np.array([80.]), np.array([295.]), np.array([282.]))
+            np_load.assert_called_once()
+            assert refl37_again.lut is refl37.lut
+            assert not refl37.lut["radiance"].flags.writeable
+            assert refl37.lut["tb"][0] == 150.
+        assert len(TB2RAD_LUT_REGISTRY) == 0
+
+    def test_lut_registry_reloads_modified_file(self, tmp_path):
+        """Test that a Tb to radiance LUT file changed on disk is read again."""
+        from pyspectral.radiance_tb_conversion import TB2RAD_LUT_REGISTRY
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+            np.savez(refl37.lutfile, tb=np.array([200., 250., 300.]), radiance=np.array([1., 2., 3.]))
+            refl37_modified = Calculator('EOS-Aqua', 'modis', '20')
+            assert len(TB2RAD_LUT_REGISTRY) == 2
+            assert refl37_modified.lut is not refl37.lut
+            np.testing.assert_array_equal(refl37_modified.lut["tb"], [200., 250., 300.])
+
+    def test_lut_created_once(self, tmp_path):
+        """Test that concurrent calculators create the missing LUT file once, atomically."""
+        import threading
+
+        from pyspectral.radiance_tb_conversion import TB2RAD_LUT_REGISTRY, RadTbConverter
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value), \
+                patch.object(RadTbConverter, "make_tb2rad_lut", side_effect=RadTbConverter.make_tb2rad_lut,
+                             autospec=True) as make_lut:
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+            lutfile = refl37.lutfile
+            expected = dict(refl37.lut)
+            TB2RAD_LUT_REGISTRY.clear()
+            (tmp_path / lutfile).unlink()
+            luts = []
+
+            def _make_and_read_lut():
+                refl37._make_lut_if_missing()
+                luts.append(refl37.read_tb2rad_lut(lutfile))
+
+            threads = [threading.Thread(target=_make_and_read_lut) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert make_lut.call_count == 2
+        assert len(luts) == 4
+        for lut in luts:
+            np.testing.assert_array_equal(lut["radiance"], expected["radiance"])
+        assert sorted(path.name for path in tmp_path.iterdir() if "tb2rad" in path.name) == [
+            "tb2rad_lut_eos-aqua_modis_20.npz", "tb2rad_lut_eos-aqua_modis_20.npz.lock"]
+
+    def test_reflectance_interpolated_lut(self, tmp_path):
+        """Test the reflectances derived with a coarse interpolated LUT."""
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20', tb_resolution=1., lut_interpolation=True)
+            assert refl37.lutfile.endswith("tb2rad_lut_eos-aqua_modis_20_1K.npz")
+            assert refl37.lut["tb"].size == 210
+
+        sunz = np.array([80., 50.], dtype=np.float32)
+        tb3 = np.array([295., 300.], dtype=np.float32)
+        tb4 = np.array([282., 285.], dtype=np.float32)
+        refl = refl37.reflectance_from_tbs(sunz, tb3, tb4)
+        assert refl.dtype == np.float32
+        np.testing.assert_allclose(refl, [0.452497961, 0.1189217], rtol=1e-3)
+
+    def test_reflectance_non_uniform_lut(self, tmp_path):
+        """Test the reflectances derived with a LUT made on a given, non-uniform, Tb grid."""
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        tb_grid = np.concatenate((np.arange(150., 280., 2.), np.arange(280., 360., 0.5)))
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            with pytest.raises(ValueError, match="LUT interpolation"):
+                Calculator('EOS-Aqua', 'modis', '20', tb_grid=tb_grid)
+            refl37 = Calculator('EOS-Aqua', 'modis', '20', lut_interpolation=True, tb_grid=tb_grid)
+            assert "tb2rad_lut_eos-aqua_modis_20_grid" in refl37.lutfile
+            np.testing.assert_array_equal(refl37.lut["tb"], tb_grid)
+
+        sunz = np.array([80., 50.], dtype=np.float32)
+        tb3 = np.array([295., 300.], dtype=np.float32)
+        tb4 = np.array([282., 285.], dtype=np.float32)
+        refl = refl37.reflectance_from_tbs(sunz, tb3, tb4)
+        np.testing.assert_allclose(refl, [0.452497961, 0.1189217], rtol=1e-3)
+
+        refl37.lut_interpolation = False
+        with pytest.raises(ValueError, match="not spaced by the Tb resolution"):
+            refl37.reflectance_from_tbs(sunz, tb3, tb4)
+
+    def test_reflectance_fused_kernel(self, tmp_path, monkeypatch):
+        """Test that the reflectances are derived tile by tile, and in a single task per block with dask."""
+        import dask.array as da
+
+        from pyspectral import near_infrared_reflectance
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+        monkeypatch.setattr(near_infrared_reflectance, "NIR_TILE_SIZE", 4)
+
+        sunz = np.repeat(np.array([[80., 50., 88.]], dtype=np.float32), 3, axis=0).T
+        tb3 = np.repeat(np.array([[295., 300., 300.]], dtype=np.float32), 3, axis=0).T
+        tb4 = np.full((3, 3), 282., dtype=np.float32)
+        tb4[1] = 285.
+        tb3[0, 0] = np.nan
+        expected = np.array([[np.nan, 0.452498, 0.452498], [0.1189217] * 3, [np.nan] * 3])
+        expected_tb = [[270.077268] * 2, [282.455426] * 2]
+
+        refl = refl37.reflectance_from_tbs(sunz, tb3, tb4)
+        assert refl.dtype == np.float32
+        np.testing.assert_allclose(refl, expected, rtol=1e-5)
+        np.testing.assert_allclose(refl37.emissive_part_3x()[:2, 1:], expected_tb, rtol=1e-6)
+
+        dask_inputs = [da.from_array(arr, chunks=2) for arr in (sunz, tb3, tb4)]
+        refl = refl37.reflectance_from_tbs(*dask_inputs)
+        # the inputs and the kernel, then one kernel task per block
+        assert len(refl.dask.layers) == 5
+        assert len(refl.dask) == 3 * 4 + 1 + 4
+        np.testing.assert_allclose(refl.compute(), expected, rtol=1e-5)
+        np.testing.assert_allclose(refl37.emissive_part_3x()[:2, 1:].compute(), expected_tb, rtol=1e-6)
+
+    @pytest.mark.filterwarnings("error::RuntimeWarning")
+    def test_reflectance_invalid_tbs(self, tmp_path):
+        """Test that NaN and out of range Tb's give NaN reflectances without warnings."""
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+
+        sunz = np.full(4, 50., dtype=np.float32)
+        tb3 = np.array([300., np.nan, 300., 1e6], dtype=np.float32)
+        tb4 = np.array([285., 285., np.inf, 285.], dtype=np.float32)
+        refl = refl37.reflectance_from_tbs(sunz, tb3, tb4)
+        np.testing.assert_allclose(refl[0], 0.1189217, rtol=1e-5)
+        assert np.isnan(refl[1:3]).all()
+        assert np.isfinite(refl[3])
+        res = refl37.derive_reflectance(sunz, tb3, tb4, emissive_part=True)
+        assert np.isnan(res.emissive_radiance[1])
+        assert np.isnan(res.emissive_tb[1])
+
+    def test_derive_reflectance(self, tmp_path):
+        """Test deriving the reflectance and the emissive part together, without state on the calculator."""
+        import dask.array as da
+
+        from pyspectral.near_infrared_reflectance import NIRReflectance
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+
+        sunz = np.array([80., 50.], dtype=np.float32)
+        tb3 = np.array([295., 300.], dtype=np.float32)
+        tb4 = np.array([282., 285.], dtype=np.float32)
+        result = refl37.derive_reflectance(sunz, tb3, tb4)
+        assert isinstance(result, NIRReflectance)
+        np.testing.assert_allclose(result.reflectance, [0.452498, 0.1189217], rtol=1e-5)
+        assert result.emissive_radiance is None
+        assert result.emissive_tb is None
+
+        result = refl37.derive_reflectance(sunz, tb3, tb4, emissive_part=True)
+        assert result.reflectance.dtype == result.emissive_tb.dtype == np.float32
+        np.testing.assert_allclose(result.reflectance, [0.452498, 0.1189217], rtol=1e-5)
+        np.testing.assert_allclose(result.emissive_tb, [270.077268, 282.455426], rtol=1e-6)
+        np.testing.assert_allclose(refl37.radiance2tb(result.emissive_radiance), result.emissive_tb)
+        assert refl37.emissive_part_3x() is None
+
+        dask_result = refl37.derive_reflectance(da.from_array(sunz, chunks=1), tb3, da.from_array(tb4, chunks=1),
+                                                emissive_part=True)
+        assert all(hasattr(arr, "compute") for arr in dask_result)
+        for dask_arr, arr in zip(dask_result, result):
+            np.testing.assert_array_equal(dask_arr.compute(), arr)
+
+    def test_reflectance_from_tbs_keeps_no_inputs(self, tmp_path):
+        """Test that the calculator derives the reflectances only, keeping neither the Tb's nor the emissive part."""
+        import gc
+        import weakref
+
+        from pyspectral import near_infrared_reflectance
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+
+        inputs = [np.array([80., 50.], dtype=np.float32), np.array([295., 300.], dtype=np.float32),
+                  np.array([282., 285.], dtype=np.float32)]
+        input_refs = [weakref.ref(arr) for arr in inputs]
+        arrays = {name for name, value in vars(refl37).items() if isinstance(value, np.ndarray)}
+        with patch.object(near_infrared_reflectance, "_apply_kernel",
+                          side_effect=near_infrared_reflectance._apply_kernel) as apply_kernel:
+            refl = refl37.reflectance_from_tbs(*inputs)
+            assert apply_kernel.call_args.args[1] == "reflectance"
+            apply_kernel.reset_mock()
+        assert refl.base is None or refl.base.shape == refl.shape
+        assert {name for name, value in vars(refl37).items() if isinstance(value, np.ndarray)} == arrays
+        np.testing.assert_allclose(refl37.emissive_part_3x(), [270.077268, 282.455426], rtol=1e-6)
+
+        del inputs
+        gc.collect()
+        assert all(ref() is None for ref in input_refs)
+        assert refl37.emissive_part_3x() is None
+
+    def test_derive_reflectance_threads(self, tmp_path):
+        """Test that one calculator derives the reflectances of concurrent threads."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        return_value = {
+            "description": "ABCD",
+            "instrument": "modis",
+            "platform_name": "EOS-Aqua",
+            "band_names": list(TEST_RSR.keys()),
+            "rsr": TEST_RSR,
+        }
+        with mock_tb_conversion(tb2rad_dir=tmp_path, return_value=return_value):
+            refl37 = Calculator('EOS-Aqua', 'modis', '20')
+
+        inputs = [(np.full(1000, sunz), np.full(1000, tb3), np.full(1000, tb4))
+                  for sunz, tb3, tb4 in [(80., 295., 282.), (50., 300., 285.)] * 8]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda args: refl37.derive_reflectance(*args, emissive_part=True), inputs))
+        for result, expected_tb in zip(results, [270.077268, 282.455426] * 8):
+            np.testing.assert_allclose(result.emissive_tb, expected_tb, rtol=1e-6)
+
 
 def test_get_as_array_from_scalar_input_dask():
     """Test the function to return an array when input is a scalar - using Dask."""
@@ -1,6 +1,7 @@
 """Unit testing the generic rsr hdf5 reader."""
 from __future__ import annotations
 
+import os
 import unittest
 
 import numpy as np
@@ -8,7 +9,8 @@ import pytest
 
 from pyspectral.rsr_reader import RelativeSpectralResponse, RSRDict
 from pyspectral.testing import mock_rsr
-from pyspectral.utils import RSR_DATA_VERSION, WAVE_NUMBER
+from pyspectral.tests.unittest_helpers import write_fake_rsr_file
+from pyspectral.utils import RSR_DATA_VERSION, WAVE_LENGTH, WAVE_NUMBER
 
 TEST_RSR = {'20': {}, }
 TEST_RSR['20']['det-1'] = {}
@@ -279,7 +281,7 @@ def test_rsr_download_from_platform_and_instrument(tmp_path, version):
     with (mock_rsr(rsr_dir=tmp_path, download_from_internet=True, rsr_data_version=version),
           unittest.mock.patch("pyspectral.rsr_reader.download_rsr") as download):
         RelativeSpectralResponse("GOES-16", "abi")
-        download.assert_called()
+        download.assert_called_once_with(dest_dir=None, dry_run=False, platform_names=["GOES-16"], instruments=["abi"])
 
 
 @pytest.mark.parametrize(
@@ -300,3 +302,272 @@ def test_check_and_download(tmp_path, version, exp_download):
             download.assert_called()
         else:
             download.assert_not_called()
+
+
+def test_rsr_cache_reuses_file_content(tmp_path):
+    """Test that the RSR file is only read once and the arrays are shared read-only."""
+    from pyspectral.rsr_reader import RSRCache, _load_band_from_file, _load_rsr_info_from_file
+
+    filename = tmp_path / "my_file.h5"
+    write_fake_rsr_file(filename)
+    cache = RSRCache()
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", cache), \
+            unittest.mock.patch("pyspectral.rsr_reader._load_rsr_info_from_file",
+                                wraps=_load_rsr_info_from_file) as load_rsr, \
+            unittest.mock.patch("pyspectral.rsr_reader._load_band_from_file",
+                                wraps=_load_band_from_file) as load_band:
+        rsr1 = RelativeSpectralResponse(filename=filename)
+        rsr2 = RelativeSpectralResponse(filename=filename)
+        resp1 = rsr1.rsr["ch1"]["det-1"]["response"]
+        resp2 = rsr2.rsr["ch1"]["det-1"]["response"]
+    load_rsr.assert_called_once()
+    load_band.assert_called_once()
+    assert len(cache) == 1
+    assert cache.nbytes > 0
+    assert resp1 is resp2
+    assert not resp1.flags.writeable
+    # the shared detector dictionaries are read-only
+    with pytest.raises(TypeError):
+        rsr1.rsr["ch1"]["det-1"]["response"] = None
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_rsr_bands_loaded_lazily(tmp_path):
+    """Test that band data are only read from file when the band is accessed."""
+    from pyspectral.rsr_reader import RSRCache, _load_band_from_file
+
+    filename = tmp_path / "rsr_abi_GOES-16.h5"
+    write_fake_rsr_file(filename)
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()), \
+            unittest.mock.patch("pyspectral.rsr_reader._load_band_from_file",
+                                wraps=_load_band_from_file) as load_band:
+        test_rsr = RelativeSpectralResponse(filename=filename)
+        assert test_rsr.band_names == ["ch1", "ch2"]
+        assert test_rsr.description == "ABCD"
+        assert list(test_rsr.rsr.keys()) == ["ch1", "ch2"]
+        assert not test_rsr.rsr.is_loaded("ch1")
+        load_band.assert_not_called()
+
+        # aliases are resolved before loading
+        band_rsr = test_rsr.rsr["C01"]
+        assert test_rsr.rsr.is_loaded("ch1")
+        assert not test_rsr.rsr.is_loaded("C02")
+        load_band.assert_called_once_with(filename, "ch1")
+        assert band_rsr["det-1"]["central_wavelength"] == 0.47
+
+        assert len(list(test_rsr.rsr.values())) == 2
+        assert test_rsr.rsr.is_loaded("ch2")
+        assert load_band.call_count == 2
+
+
+def test_rsr_cache_rereads_modified_file(tmp_path):
+    """Test that a file modified on disk is read again."""
+    from pyspectral.rsr_reader import RSRCache, _load_rsr_info_from_file
+
+    filename = tmp_path / "my_file.h5"
+    write_fake_rsr_file(filename)
+    cache = RSRCache()
+    cache.get(filename, _load_rsr_info_from_file)
+    write_fake_rsr_file(filename, band_names=["ch1"], band_central_wvl=[0.86])
+    stat = filename.stat()
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rsr_info = cache.get(filename, _load_rsr_info_from_file)
+    assert rsr_info["band_names"] == ["ch1"]
+    assert len(cache) == 2
+
+
+def test_rsr_cache_lru_eviction(tmp_path):
+    """Test that the least recently used files are evicted when the memory cap is exceeded."""
+    from pyspectral.rsr_reader import RSRCache, _load_rsr_info_from_file
+
+    filenames = [tmp_path / f"my_file{idx}.h5" for idx in range(3)]
+    for filename in filenames:
+        write_fake_rsr_file(filename)
+    cache = RSRCache()
+    _ = list(cache.get(filenames[0], _load_rsr_info_from_file)["rsr"].values())
+    file_nbytes = cache.nbytes
+    cache.max_bytes = 2 * file_nbytes
+    _ = list(cache.get(filenames[1], _load_rsr_info_from_file)["rsr"].values())
+    # use the first file again so the second one is the least recently used
+    cache.get(filenames[0], _load_rsr_info_from_file)
+    _ = list(cache.get(filenames[2], _load_rsr_info_from_file)["rsr"].values())
+    cache.get(filenames[2], _load_rsr_info_from_file)
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * file_nbytes
+    with unittest.mock.patch("pyspectral.rsr_reader._load_rsr_info_from_file",
+                             wraps=_load_rsr_info_from_file) as load_rsr:
+        cache.get(filenames[0], load_rsr)
+        load_rsr.assert_not_called()
+        cache.get(filenames[1], load_rsr)
+        load_rsr.assert_called_once()
+
+    cache.max_bytes = 0
+    assert cache.nbytes == 0
+
+
+def _multi_detector_band(num_detectors=3):
+    wavelength = TEST_RSR["20"]["det-1"]["wavelength"]
+    response = TEST_RSR["20"]["det-1"]["response"]
+    return {f"det-{det}": {"response": response * (1 - 0.1 * det), "wavelength": wavelength,
+                           "central_wavelength": 3.75 + 0.01 * det}
+            for det in range(1, num_detectors + 1)}
+
+
+def test_band_response():
+    """Test the array-backed band with several detectors."""
+    from pyspectral.rsr_reader import BandResponse
+    from pyspectral.utils import get_central_wave
+
+    band_rsr = _multi_detector_band()
+    band_response = BandResponse.from_detectors(band_rsr)
+    assert isinstance(band_response, BandResponse)
+    assert band_response.responses.shape == (3, band_rsr["det-1"]["wavelength"].size)
+    assert list(band_response) == ["det-1", "det-2", "det-3"]
+    assert len(band_response) == 3
+    assert "det-4" not in band_response
+    for det_name, det_rsr in band_rsr.items():
+        view = band_response[det_name]
+        assert view is band_response[det_name]
+        assert view.keys() == det_rsr.keys()
+        np.testing.assert_array_equal(view["response"], det_rsr["response"])
+        np.testing.assert_array_equal(view["wavelength"], det_rsr["wavelength"])
+        assert view["central_wavelength"] == det_rsr["central_wavelength"]
+        assert not view["response"].flags.writeable
+        with pytest.raises(TypeError):
+            view["response"] = None
+
+    from scipy.integrate import trapezoid
+    np.testing.assert_allclose(band_response.integral(),
+                               [trapezoid(det_rsr["response"], det_rsr["wavelength"])
+                                for det_rsr in band_rsr.values()])
+    weight = 1. / band_rsr["det-1"]["wavelength"] ** 4
+    np.testing.assert_allclose(band_response.get_central_wave(weight),
+                               [get_central_wave(det_rsr["wavelength"], det_rsr["response"], weight)
+                                for det_rsr in band_rsr.values()])
+
+
+def test_band_response_different_grids():
+    """Test that detectors with different wavelength grids are kept as dictionaries."""
+    from pyspectral.rsr_reader import BandResponse
+
+    band_rsr = _multi_detector_band()
+    band_rsr["det-2"]["wavelength"] = band_rsr["det-2"]["wavelength"] + 0.001
+    assert BandResponse.from_detectors(band_rsr) is band_rsr
+
+
+def test_integral_and_convert_band_response(tmp_path):
+    """Test integral and wavenumber conversion of bands backed by a response matrix."""
+    from pyspectral.rsr_reader import BandResponse, RSRCache
+
+    band_rsr = _multi_detector_band()
+    return_value = {
+        "description": "",
+        "instrument": "modis",
+        "platform_name": "EOS-Aqua",
+        "band_names": ["20"],
+        "rsr": {"20": BandResponse.from_detectors(band_rsr)},
+    }
+    with mock_rsr(rsr_dir=tmp_path, return_value=return_value), \
+            unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()):
+        test_rsr = RelativeSpectralResponse("EOS-Aqua", "modis")
+        other_rsr = RelativeSpectralResponse("EOS-Aqua", "modis")
+        integral = test_rsr.integral("20")
+        assert list(integral) == ["det-1", "det-2", "det-3"]
+        np.testing.assert_almost_equal(integral["det-1"], 0.9 * 0.185634, 6)
+
+        test_rsr.convert()
+        np.testing.assert_allclose(test_rsr.rsr["20"]["det-1"]["central_wavenumber"], 2647.397, atol=1e-3)
+        np.testing.assert_allclose(test_rsr.rsr["20"]["det-1"][WAVE_NUMBER], RESULT_WVN_RSR, 5)
+        assert WAVE_LENGTH not in test_rsr.rsr["20"]["det-3"]
+        # the shared band of the other instance is left untouched
+        assert isinstance(other_rsr.rsr["20"], BandResponse)
+        assert WAVE_LENGTH in other_rsr.rsr["20"]["det-1"]
+
+
+def test_band_response_to_wavenumber():
+    """Test the vectorized conversion of a band to wavenumber space."""
+    from pyspectral.rsr_reader import BandResponse, _band_to_wavenumber
+
+    band_rsr = _multi_detector_band()
+    band_response = BandResponse.from_detectors(band_rsr)
+    wavenumber_band = band_response.to_wavenumber()
+    assert band_response.to_wavenumber() is wavenumber_band
+    assert wavenumber_band.to_wavenumber() is wavenumber_band
+    assert wavenumber_band.wavespace == WAVE_NUMBER
+    with pytest.raises(AttributeError):
+        wavenumber_band.wavelength
+
+    expected = _band_to_wavenumber(band_rsr)
+    for det_name, det_rsr in expected.items():
+        view = wavenumber_band[det_name]
+        assert view.keys() == det_rsr.keys()
+        for key, value in det_rsr.items():
+            np.testing.assert_array_equal(view[key], value)
+        assert not view["response"].flags.writeable
+
+
+def test_wavenumber_rsr(tmp_path):
+    """Test that the wavenumber responses are memoized and coexist with the wavelength ones."""
+    from pyspectral.rsr_reader import RSRCache
+
+    filename = tmp_path / "rsr_abi_GOES-16.h5"
+    write_fake_rsr_file(filename)
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()):
+        rsr1 = RelativeSpectralResponse(filename=filename)
+        rsr2 = RelativeSpectralResponse(filename=filename)
+        wavenumber_rsr = rsr1.wavenumber_rsr
+        assert rsr1.wavenumber_rsr is wavenumber_rsr
+        assert not wavenumber_rsr.is_loaded("ch1")
+        assert WAVE_NUMBER in wavenumber_rsr["ch1"]["det-1"]
+        assert WAVE_LENGTH in rsr1.rsr["ch1"]["det-1"]
+        # the conversion is shared by all users of the same file
+        assert rsr2.wavenumber_rsr["ch1"] is wavenumber_rsr["ch1"]
+
+        rsr1.convert()
+        assert rsr1.rsr is wavenumber_rsr
+        assert rsr1.unit == "cm-1"
+        assert rsr1.si_scale == 100.0
+
+
+def test_band_response_metadata_fallback():
+    """Test that missing spectral metadata are computed once when requested."""
+    from pyspectral.rsr_reader import SOLAR_FLUX_DLAMBDA, BandResponse
+    from pyspectral.solar import SolarIrradianceSpectrum
+    from pyspectral.utils import get_central_wave
+
+    band_rsr = _multi_detector_band()
+    band_response = BandResponse.from_detectors(band_rsr)
+    assert band_response.stored_metadata == {}
+
+    rayleigh_wavelengths = band_response.rayleigh_wavelengths
+    assert band_response.rayleigh_wavelengths is rayleigh_wavelengths
+    np.testing.assert_allclose(rayleigh_wavelengths,
+                               [get_central_wave(det_rsr["wavelength"], det_rsr["response"],
+                                                 weight=1. / det_rsr["wavelength"] ** 4)
+                                for det_rsr in band_rsr.values()])
+    solar_spectrum = SolarIrradianceSpectrum(dlambda=SOLAR_FLUX_DLAMBDA)
+    np.testing.assert_allclose(band_response.solar_fluxes,
+                               [solar_spectrum.inband_solarflux(det_rsr) for det_rsr in band_rsr.values()],
+                               rtol=1e-10)
+    np.testing.assert_allclose(band_response.central_wavenumbers, 2647.397, atol=1e-3)
+    assert band_response.fwhms.shape == (3,)
+    assert band_response.energy_bounds.shape == (3, 2)
+    assert set(band_response.stored_metadata) == {"rayleigh_wavelength", "solar_flux", "central_wavenumber",
+                                                  "fwhm", "energy_bounds"}
+    with pytest.raises(ValueError):
+        band_response.to_wavenumber().get_metadata("fwhm")
+
+
+def test_band_response_uses_stored_metadata():
+    """Test that stored spectral metadata are used instead of being computed."""
+    from pyspectral.rsr_reader import BandResponse
+
+    band_response = BandResponse.from_detectors(_multi_detector_band(1),
+                                                metadata={"integral": [1.5], "rayleigh_wavelength": [3.7],
+                                                          "integral_wavenumber": [42.0]})
+    assert band_response.integral() == [1.5]
+    assert band_response.rayleigh_wavelengths == [3.7]
+    assert band_response.to_wavenumber().integral() == [42.0]
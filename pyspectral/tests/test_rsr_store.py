@@ -0,0 +1,101 @@
+"""Unit testing the consolidated RSR store."""
+
+import os
+import unittest
+
+import numpy as np
+import pytest
+
+from pyspectral.rsr_reader import BandResponse, RelativeSpectralResponse, RSRCache, _load_rsr_info_from_hdf5
+from pyspectral.rsr_store import RSR_STORE_FILENAME, RSRStore, create_rsr_store, get_rsr_store
+from pyspectral.tests.unittest_helpers import write_fake_rsr_file
+
+
+@pytest.fixture
+def rsr_dir(tmp_path):
+    """Create a directory with two fake RSR files."""
+    write_fake_rsr_file(tmp_path / "rsr_abi_GOES-16.h5")
+    write_fake_rsr_file(tmp_path / "rsr_abi_GOES-17.h5", band_names=("ch1", "ch2", "ch3"),
+                        band_central_wvl=(0.47, 0.64, 0.86), platform_name="GOES-17")
+    return tmp_path
+
+
+def _load_band_arrays(rsr_info):
+    return {(band_name, det_name, key): rsr_info["rsr"][band_name][det_name][key]
+            for band_name in rsr_info["band_names"]
+            for det_name in rsr_info["rsr"][band_name]
+            for key in ("response", "wavelength", "central_wavelength")}
+
+
+def test_store_roundtrip(rsr_dir):
+    """Test that the store holds the same data as the hdf5 files."""
+    store_filename = create_rsr_store(rsr_dir)
+    assert store_filename == rsr_dir / RSR_STORE_FILENAME
+
+    store = RSRStore(store_filename)
+    assert sorted(store.files) == ["rsr_abi_GOES-16.h5", "rsr_abi_GOES-17.h5"]
+    for rsr_filename in rsr_dir.glob("*.h5"):
+        assert store.is_up_to_date(rsr_filename)
+        expected = _load_rsr_info_from_hdf5(rsr_filename)
+        stored = store.load_rsr_info(rsr_filename)
+        for key in ("platform_name", "instrument", "band_names", "description"):
+            assert stored[key] == expected[key]
+        expected_arrays = _load_band_arrays(expected)
+        stored_arrays = _load_band_arrays(stored)
+        assert expected_arrays.keys() == stored_arrays.keys()
+        for key, value in stored_arrays.items():
+            np.testing.assert_array_equal(value, expected_arrays[key])
+            if isinstance(value, np.ndarray):
+                assert value.dtype == expected_arrays[key].dtype
+                assert not value.flags.writeable
+
+    det_rsr = store.get_detector_rsr("GOES-17", "abi", "ch3")
+    assert det_rsr["central_wavelength"] == 0.86
+
+
+def test_store_is_cached_per_file_version(rsr_dir):
+    """Test that the store is opened once and again after being rewritten."""
+    store_filename = create_rsr_store(rsr_dir)
+    store = get_rsr_store(store_filename)
+    assert get_rsr_store(store_filename) is store
+
+    stat = os.stat(store_filename)
+    os.utime(store_filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_rsr_store(store_filename) is not store
+    assert get_rsr_store(rsr_dir / "missing_store.bin") is None
+
+
+def test_rsr_reader_uses_store(rsr_dir):
+    """Test that the reader takes the data from an up to date store instead of the hdf5 file."""
+    create_rsr_store(rsr_dir)
+    filename = rsr_dir / "rsr_abi_GOES-16.h5"
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()), \
+            unittest.mock.patch("pyspectral.rsr_reader._load_rsr_info_from_hdf5") as load_hdf5:
+        test_rsr = RelativeSpectralResponse(filename=filename)
+        band_rsr = test_rsr.rsr["ch1"]
+    load_hdf5.assert_not_called()
+    assert test_rsr.band_names == ["ch1", "ch2"]
+    assert test_rsr.platform_name == "GOES-16"
+    assert isinstance(band_rsr, BandResponse)
+    assert isinstance(band_rsr.responses.base, np.memmap)
+
+
+def test_rsr_reader_ignores_stale_store(rsr_dir):
+    """Test that the hdf5 file is read when it is newer than the store entry."""
+    create_rsr_store(rsr_dir)
+    filename = rsr_dir / "rsr_abi_GOES-16.h5"
+    write_fake_rsr_file(filename, band_names=("ch1", "ch2", "ch3"), band_central_wvl=(0.47, 0.64, 0.86))
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()):
+        test_rsr = RelativeSpectralResponse(filename=filename)
+    assert test_rsr.band_names == ["ch1", "ch2", "ch3"]
+    assert not test_rsr.rsr.is_loaded("ch1")
+
+
+def test_rsr_reader_ignores_store_of_other_version(rsr_dir):
+    """Test that a store created for another RSR data version is not used."""
+    create_rsr_store(rsr_dir)
+    filename = rsr_dir / "rsr_abi_GOES-16.h5"
+    with unittest.mock.patch("pyspectral.rsr_store.RSR_DATA_VERSION", "v0.0.0"):
+        assert not get_rsr_store(rsr_dir / RSR_STORE_FILENAME).is_up_to_date(filename)
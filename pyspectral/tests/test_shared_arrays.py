@@ -0,0 +1,131 @@
+"""Tests of the sharing of arrays between processes."""
+
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from pyspectral import radiance_tb_conversion, rsr_reader
+from pyspectral.shared_arrays import SharedArrayPool, _open_segment, get_segment_name, shared_memory_enabled
+from pyspectral.testing import override_config
+from pyspectral.tests.unittest_helpers import write_fake_rsr_file
+
+
+def _segment_exists(key):
+    try:
+        shm = _open_segment(get_segment_name(key))
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def _load_arrays():
+    return {"table": np.arange(12.).reshape(3, 4), "names": np.array(["a", "bc"]), "empty": np.zeros(0, np.int16)}
+
+
+def _fail_loading():
+    raise AssertionError("The arrays should be taken from shared memory")
+
+
+def _sum_shared_table(key, lock_dir):
+    pool = SharedArrayPool(lock_dir)
+    arrays = pool.get(key, _fail_loading)
+    return float(arrays["table"].sum())
+
+
+@pytest.fixture
+def segment_key():
+    """Get a key of arrays never published before."""
+    return ("test", uuid.uuid4().hex)
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    """Replace the pool of the process by a new one."""
+    pool = SharedArrayPool(tmp_path)
+    for module in (radiance_tb_conversion, rsr_reader):
+        monkeypatch.setattr(module, "SHARED_ARRAY_POOL", pool)
+        monkeypatch.setattr(module, "shared_memory_enabled", lambda: True)
+    yield pool
+    pool.close()
+
+
+def test_shared_memory_enabled_from_config():
+    """Test that sharing the arrays is enabled in the configuration."""
+    assert not shared_memory_enabled()
+    with override_config(config_options={"use_shared_memory": True}):
+        assert shared_memory_enabled()
+
+
+def test_pools_share_arrays(tmp_path, segment_key):
+    """Test that the arrays are loaded once and shared read-only until the last pool releases them."""
+    pool1 = SharedArrayPool(tmp_path)
+    pool2 = SharedArrayPool(tmp_path)
+    arrays1 = pool1.get(segment_key, _load_arrays)
+    arrays2 = pool2.get(segment_key, _fail_loading)
+    assert pool1.get(segment_key, _fail_loading) is arrays1
+    assert len(pool1) == len(pool2) == 1
+    for name, expected in _load_arrays().items():
+        np.testing.assert_array_equal(arrays2[name], expected)
+        assert arrays2[name].dtype == expected.dtype
+        assert not arrays1[name].flags.writeable
+
+    pool1.release(segment_key)
+    assert _segment_exists(segment_key)
+    pool2.close()
+    assert not _segment_exists(segment_key)
+    assert len(pool2) == 0
+    # still usable after the release
+    assert arrays1["table"].sum() == 66
+
+
+def test_loading_error_publishes_nothing(tmp_path, segment_key):
+    """Test that nothing is published when the arrays can't be loaded."""
+    pool = SharedArrayPool(tmp_path)
+    with pytest.raises(AssertionError):
+        pool.get(segment_key, _fail_loading)
+    assert len(pool) == 0
+    assert not _segment_exists(segment_key)
+
+
+def test_arrays_shared_with_other_processes(tmp_path, segment_key):
+    """Test that other processes attach the arrays published by this process."""
+    pool = SharedArrayPool(tmp_path)
+    pool.get(segment_key, _load_arrays)
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        sums = list(executor.map(_sum_shared_table, [segment_key] * 2, [tmp_path] * 2))
+    assert sums == [66., 66.]
+    # the other processes released their reference when exiting
+    pool.close()
+    assert not _segment_exists(segment_key)
+
+
+def test_tb2rad_lut_in_shared_memory(tmp_path, pool):
+    """Test that the Tb to radiance LUTs are read from shared memory."""
+    lut_filename = tmp_path / "tb2rad_lut.npz"
+    np.savez(lut_filename, tb=np.arange(200., 300.), radiance=np.linspace(0., 1., 100))
+    lut1 = radiance_tb_conversion.RadTbConverter.read_tb2rad_lut(lut_filename)
+    lut2 = radiance_tb_conversion.RadTbConverter.read_tb2rad_lut(lut_filename)
+    assert lut1 is lut2
+    assert len(pool) == 1
+    np.testing.assert_array_equal(lut1["tb"], np.arange(200., 300.))
+    assert not lut1["radiance"].flags.writeable
+
+
+def test_rsr_bands_in_shared_memory(tmp_path, pool, monkeypatch):
+    """Test that the band responses are read from shared memory."""
+    filename = tmp_path / "rsr_abi_GOES-16.h5"
+    write_fake_rsr_file(filename)
+    expected = rsr_reader._read_band_from_file(filename, "ch1")
+    monkeypatch.setattr(rsr_reader, "RSR_CACHE", rsr_reader.RSRCache())
+
+    band_rsr = rsr_reader.RelativeSpectralResponse(filename=filename).rsr["ch1"]
+    assert isinstance(band_rsr, rsr_reader.BandResponse)
+    assert len(pool) == 1
+    assert band_rsr.detector_names == expected.detector_names
+    np.testing.assert_array_equal(band_rsr.responses, expected.responses)
+    np.testing.assert_array_equal(band_rsr.grid, expected.grid)
+    assert band_rsr["det-1"]["central_wavelength"] == 0.47
@@ -61,3 +61,24 @@ class TestSolarflux(unittest.TestCase):
         """Test the interpolate method."""
         self.solar_irr.interpolate(dlambda=0.001, ival_wavelength=(0.200, 0.240))
         self.assertTrue(np.allclose(RESULT_IPOL_WVLS, self.solar_irr.ipol_wavelength))
+
+    def test_solar_flux_detectors(self):
+        """Calculate the solar-flux of all detectors of a band at once."""
+        from pyspectral.rsr_reader import BandResponse
+
+        wvl = TEST_RSR['det-1']['wavelength']
+        band_rsr = {f'det-{det}': {'wavelength': wvl, 'response': TEST_RSR['det-1']['response'] ** det,
+                                   'central_wavelength': 3.78}
+                    for det in range(1, 4)}
+        expected_flux = [self.solar_irr.inband_solarflux(det_rsr, scale=1.0) for det_rsr in band_rsr.values()]
+        expected_irr = [self.solar_irr.inband_solarirradiance(det_rsr, scale=1.0) for det_rsr in band_rsr.values()]
+
+        band_response = BandResponse.from_detectors(band_rsr)
+        self.assertIsInstance(band_response, BandResponse)
+        np.testing.assert_allclose(self.solar_irr.inband_solarflux_detectors(band_response, scale=1.0),
+                                   expected_flux, rtol=1e-10)
+        np.testing.assert_allclose(self.solar_irr.inband_solarirradiance_detectors(band_response, scale=1.0),
+                                   expected_irr, rtol=1e-10)
+        # plain detector dictionaries are handled one by one
+        np.testing.assert_allclose(self.solar_irr.inband_solarflux_detectors(band_rsr, scale=1.0),
+                                   expected_flux, rtol=1e-10)
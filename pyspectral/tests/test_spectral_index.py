@@ -0,0 +1,109 @@
+"""Unit testing the spectral interval index."""
+
+import numpy as np
+import pytest
+
+from pyspectral.spectral_index import SpectralIndex
+from pyspectral.tests.unittest_helpers import write_fake_rsr_file
+
+
+def _fake_rsr(central_wavelengths):
+    rsr = {}
+    for idx, cwl in enumerate(central_wavelengths):
+        wavelength = np.linspace(cwl - 0.05, cwl + 0.05, 11)
+        response = np.zeros(11)
+        response[2:9] = 1.0
+        rsr[f"ch{idx + 1}"] = {"det-1": {"central_wavelength": cwl, "wavelength": wavelength, "response": response}}
+    return rsr
+
+
+def _linear_bands_near(rsr, wavelength, epsilon):
+    return [channel for channel in rsr
+            if abs(rsr[channel]["det-1"]["central_wavelength"] - wavelength) < min(epsilon, 2.0)]
+
+
+def test_bands_near_matches_linear_scan():
+    """Test the vectorized query against a scan of all the bands."""
+    rsr = _fake_rsr([0.64, 0.47, 0.86, 0.51, 3.9, 10.8, 0.865, 12.0])
+    index = SpectralIndex.from_rsr("ufo", rsr)
+    assert len(index) == 8
+
+    wavelengths = np.linspace(0.3, 13.0, 1000)
+    for epsilon in (0.01, 0.1, 0.5, 5.0):
+        found = index.bands_near(wavelengths, epsilon)
+        assert found == [_linear_bands_near(rsr, wvl, epsilon) for wvl in wavelengths]
+
+    # insertion order is kept when several bands are found
+    assert index.bands_near(0.5, 0.1) == ["ch2", "ch4"]
+    assert index.bands_near(0.86, 0.01) == ["ch3", "ch7"]
+    assert index.bands_near(5.0, 0.1) == []
+
+
+def test_bands_overlapping():
+    """Test finding the bands overlapping a wavelength range."""
+    rsr = _fake_rsr([0.64, 0.47, 0.86, 3.9])
+    index = SpectralIndex.from_rsr("ufo", rsr)
+    np.testing.assert_allclose(index.support_min, [0.61, 0.44, 0.83, 3.87])
+    np.testing.assert_allclose(index.support_max, [0.67, 0.50, 0.89, 3.93])
+
+    assert index.bands_overlapping(0.4, 0.7) == ["ch1", "ch2"]
+    assert index.bands_overlapping(0.66, 0.84) == ["ch1", "ch3"]
+    assert index.bands_overlapping(1.0, 3.0) == []
+    assert index.bands_overlapping(0.0, 20.0) == ["ch1", "ch2", "ch3", "ch4"]
+
+
+def test_get_bandname():
+    """Test the single band lookup."""
+    index = SpectralIndex.from_rsr("ufo", _fake_rsr([0.64, 0.47, 0.51]))
+    assert index.get_bandname(0.65) == "ch1"
+    assert index.get_bandname(2.0) is None
+    with pytest.raises(AttributeError):
+        index.get_bandname(0.49)
+    assert index.get_bandname(0.49, multiple_bands=True) == ["ch2", "ch3"]
+
+
+def test_unknown_support():
+    """Test bands without wavelength arrays have no support range."""
+    rsr = {"ch1": {"det-1": {"central_wavelength": 0.6}}}
+    index = SpectralIndex.from_rsr("ufo", rsr)
+    assert index.bands_near(0.6) == ["ch1"]
+    assert index.bands_overlapping(0.0, 1.0) == []
+
+
+def test_from_rsr_files(tmp_path):
+    """Test the index over all the installed RSR files."""
+    write_fake_rsr_file(tmp_path / "rsr_abi_GOES-16.h5")
+    write_fake_rsr_file(tmp_path / "rsr_abi_GOES-17.h5", band_names=("ch1", "ch3"),
+                        band_central_wvl=(0.47, 0.86), platform_name="GOES-17")
+    index = SpectralIndex.from_rsr_files(tmp_path)
+    assert index.bands_near([0.47, 0.86], 0.01) == [
+        [("GOES-16", "abi", "ch1"), ("GOES-17", "abi", "ch1")],
+        [("GOES-17", "abi", "ch3")],
+    ]
+    assert index.bands_overlapping(0.6, 0.7) == [("GOES-16", "abi", "ch2")]
+
+
+def test_index_of_rsr_file_is_lazy_and_cached(tmp_path, monkeypatch):
+    """Test that the index of an RSR file is created once, without loading the bands until needed."""
+    import os
+
+    from pyspectral import rsr_reader
+    from pyspectral.spectral_index import get_spectral_index
+    from pyspectral.utils import get_bandname_from_wavelength
+
+    monkeypatch.setattr(rsr_reader, "RSR_CACHE", rsr_reader.RSRCache())
+    filename = tmp_path / "rsr_abi_GOES-16.h5"
+    write_fake_rsr_file(filename)
+    rsr = rsr_reader.RelativeSpectralResponse(filename=filename).rsr
+
+    assert get_bandname_from_wavelength("abi", 0.47, rsr, epsilon=0.01) == "ch1"
+    assert not any(rsr.is_loaded(band) for band in rsr)
+    index = get_spectral_index("abi", rsr)
+    assert get_spectral_index("abi", rsr_reader.RelativeSpectralResponse(filename=filename).rsr) is index
+
+    assert index.bands_overlapping(0.6, 0.7) == ["ch2"]
+    assert all(rsr.is_loaded(band) for band in rsr)
+
+    stat = filename.stat()
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_spectral_index("abi", rsr_reader.RelativeSpectralResponse(filename=filename).rsr) is not index
@@ -1,10 +1,14 @@
 """Do the unit testing for the utils library."""
 import contextlib
+import hashlib
+import http.server
+import json
 import logging
 import os
 import re
 import tarfile
 import tempfile
+import threading
 import unittest
 import warnings
 from io import BytesIO
@@ -368,11 +372,12 @@ def _create_fake_lut_tarball_bytes(aerosol_types):
 
 
 @contextlib.contextmanager
-def _fake_get_config(tmp_path):
+def _fake_get_config(tmp_path, **extra_options):
     def _get_config():
         return {
             "rayleigh_dir": str(tmp_path),
             "rsr_dir": str(tmp_path),
+            **extra_options,
         }
     with unittest.mock.patch("pyspectral.utils.get_config") as get_config:
         get_config.side_effect = _get_config
@@ -394,6 +399,219 @@ def _check_expected_aerosol_files(atypes_to_create, tmp_path):
             assert not atype_fn.is_file()
 
 
+class _TarballHandler(http.server.BaseHTTPRequestHandler):
+    """Serve a tarball with range requests support, breaking the connection of the first response."""
+
+    def do_GET(self):
+        server = self.server
+        server.range_headers.append(self.headers.get("Range"))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(re.match(r"bytes=(\d+)-", self.headers["Range"]).group(1))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        content = server.content[start:]
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if server.break_connection:
+            server.break_connection = False
+            content = content[:len(content) // 2]
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tarball_server(monkeypatch):
+    """Serve a fake LUT tarball from a local HTTP server."""
+    monkeypatch.setattr(utils, "DOWNLOAD_BACKOFF", 0.0)
+    monkeypatch.setattr(utils, "_DOWNLOAD_CHUNK_SIZE", 1024)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _TarballHandler)
+    server.content = _create_fake_lut_tarball_bytes(["desert_aerosol"]) + b"\0" * 50000
+    server.break_connection = False
+    server.range_headers = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.allow_downloads(use=True)
+@pytest.mark.parametrize("break_connection", [False, True])
+def test_download_tarball_resume(tmp_path, tarball_server, break_connection):
+    """Test that interrupted downloads are resumed from where they stopped and verified."""
+    tarball_server.break_connection = break_connection
+    url = f"http://127.0.0.1:{tarball_server.server_port}/luts.tgz"
+    sha256 = hashlib.sha256(tarball_server.content).hexdigest()
+    utils._download_tarball_and_extract(url, tmp_path, sha256=sha256)
+    version_file = tmp_path / utils.ATM_CORRECTION_LUT_VERSION["desert_aerosol"]["filename"]
+    assert version_file.read_text() == utils.ATM_CORRECTION_LUT_VERSION["desert_aerosol"]["version"]
+    if break_connection:
+        assert tarball_server.range_headers[0] is None
+        assert len(tarball_server.range_headers) == 2
+        assert tarball_server.range_headers[1].startswith("bytes=")
+    else:
+        assert tarball_server.range_headers == [None]
+    assert list(tmp_path.iterdir()) == [version_file]
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_tarball_bad_checksum(tmp_path, tarball_server):
+    """Test that nothing is extracted when the checksum of the download doesn't match."""
+    url = f"http://127.0.0.1:{tarball_server.server_port}/luts.tgz"
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        utils._download_tarball_and_extract(url, tmp_path, sha256="0" * 64)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_tarball_checksum_from_manifest(tmp_path, tarball_server, caplog):
+    """Test that tarballs are verified with the digests of the manifest, and that unverified downloads warn."""
+    url = f"http://127.0.0.1:{tarball_server.server_port}/luts.tgz"
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"manifest_version": utils.DOWNLOAD_MANIFEST_VERSION,
+                                         "tarballs": {url: "0" * 64}}))
+    with _fake_get_config(tmp_path, download_manifest=str(manifest_path)):
+        with pytest.raises(IOError, match="Checksum mismatch"):
+            utils._download_tarball_and_extract(url, tmp_path / "verified")
+
+    with _fake_get_config(tmp_path), caplog.at_level(logging.WARNING):
+        utils._download_tarball_and_extract(url, tmp_path / "unverified")
+    assert f"The download of {url} is not verified" in caplog.text
+    assert list((tmp_path / "unverified").iterdir())
+
+
+def test_download_forbidden(tmp_path):
+    """Test that downloads through the shared session are forbidden during tests."""
+    with pytest.raises(RuntimeError, match="attempting a download"):
+        utils._download_tarball_and_extract(utils.HTTP_PYSPECTRAL_RSR, tmp_path)
+
+
+def _write_manifest(tmp_path, file_contents, rsr_version=utils.RSR_DATA_VERSION):
+    def _files_entry(contents):
+        return {filename: {"size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+                for filename, content in contents.items()}
+
+    manifest = {
+        "manifest_version": utils.DOWNLOAD_MANIFEST_VERSION,
+        "rsr": {"version": rsr_version, "base_url": "https://example.com/rsr/",
+                "files": _files_entry(file_contents["rsr"])},
+        "rayleigh": {"desert_aerosol": {
+            "version": utils.ATM_CORRECTION_LUT_VERSION["desert_aerosol"]["version"],
+            "base_url": "https://example.com/rayleigh/desert_aerosol/",
+            "files": _files_entry(file_contents["rayleigh"]),
+        }},
+    }
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest))
+    return str(manifest_path)
+
+
+_MANIFEST_FILES = {
+    "rsr": {"rsr_seviri_Meteosat-10.h5": b"seviri", "rsr_fci_Meteosat-12.h5": b"fci",
+            "rsr_abi_GOES-16.h5": b"abi"},
+    "rayleigh": {"rayleigh_lut_us-standard.h5": b"us", "rayleigh_lut_tropical.h5": b"tropical"},
+}
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_rsr_from_manifest(tmp_path):
+    """Test that only the missing RSR files of the requested platforms are downloaded with a manifest."""
+    manifest = _write_manifest(tmp_path, _MANIFEST_FILES)
+    dest_dir = tmp_path / "rsr"
+    with _fake_get_config(tmp_path, download_manifest=manifest), responses.RequestsMock() as rsps:
+        for filename in ("rsr_seviri_Meteosat-10.h5", "rsr_fci_Meteosat-12.h5"):
+            rsps.add("GET", f"https://example.com/rsr/{filename}", body=_MANIFEST_FILES["rsr"][filename])
+        utils.download_rsr(dest_dir=dest_dir, platform_names=["Meteosat-10", "Meteosat-12"])
+        # already downloaded files are not downloaded again
+        utils.download_rsr(dest_dir=dest_dir, instruments=["seviri", "fci"])
+        assert len(rsps.calls) == 2
+    downloaded = sorted(path.name for path in dest_dir.glob("rsr_*.h5"))
+    assert downloaded == ["rsr_fci_Meteosat-12.h5", "rsr_seviri_Meteosat-10.h5"]
+    assert (dest_dir / "rsr_fci_Meteosat-12.h5").read_bytes() == b"fci"
+    # only the complete data set is marked with the data version
+    assert not (dest_dir / utils.RSR_DATA_VERSION_FILENAME).exists()
+    # but the fetched files are recorded, so the manifest isn't needed to know they are current
+    assert utils.rsr_files_fetched(dest_dir, ["Meteosat-10"], ["seviri"])
+    assert not utils.rsr_files_fetched(dest_dir, ["GOES-16"], ["abi"])
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_rsr_updates_after_manifest_fetch(tmp_path):
+    """Test that the RSR files fetched from a manifest are not checked again by the following RSR objects."""
+    from pyspectral.rsr_reader import _RSRDataBase
+
+    manifest = _write_manifest(tmp_path, _MANIFEST_FILES)
+    with _fake_get_config(tmp_path, download_manifest=manifest, download_from_internet=True), \
+            unittest.mock.patch("pyspectral.rsr_reader.get_config", side_effect=utils.get_config), \
+            responses.RequestsMock() as rsps:
+        rsps.add("GET", "https://example.com/rsr/rsr_seviri_Meteosat-10.h5",
+                 body=_MANIFEST_FILES["rsr"]["rsr_seviri_Meteosat-10.h5"])
+        assert _RSRDataBase().download_rsr_updates(platform_names=["Meteosat-10"], instruments=["seviri"])
+        with unittest.mock.patch.object(utils, "_get_manifest_section") as get_section:
+            assert not _RSRDataBase().download_rsr_updates(platform_names=["Meteosat-10"], instruments=["seviri"])
+        get_section.assert_not_called()
+        assert len(rsps.calls) == 1
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_rsr_from_manifest_bad_checksum(tmp_path):
+    """Test that files not matching the checksum of the manifest are not kept."""
+    manifest = _write_manifest(tmp_path, _MANIFEST_FILES)
+    with _fake_get_config(tmp_path, download_manifest=manifest), responses.RequestsMock() as rsps:
+        rsps.add("GET", "https://example.com/rsr/rsr_abi_GOES-16.h5", body=b"abj")
+        with pytest.raises(IOError, match="Checksum mismatch"):
+            utils.download_rsr(dest_dir=tmp_path, instruments=["abi"])
+    assert not list(tmp_path.glob("*rsr_abi*"))
+
+
+@pytest.mark.allow_downloads(use=True)
+def test_download_rsr_manifest_other_version(tmp_path):
+    """Test that the complete tarball is downloaded if the manifest doesn't have the needed version."""
+    manifest = _write_manifest(tmp_path, _MANIFEST_FILES, rsr_version="v0.0.1")
+    tar_data = _create_fake_rsr_tarball_bytes()
+    with _fake_get_config(tmp_path, download_manifest=manifest), responses.RequestsMock() as rsps:
+        rsps.add("GET", utils.HTTP_PYSPECTRAL_RSR, body=tar_data)
+        utils.download_rsr(dest_dir=tmp_path, instruments=["abi"])
+    assert (tmp_path / utils.RSR_DATA_VERSION_FILENAME).read_text() == utils.RSR_DATA_VERSION
+
+
+@pytest.mark.parametrize(
+    ("atmospheres", "exp_files"),
+    [
+        (["us-standard"], ["rayleigh_lut_us-standard.h5"]),
+        (None, ["rayleigh_lut_tropical.h5", "rayleigh_lut_us-standard.h5"]),
+    ]
+)
+@pytest.mark.allow_downloads(use=True)
+def test_download_luts_from_manifest(tmp_path, atmospheres, exp_files):
+    """Test that only the LUTs of the requested atmospheres are downloaded with a manifest."""
+    manifest = _write_manifest(tmp_path, _MANIFEST_FILES)
+    with _fake_get_config(tmp_path, download_manifest=manifest), responses.RequestsMock() as rsps:
+        for filename in exp_files:
+            rsps.add("GET", f"https://example.com/rayleigh/desert_aerosol/{filename}",
+                     body=_MANIFEST_FILES["rayleigh"][filename])
+        utils.download_luts(aerosol_types=["desert_aerosol"], atmospheres=atmospheres)
+    lut_dir = tmp_path / "desert_aerosol"
+    assert sorted(path.name for path in lut_dir.glob("*.h5")) == exp_files
+    version_file = lut_dir / utils.ATM_CORRECTION_LUT_VERSION["desert_aerosol"]["filename"]
+    assert version_file.exists() == (atmospheres is None)
+    with _fake_get_config(tmp_path):
+        assert utils.lut_files_fetched("desert_aerosol", ["us-standard"])
+        assert utils.lut_files_fetched("desert_aerosol", ["tropical"]) == (atmospheres is None)
+
+
+def test_load_download_manifest_bad_version(tmp_path):
+    """Test that manifests of an unknown format version are rejected."""
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"manifest_version": 1000}))
+    with pytest.raises(ValueError, match="Unsupported download manifest version"):
+        utils.load_download_manifest(manifest_path)
+
+
 @pytest.mark.parametrize(
     ("platform_name", "input_value_sensor", "exp_sensor_name"),
     [
@@ -454,3 +672,69 @@ def test_are_instruments_identical():
 
     with pytest.raises(ValueError):
         are_instruments_identical(['thing1', 'thing3'], 'thing2')
+
+
+@pytest.mark.parametrize("detectors", [None, ["det-1"]])
+def test_convert2hdf5_spectral_metadata(detectors):
+    """Test that the spectral constants are stored in the RSR file and used when reading it."""
+    from pathlib import Path
+
+    from pyspectral.rsr_reader import SPECTRAL_METADATA, BandResponse, RelativeSpectralResponse, RSRCache
+
+    mocked_rsr = _MockedRSR(usedet=detectors is not None)
+    utils.convert2hdf5(mocked_rsr, 'Test_SAT', ['20'], detectors=detectors)
+    fname = Path(mocked_rsr.output_dir) / 'rsr_test_sensor_Test_SAT.h5'
+
+    with unittest.mock.patch("pyspectral.rsr_reader.RSR_CACHE", RSRCache()):
+        band_rsr = RelativeSpectralResponse(filename=fname).rsr['20']
+    os.remove(fname)
+    assert isinstance(band_rsr, BandResponse)
+    np.testing.assert_allclose(band_rsr['det-1']['wavelength'], TEST_RSR['20']['det-1']['wavelength'], rtol=1e-6)
+    stored = band_rsr.stored_metadata
+    assert set(stored) == set(SPECTRAL_METADATA)
+
+    computed = BandResponse(band_rsr.detector_names, band_rsr.wavelength, band_rsr.responses,
+                            band_rsr.central_wavelengths)
+    for name in SPECTRAL_METADATA:
+        np.testing.assert_allclose(stored[name], computed.get_metadata(name), rtol=1e-10)
+    np.testing.assert_allclose(band_rsr.central_wavenumbers, [2647.397], atol=1e-3)
+    assert band_rsr.energy_bounds.shape == (1, 2)
+    assert band_rsr.to_wavenumber().integral() is stored["integral_wavenumber"]
+
+
+def test_interprocess_lock_is_exclusive(tmp_path):
+    """Test that the inter-process lock is held by one thread at a time."""
+    lock_filename = tmp_path / "test.lock"
+    inside = []
+    overlaps = []
+
+    def _use_lock():
+        for _ in range(20):
+            with utils.interprocess_lock(lock_filename):
+                inside.append(1)
+                overlaps.append(len(inside) > 1)
+                inside.pop()
+
+    threads = [threading.Thread(target=_use_lock) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlaps) == 80
+    assert not any(overlaps)
+    assert lock_filename.exists()
+
+
+def test_retry_lock_timeout(monkeypatch):
+    """Test that a lock which can't be taken gives up with an error after the timeout."""
+    monkeypatch.setattr(utils, "INTERPROCESS_LOCK_TIMEOUT", 0.05)
+    attempts = []
+
+    def _try_lock():
+        attempts.append(1)
+        raise OSError("locked")
+
+    with pytest.raises(TimeoutError, match="Couldn't lock test.lock"):
+        utils._retry_lock(_try_lock, "test.lock", backoff=0.01)
+    assert len(attempts) > 1
+    utils._retry_lock(lambda: None, "test.lock")
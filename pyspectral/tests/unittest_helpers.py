@@ -1,5 +1,7 @@
 """Helper functions for unit testing."""
 
+import numpy as np
+
 
 class ComputeCountingScheduler:
     """Scheduler raising an exception if data are computed too many times."""
@@ -17,3 +19,23 @@ class ComputeCountingScheduler:
             raise RuntimeError("Too many dask computations were scheduled: "
                                "{}".format(self.total_computes))
         return dask.get(dsk, keys, **kwargs)
+
+
+def write_fake_rsr_file(filename, band_names=("ch1", "ch2"), band_central_wvl=(0.47, 0.64), platform_name="GOES-16"):
+    """Write a minimal RSR file in the internal pyspectral hdf5 format."""
+    import h5py
+
+    response = np.linspace(0.0009, 1.0, 1000, dtype=np.float32)
+    wvl = np.linspace(-0.04, 0.04, 1000, dtype=np.float32)
+    with h5py.File(filename, "w") as h:
+        h.attrs["band_names"] = list(band_names)
+        h.attrs["description"] = "ABCD"
+        h.attrs["platform_name"] = platform_name
+
+        for band_name, band_cwl in zip(band_names, band_central_wvl):
+            band_group = h.create_group(band_name)
+            band_group.attrs["central_wavelength"] = band_cwl
+            band_group.create_dataset("response", data=response)
+            wvl_ds = band_group.create_dataset("wavelength", data=wvl + band_cwl)
+            wvl_ds.attrs["scale"] = 1e-6
+            wvl_ds.attrs["unit"] = "m"
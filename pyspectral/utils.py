@@ -2,21 +2,32 @@
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
+import io
+import json
 import logging
 import os
 import sys
 import tarfile
+import tempfile
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from inspect import getfullargspec
 from pathlib import Path
+from typing import Iterator
 
 import numpy as np
 import requests
+from requests.exceptions import ChunkedEncodingError, Timeout
+from requests.exceptions import ConnectionError as RequestsConnectionError
 from scipy.integrate import trapezoid
 
-from pyspectral.bandnames import BANDNAMES
 from pyspectral.config import get_config
+from pyspectral.spectral_index import get_spectral_index
 
 TQDM_LOADED = True
 try:
@@ -30,6 +41,11 @@ LOG = logging.getLogger(__name__)
 WAVE_LENGTH = "wavelength"
 WAVE_NUMBER = "wavenumber"
 
+#: Unit of the wavenumbers of the spectral responses converted to wavenumber space
+WAVE_NUMBER_UNIT = "cm-1"
+#: Scale factor to get the wavenumbers in SI units (m-1)
+WAVE_NUMBER_SI_SCALE = 100.0
+
 INSTRUMENTS = {"Envisat": "aatsr",
                "GOES-16": "abi",
                "GOES-17": "abi",
@@ -150,6 +166,11 @@ def get_rayleigh_lut_dir(aerosol_type: str) -> Path:
     return local_rayleigh_dir / aerosol_type
 
 
+def get_rayleigh_lut_filename(atmosphere: str) -> str:
+    """Get the name of the rayleigh LUT file for the specified atmosphere."""
+    return "rayleigh_lut_{0}.h5".format(atmosphere.replace(' ', '_'))
+
+
 def convert2wavenumber(rsr):
     """Convert Spectral Responses from wavelength to wavenumber space.
 
@@ -167,12 +188,14 @@ def convert2wavenumber(rsr):
     for chname in rsr.keys():  # Go through bands/channels
         retv[chname] = _band2wavenumber(rsr[chname])
 
-    unit = "cm-1"
-    si_scale = 100.0
-    return retv, {"unit": unit, "si_scale": si_scale}
+    return retv, {"unit": WAVE_NUMBER_UNIT, "si_scale": WAVE_NUMBER_SI_SCALE}
 
 
 def _band2wavenumber(ch_rsr):
+    to_wavenumber = getattr(ch_rsr, "to_wavenumber", None)
+    if to_wavenumber is not None:
+        # BandResponse: converted once for all detectors, and kept
+        return to_wavenumber()
     band_wavenumbers = {}
     for det in ch_rsr.keys():  # Go through detectors
         if "wavenumber" in ch_rsr[det].keys():
@@ -237,24 +260,15 @@ def get_central_wave(wav, resp, weight=1.0):
 
 
 def get_bandname_from_wavelength(sensor, wavelength, rsr, epsilon=0.1, multiple_bands=False):
-    """Get the bandname from h5 rsr provided the approximate wavelength."""
-    chdist_min = 2.0
-    chfound = []
-    for channel in rsr:
-        chdist = abs(
-            rsr[channel]["det-1"]["central_wavelength"] - wavelength)
-        if chdist < chdist_min and chdist < epsilon:
-            chfound.append(BANDNAMES.get(sensor, BANDNAMES["generic"]).get(channel, channel))
-
-    if len(chfound) == 1:
-        return chfound[0]
-    if len(chfound) > 1:
-        bstrlist = ["band={}".format(b) for b in chfound]
-        if not multiple_bands:
-            raise AttributeError("More than one band found with that wavelength! {}".format(str(bstrlist)))
-        LOG.debug("More than one band found with requested wavelength: %s", str(bstrlist))
-        return chfound
-    return None
+    """Get the bandname from h5 rsr provided the approximate wavelength.
+
+    The :class:`~pyspectral.spectral_index.SpectralIndex` of the bands is
+    created once per sensor and RSR file, see
+    :func:`~pyspectral.spectral_index.get_spectral_index`.
+
+    """
+    return get_spectral_index(sensor, rsr).get_bandname(wavelength, epsilon=epsilon,
+                                                        multiple_bands=multiple_bands)
 
 
 def sort_data(x_vals, y_vals):
@@ -295,6 +309,7 @@ def convert2hdf5(ClassIn, platform_name, bandnames, scale=1e-06, detectors=None)
     with h5py.File(filename, "w") as h5f:
         _write_global_attrs(h5f, instruments[0], platform_name, bandnames)
         _write_channels(h5f, instruments, bandnames, scale, detectors)
+        _write_spectral_metadata(h5f, bandnames)
 
 
 def _write_global_attrs(h5f, instrument, platform_name, bandnames):
@@ -327,7 +342,7 @@ def _write_single_detector_data(grp, sensor, scale, detectors):
     dset = grp.create_dataset("response", arr.shape, dtype="f")
     dset[...] = arr
 
-    _save_wavelengths(grp, arr, scale)
+    _save_wavelengths(grp, sensor.rsr["wavelength"], scale)
 
 
 def _save_wavelengths(grp, arr, scale):
@@ -350,44 +365,109 @@ def _write_multidetector_data(grp, sensor, scale, detectors):
         dset = det_grp.create_dataset("response", arr.shape, dtype="f")
         dset[...] = arr
 
-    _save_wavelengths(grp, arr, scale)
+    _save_wavelengths(grp, sensor.rsr[detectors[0]]["wavelength"], scale)
+
+
+def _write_spectral_metadata(h5f, bandnames):
+    """Store the spectral constants of each band and detector as attributes.
 
+    The constants are computed from the data read back from the file, so they
+    are identical to what would be computed when reading the file.
 
-def download_rsr(dest_dir: str | Path | None = None, dry_run: bool = False) -> None:
+    """
+    from pyspectral.rsr_reader import SPECTRAL_METADATA, BandResponse, _get_band_relative_spectral_responses
+
+    for chname in bandnames:
+        band_rsr = _get_band_relative_spectral_responses(h5f, chname)
+        for det, det_rsr in band_rsr.items():
+            det_response = BandResponse.from_detectors({det: det_rsr})
+            attrs = h5f[chname][det].attrs if det in h5f[chname] else h5f[chname].attrs
+            for name in SPECTRAL_METADATA:
+                attrs[name] = det_response.get_metadata(name)[0]
+
+
+def download_rsr(
+        dest_dir: str | Path | None = None,
+        dry_run: bool = False,
+        platform_names: list[str] | None = None,
+        instruments: list[str] | None = None,
+) -> None:
     """Download the relative spectral response functions.
 
     Download the pre-compiled HDF5 formatted relative spectral response
-    functions from the internet as tarballs, extracts them, then deletes
-    the tarball.
+    functions from the internet as a tarball and extract them while
+    downloading. If a download manifest is configured (see
+    :func:`load_download_manifest`), only the RSR files of the requested
+    platforms and instruments which are missing or out of date are
+    downloaded, one by one.
 
     See :func:`pyspectral.rsr_reader.check_and_download` for a "smart" version
     of this process that only downloads the necessary files.
 
     Args:
-        dest_dir: Path to put the temporary tarball and extracted RSR files.
+        dest_dir: Path to put the extracted RSR files.
         dry_run: If True, don't actually download files, only log what
             URLs would be downloaded. Defaults to False.
+        platform_names: Only download the RSR files of these platforms.
+            Only used with a download manifest. Defaults to all platforms.
+        instruments: Only download the RSR files of these instruments.
+            Only used with a download manifest. Defaults to all instruments.
 
     """
     config = get_config()
     local_rsr_dir = Path(config.get("rsr_dir"))  # type: ignore
     dest_path = Path(dest_dir) if dest_dir is not None else local_rsr_dir
 
+    section = _get_manifest_section(RSR_DATA_VERSION, "rsr")
+    if section is not None:
+        LOG.info(f"Download RSR files listed in the manifest to directory {dest_path}")
+        filenames = [filename for filename in section["files"]
+                     if _rsr_filename_matches(filename, platform_names, instruments)]
+        _fetch_manifest_files(section, filenames, dest_path, dry_run=dry_run)
+        if not dry_run and len(filenames) == len(section["files"]):
+            (dest_path / RSR_DATA_VERSION_FILENAME).write_text(RSR_DATA_VERSION)
+        return
+
     LOG.info(f"Download RSR files and store in directory {dest_path}")
-    filename = dest_path / "pyspectral_rsr_data.tgz"
     LOG.debug(f"RSR URL: {HTTP_PYSPECTRAL_RSR}")
     LOG.debug(f"Destination = {dest_path}")
     if dry_run:
         return
 
-    _download_tarball_and_extract(HTTP_PYSPECTRAL_RSR, filename, dest_path)
+    _download_tarball_and_extract(HTTP_PYSPECTRAL_RSR, dest_path)
+
+
+def rsr_files_fetched(dest_dir: str | Path, platform_names: list[str], instruments: list[str]) -> bool:
+    """Tell if the RSR files of the platforms and instruments were fetched with a manifest of the current data version.
+
+    A partial download from a manifest doesn't write the data version file
+    of the directory, the fetched files are instead recorded with their data
+    version in the local manifest of the directory.
+    """
+    dest_dir = Path(dest_dir)
+    local_manifest = _read_local_manifest(dest_dir)
+    fetched = [filename for filename in local_manifest
+               if _rsr_filename_matches(filename, platform_names, instruments) and (dest_dir / filename).exists()]
+    return bool(fetched) and all(local_manifest[filename].get("version") == RSR_DATA_VERSION for filename in fetched)
 
 
-def download_luts(aerosol_types=None, dry_run=False, aerosol_type=None):
+def _rsr_filename_matches(filename: str, platform_names: list[str] | None, instruments: list[str] | None) -> bool:
+    if instruments is not None and not any(filename.startswith(f"rsr_{instrument}_") for instrument in instruments):
+        return False
+    if platform_names is not None and not any(filename.endswith(f"_{platform}.h5") for platform in platform_names):
+        return False
+    return True
+
+
+def download_luts(aerosol_types=None, dry_run=False, aerosol_type=None, atmospheres=None):
     """Download the luts from internet.
 
     See :func:`pyspectral.rayleigh.check_and_download` for a "smart" version
-    of this process that only downloads the necessary files.
+    of this process that only downloads the necessary files. Up to
+    :data:`DOWNLOAD_WORKERS` aerosol types are downloaded in parallel. If a
+    download manifest is configured (see :func:`load_download_manifest`),
+    only the LUT files of the requested atmospheres which are missing or out
+    of date are downloaded.
 
     Args:
         aerosol_types (Iterable): Aerosol types to download the LUTs for.
@@ -396,23 +476,57 @@ def download_luts(aerosol_types=None, dry_run=False, aerosol_type=None):
         dry_run (bool): If True, don't actually download files, only log what
             URLs would be downloaded. Defaults to False.
         aerosol_type (str): Deprecated.
+        atmospheres (Iterable): Atmospheres to download the LUTs for. Only
+            used with a download manifest. Defaults to all atmospheres. See
+            :data:`ATMOSPHERES` for the full list.
 
     """
     aerosol_types = _get_aerosol_types(aerosol_types, aerosol_type)
+    downloads = []
     for subname in aerosol_types:
         LOG.debug("Aerosol type: %s", subname)
+        subdir_path = get_rayleigh_lut_dir(subname)
+        section = _get_manifest_section(ATM_CORRECTION_LUT_VERSION[subname]["version"], "rayleigh", subname)
+        if section is not None:
+            _fetch_lut_files(section, subname, subdir_path, atmospheres, dry_run)
+            continue
+
         lut_tarball_url = HTTPS_RAYLEIGH_LUTS[subname]
         LOG.debug("Atmospheric LUT URL = %s", lut_tarball_url)
-
-        subdir_path = get_rayleigh_lut_dir(subname)
         LOG.debug(f"Create directory: {subdir_path}")
-        if not dry_run:
-            subdir_path.mkdir(exist_ok=True, parents=True)
-        if dry_run:
-            continue
+        downloads.append((lut_tarball_url, subdir_path))
+    if dry_run or not downloads:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(downloads))) as executor:
+        futures = [executor.submit(_download_tarball_and_extract, url, subdir_path)
+                   for url, subdir_path in downloads]
+        for future in futures:
+            future.result()
+
+
+def _fetch_lut_files(section, aerosol_type, subdir_path, atmospheres, dry_run):
+    if atmospheres is None:
+        filenames = list(section["files"])
+    else:
+        filenames = [get_rayleigh_lut_filename(atm) for atm in atmospheres]
+        filenames = [filename for filename in filenames if filename in section["files"]]
+    _fetch_manifest_files(section, filenames, subdir_path, dry_run=dry_run)
+    if not dry_run and len(filenames) == len(section["files"]):
+        version_info = ATM_CORRECTION_LUT_VERSION[aerosol_type]
+        (subdir_path / version_info["filename"]).write_text(version_info["version"])
 
-        local_tarball_pathname = subdir_path / "pyspectral_rayleigh_correction_luts.tgz"
-        _download_tarball_and_extract(lut_tarball_url, local_tarball_pathname, subdir_path)
+
+def lut_files_fetched(aerosol_type: str, atmospheres: list[str]) -> bool:
+    """Tell if the LUTs of the aerosol type and atmospheres were fetched with a manifest of the current LUT version.
+
+    See :func:`rsr_files_fetched`.
+    """
+    version = ATM_CORRECTION_LUT_VERSION[aerosol_type]["version"]
+    lut_dir = get_rayleigh_lut_dir(aerosol_type)
+    local_manifest = _read_local_manifest(lut_dir)
+    return all(local_manifest.get(filename, {}).get("version") == version and (lut_dir / filename).exists()
+               for filename in (get_rayleigh_lut_filename(atm) for atm in atmospheres))
 
 
 def _get_aerosol_types(aerosol_types, aerosol_type):
@@ -433,32 +547,325 @@ HEADERS = {
     "Accept": "*/*",
 }
 
+#: SHA-256 hex digests of the downloadable tarballs, by URL, completed by the ``tarballs`` of the download manifest.
+#: Downloads of URLs listed in neither are not verified, with a warning.
+DOWNLOAD_SHA256: dict[str, str] = {}
+#: Number of times a failed transfer is resumed before giving up
+DOWNLOAD_RETRIES = 5
+#: Delay in seconds before the first retry, doubled for every following retry
+DOWNLOAD_BACKOFF = 1.0
+#: Timeout in seconds for connecting to the server and for every read from it
+DOWNLOAD_TIMEOUT = 60
+#: Maximum number of tarballs downloaded in parallel
+DOWNLOAD_WORKERS = 4
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session():
+    """Get the HTTP session shared by all downloads, so connections are pooled and reused."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSION = session
+        return _SESSION
+
+
+class _ResumableDownload:
+    """Stream the content of a URL, resuming the transfer where it stopped when the connection fails.
+
+    Iterating over the download gives the chunks of the content. After a
+    connection error or a transient server error, the transfer is retried
+    after an exponentially increasing delay, asking only for the missing part
+    of the content with an HTTP ``Range`` header. Servers not honouring the
+    range send the whole content again, and the already received part is
+    skipped.
+
+    """
+
+    def __init__(self, url: str, sha256: str | None = None):
+        """Prepare the download of *url*, to be verified against the *sha256* hex digest if given."""
+        self.url = url
+        self.sha256 = sha256
+        self.position = 0
+        self.total_size: int | None = None
+        self._hash = hashlib.sha256()
+
+    def __iter__(self):
+        """Iterate over the chunks of content, retrying and resuming the transfer on failures."""
+        failures = 0
+        while True:
+            try:
+                yield from self._iter_response_content()
+                return
+            except (RequestsConnectionError, ChunkedEncodingError, Timeout, _RetryableStatus) as err:
+                failures += 1
+                if failures > DOWNLOAD_RETRIES:
+                    raise
+                delay = DOWNLOAD_BACKOFF * 2 ** (failures - 1)
+                LOG.warning(f"Download of {self.url} interrupted at byte {self.position} ({err}), "
+                            f"resuming in {delay:g} s")
+                time.sleep(delay)
+
+    def _iter_response_content(self):
+        headers = {"Range": f"bytes={self.position}-"} if self.position else {}
+        with _get_session().get(self.url, headers=headers, stream=True, allow_redirects=True,
+                                timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code in _RETRY_STATUS_CODES:
+                raise _RetryableStatus(f"HTTP status {response.status_code}")
+            response.raise_for_status()
+            to_skip = self.position if response.status_code != 206 else 0
+            if self.total_size is None and "content-length" in response.headers:
+                self.total_size = int(response.headers["content-length"])
+            for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                if to_skip:
+                    skipped = min(to_skip, len(chunk))
+                    chunk = chunk[skipped:]
+                    to_skip -= skipped
+                if not chunk:
+                    continue
+                self.position += len(chunk)
+                self._hash.update(chunk)
+                yield chunk
+
+    def verify(self) -> None:
+        """Check the digest of all the received content against the expected one, if any."""
+        if self.sha256 is None:
+            LOG.warning(f"The download of {self.url} is not verified, no SHA-256 digest is known for it")
+            return
+        digest = self._hash.hexdigest()
+        if digest != self.sha256.lower():
+            raise IOError(f"Checksum mismatch for {self.url}: expected SHA-256 {self.sha256}, got {digest}")
+        LOG.debug(f"Verified SHA-256 of {self.url}")
+
+
+class _RetryableStatus(IOError):
+    """Transient HTTP error status from the server."""
+
+
+class _IterStream(io.RawIOBase):
+    """Read-only file-like object reading from an iterable of bytes chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._leftover = b""
+
+    def readable(self):
+        return True
 
-def _download_tarball_and_extract(tarball_url: str, local_pathname: Path, extract_dir: Path) -> None:
-    chunk_size = 1024 * 1024  # 1 MB
+    def readinto(self, buffer):
+        if not self._leftover:
+            self._leftover = next(self._chunks, b"")
+        size = min(len(buffer), len(self._leftover))
+        buffer[:size] = self._leftover[:size]
+        self._leftover = self._leftover[size:]
+        return size
 
-    response = requests.get(
-        tarball_url,
-        headers=HEADERS,
-        stream=True,
-        allow_redirects=True,
-    )
-    response.raise_for_status()
 
-    total_size = int(response.headers.get("content-length", 0))
+def _download_tarball_and_extract(tarball_url: str, extract_dir: Path, sha256: str | None = None) -> None:
+    """Download a tarball and extract it into *extract_dir* while it is being downloaded.
 
-    with open(local_pathname, "wb") as handle:
-        for data in _tqdm_or_iter(response.iter_content(chunk_size=chunk_size),
-                                  total=(int(total_size / chunk_size + 0.5)),
-                                  unit="kB"):
-            if data:
-                handle.write(data)
+    The tarball is never written to disk. Its members are extracted to a
+    temporary directory in *extract_dir* and only moved in place once the
+    whole tarball is received and its checksum, given by *sha256* or found
+    with :func:`_get_tarball_sha256`, is verified.
 
+    """
+    download = _ResumableDownload(tarball_url, sha256 or _get_tarball_sha256(tarball_url))
+    extract_dir.mkdir(parents=True, exist_ok=True)
     tar_kwargs = {} if sys.version_info < (3, 12) else {"filter": "data"}
-    with tarfile.open(local_pathname) as tar:
-        tar.extractall(extract_dir, **tar_kwargs)  # type: ignore
+    with tempfile.TemporaryDirectory(dir=extract_dir, prefix=".download-") as tmp_dir:
+        chunks = iter(download)
+        stream = _IterStream(_tqdm_or_iter(chunks, unit="MB", desc=os.path.basename(tarball_url)))
+        with tarfile.open(fileobj=stream, mode="r|*") as tar:
+            tar.extractall(tmp_dir, **tar_kwargs)  # type: ignore
+        # the end of the archive may be followed by padding that tarfile doesn't read
+        for _ in chunks:
+            pass
+        download.verify()
+        _move_tree(Path(tmp_dir), extract_dir)
+
+
+def _get_tarball_sha256(tarball_url: str) -> str | None:
+    """Get the SHA-256 digest of a tarball from :data:`DOWNLOAD_SHA256` or the ``tarballs`` of the manifest."""
+    sha256 = DOWNLOAD_SHA256.get(tarball_url)
+    if sha256 is None:
+        manifest = load_download_manifest()
+        if manifest is not None:
+            sha256 = manifest.get("tarballs", {}).get(tarball_url)
+    return sha256
+
+
+def _move_tree(src_dir: Path, dest_dir: Path) -> None:
+    """Move the content of *src_dir* into *dest_dir*, replacing the existing files."""
+    for src_path in src_dir.iterdir():
+        dest_path = dest_dir / src_path.name
+        if src_path.is_dir() and dest_path.is_dir():
+            _move_tree(src_path, dest_path)
+        else:
+            os.replace(src_path, dest_path)
+
+
+#: Version of the download manifest format understood by this version of pyspectral
+DOWNLOAD_MANIFEST_VERSION = 1
+#: Name of the file recording the manifest entries of the files downloaded to a directory
+LOCAL_MANIFEST_FILENAME = ".pyspectral_manifest.json"
+
+_MANIFESTS: dict[str, dict] = {}
+
+
+def load_download_manifest(location: str | Path | None = None) -> dict | None:
+    """Load the manifest of the individually downloadable RSR and LUT files.
+
+    The manifest is a JSON document listing the files of every RSR and LUT
+    data set with their size and SHA-256 digest::
+
+        {
+          "manifest_version": 1,
+          "rsr": {
+            "version": "v1.6.1",
+            "base_url": "https://example.com/pyspectral/rsr/",
+            "files": {"rsr_seviri_Meteosat-10.h5": {"size": 123456, "sha256": "..."}, ...}
+          },
+          "rayleigh": {
+            "desert_aerosol": {
+              "version": "v1.0.1",
+              "base_url": "https://example.com/pyspectral/rayleigh/desert_aerosol/",
+              "files": {"rayleigh_lut_us-standard.h5": {"size": 123456, "sha256": "..."}, ...}
+            },
+            ...
+          },
+          "tarballs": {"https://zenodo.org/records/.../files/pyspectral_rsr_data.tgz": "<sha256>", ...}
+        }
+
+    The URL of a file is its name appended to the ``base_url`` of its data
+    set. The optional ``tarballs`` give the SHA-256 digests of the complete
+    data set tarballs, used to verify them when they are downloaded.
+    Manifests are loaded once per process.
+
+    Args:
+        location: URL or local path of the manifest. Defaults to the
+            ``download_manifest`` configuration value.
+
+    Returns: The manifest, or None if no manifest is configured.
+
+    """
+    if location is None:
+        location = get_config().get("download_manifest")
+        if location is None:
+            return None
+    location = str(location)
+    manifest = _MANIFESTS.get(location)
+    if manifest is None:
+        manifest = _read_download_manifest(location)
+        if manifest.get("manifest_version") != DOWNLOAD_MANIFEST_VERSION:
+            raise ValueError(f"Unsupported download manifest version {manifest.get('manifest_version')} "
+                             f"in {location}, expected {DOWNLOAD_MANIFEST_VERSION}")
+        _MANIFESTS[location] = manifest
+    return manifest
+
+
+def _read_download_manifest(location: str) -> dict:
+    if location.startswith(("https://", "http://")):
+        LOG.debug(f"Download the download manifest {location}")
+        response = _get_session().get(location, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    with open(location, "r") as fh:
+        return json.load(fh)
+
+
+def _get_manifest_section(version: str, *keys: str) -> dict | None:
+    """Get the manifest entry of a data set if there is a manifest and it has the expected data *version*."""
+    manifest = load_download_manifest()
+    if manifest is None:
+        return None
+    section = manifest
+    for key in keys:
+        section = section.get(key, {})
+    if not section:
+        LOG.debug(f"No {'/'.join(keys)} data in the download manifest")
+        return None
+    if section.get("version") != version:
+        LOG.warning(f"The download manifest has {'/'.join(keys)} data version {section.get('version')}, "
+                    f"but version {version} is needed. Downloading the complete data set instead.")
+        return None
+    return section
+
+
+def _fetch_manifest_files(section: dict, filenames: list[str], dest_dir: Path, dry_run: bool = False) -> None:
+    """Download the *filenames* of a manifest data set which are missing or out of date in *dest_dir*."""
+    local_manifest = _read_local_manifest(dest_dir)
+    needed = [filename for filename in filenames
+              if not _is_local_file_current(dest_dir / filename, section["files"][filename],
+                                            local_manifest.get(filename))]
+    for filename in needed:
+        LOG.debug(f"Download {section['base_url']}{filename} to {dest_dir}")
+    if dry_run or not filenames:
+        return
 
-    os.remove(local_pathname)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    if needed:
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(needed))) as executor:
+            futures = [executor.submit(_download_file, section["base_url"] + filename, dest_dir / filename,
+                                       section["files"][filename].get("sha256")) for filename in needed]
+            for future in futures:
+                future.result()
+    # record the data version of the files, so later checks don't need the manifest
+    _update_local_manifest(dest_dir, {filename: dict(section["files"][filename], version=section["version"])
+                                      for filename in filenames})
+
+
+def _is_local_file_current(local_path: Path, entry: dict, local_entry: dict | None) -> bool:
+    try:
+        size = local_path.stat().st_size
+    except OSError:
+        return False
+    if "size" in entry and entry["size"] != size:
+        return False
+    # files not downloaded with this manifest may come from an outdated tarball
+    return local_entry is not None and local_entry.get("sha256") == entry.get("sha256")
+
+
+def _read_local_manifest(dest_dir: Path) -> dict:
+    try:
+        with open(dest_dir / LOCAL_MANIFEST_FILENAME, "r") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_local_manifest(dest_dir: Path, entries: dict) -> None:
+    # read again to keep the entries written by concurrent downloads to the same directory
+    local_manifest = _read_local_manifest(dest_dir)
+    local_manifest.update(entries)
+    with tempfile.NamedTemporaryFile("w", dir=dest_dir, prefix=".manifest-", delete=False) as fh:
+        json.dump(local_manifest, fh, indent=1)
+    os.replace(fh.name, dest_dir / LOCAL_MANIFEST_FILENAME)
+
+
+def _download_file(url: str, local_path: Path, sha256: str | None = None) -> None:
+    """Download a single file, only replacing *local_path* once its content is complete and verified."""
+    download = _ResumableDownload(url, sha256)
+    with tempfile.NamedTemporaryFile(dir=local_path.parent, prefix=f".{local_path.name}-", delete=False) as fh:
+        try:
+            for chunk in _tqdm_or_iter(download, unit="MB", desc=local_path.name):
+                fh.write(chunk)
+            fh.close()
+            download.verify()
+        except BaseException:
+            fh.close()
+            os.remove(fh.name)
+            raise
+    os.replace(fh.name, local_path)
 
 
 def _tqdm_or_iter(an_iterable, **tqdm_kwargs):
@@ -698,3 +1105,77 @@ def use_map_blocks_on(argument_to_run_map_blocks_on):
                 raise NotImplementedError(f"Don't know how to map_blocks on {type(array)}")
         return wrapper
     return decorator
+
+
+def as_graph_constant(obj):
+    """Wrap *obj* in a single dask graph key, to pass it to all the tasks of a dask computation.
+
+    Arrays and other objects given directly to e.g. ``map_blocks`` are
+    embedded in every task of the graph, and are shipped again with every
+    task when a distributed scheduler is used. The returned object is
+    instead one task of the graph, referenced by the tasks using it, so the
+    graph size does not depend on the number of chunks.
+
+    The object must not be modified after being wrapped: it is identified by
+    its content (or its ``__dask_tokenize__`` method) and may be shared
+    between graphs.
+
+    """
+    import dask
+
+    return dask.delayed(obj, pure=True, traverse=False)
+
+
+#: Seconds waited for an inter-process lock on Windows before giving up
+INTERPROCESS_LOCK_TIMEOUT = 600
+
+
+@contextlib.contextmanager
+def interprocess_lock(lock_filename: str | Path) -> Iterator[None]:
+    """Hold an exclusive lock on *lock_filename*, shared by all the processes of the host.
+
+    The lock file is created if needed and is left on disk afterwards. The
+    lock is also exclusive between the threads of a process, as each call
+    opens the file separately.
+
+    """
+    with open(lock_filename, "a+b") as lock_file:
+        _lock_file(lock_file)
+        try:
+            yield
+        finally:
+            _unlock_file(lock_file)
+
+
+def _retry_lock(try_lock, lock_name, backoff=0.1) -> None:
+    """Call *try_lock* until it doesn't raise an OSError, for up to :data:`INTERPROCESS_LOCK_TIMEOUT` seconds."""
+    deadline = time.monotonic() + INTERPROCESS_LOCK_TIMEOUT
+    while True:
+        try:
+            try_lock()
+            return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Couldn't lock {lock_name} within {INTERPROCESS_LOCK_TIMEOUT} seconds")
+            time.sleep(backoff)
+
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock_file(lock_file) -> None:
+        lock_file.seek(0)
+        # each attempt blocks for up to 10 seconds before raising
+        _retry_lock(lambda: msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1), lock_file.name)
+
+    def _unlock_file(lock_file) -> None:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(lock_file) -> None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(lock_file) -> None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
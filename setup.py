@@ -10,11 +10,10 @@ description = ('Reading and manipulaing satellite sensor spectral responses and
 with open('./README.md', 'r') as fd:
     long_description = fd.read()
 
-requires = ['numpy>=1.21', 'scipy>=1.6.0', 'python-geotiepoints>=1.1.1',
-            'h5py>=2.5', 'requests', 'pyyaml', 'platformdirs']
+requires = ['numpy>=1.21', 'scipy>=1.6.0', 'h5py>=2.5', 'requests', 'pyyaml', 'platformdirs']
 
 dask_extra = ['dask[array]']
-test_requires = ['pyyaml', 'dask[array]', 'xlrd', 'pytest>=9', 'xarray', 'responses']
+test_requires = ['pyyaml', 'dask[array]', 'xlrd', 'pytest>=9', 'xarray', 'responses', 'python-geotiepoints>=1.1.1']
 
 NAME = 'pyspectral'
 
@@ -55,7 +54,7 @@ setup(name=NAME,
                       'dask': dask_extra},
       scripts=['bin/plot_rsr.py', 'bin/composite_rsr_plot.py',
                'bin/download_atm_correction_luts.py',
-               'bin/download_rsr.py'],
+               'bin/download_rsr.py', 'bin/convert_rsr_to_store.py', 'bin/create_rayleigh_band_cache.py'],
       data_files=[('share', ['pyspectral/data/e490_00a.dat',
                              'pyspectral/data/MSG_SEVIRI_Spectral_Response_Characterisation.XLS'])],
       python_requires='>=3.10',